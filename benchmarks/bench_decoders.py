@@ -0,0 +1,49 @@
+"""
+Compares the JSON decoders on the frames of each exchange.
+
+    python -m benchmarks.bench_decoders [--seconds 0.5]
+
+Huobi frames are decompressed beforehand, only the JSON decoding is timed.
+"""
+import argparse
+import gzip
+import time
+
+from benchmarks.fixtures import MESSAGES, frames
+from crypto_ws.decoders import DECODERS, orjson
+
+
+def rate(decode, frame, seconds):
+    """
+    Returns the number of frames per second a decoder deserializes.
+    """
+    n, start = 0, time.perf_counter()
+
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(1000):
+            decode(frame)
+        n += 1000
+
+    return n / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=0.5, help='time spent per frame and decoder')
+    args = parser.parse_args(argv)
+
+    decoders = {name: decode for name, decode in DECODERS.items() if name != 'orjson' or orjson is not None}
+    print(f"{'frame':<28}{'bytes':>8}" + ''.join(f'{name + " msg/s":>16}' for name in decoders) + f"{'speedup':>10}")
+
+    for exchange in MESSAGES:
+        for name, frame in frames(exchange).items():
+            frame = gzip.decompress(frame) if exchange == 'huobi' else frame
+            rates = [rate(decode, frame, args.seconds) for decode in decoders.values()]
+
+            print(f'{exchange + ":" + name:<28}{len(frame):>8}' + ''.join(f'{r:>16,.0f}' for r in rates)
+                  + f'{rates[-1] / rates[0]:>9.2f}x')
+
+
+if __name__ == "__main__":
+
+    main()
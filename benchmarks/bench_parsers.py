@@ -0,0 +1,120 @@
+"""
+Compares the compiled parser plans with the per-message subset/map lookups they replaced, and the Depth arrays of
+the depth parsers with the lists of level dicts they replaced.
+
+    python -m benchmarks.bench_parsers [--seconds 0.5]
+"""
+import argparse
+import time
+
+from benchmarks.fixtures import MESSAGES
+from crypto_ws import binance_ws, bybit_ws, huobi_ws, kraken_ws
+
+
+def legacy(parser, items, subset=None):
+    """
+    Parses (key, value) pairs the way the parsers did before plans: rebuilding the subset list and looking every
+    key up in the map and then in the subset.
+    """
+    subset = subset if subset else [k[0] for k in parser.map.values()]
+    return {kv[0]: kv[1](v) for k, v in items if (kv := parser.map.get(k, k))[0] in subset}
+
+
+def legacy_rows(parser, rows):
+    return [legacy(parser, enumerate(row)) for row in rows]
+
+
+class LegacyLevel:
+    map = {0: ['price', float], 1: ['volume', float], 2: ['time_utc', kraken_ws.Parser.parse_datetime]}
+
+
+def legacy_levels(rows):
+    """
+    Parses depth levels the way the depth parsers did before Depth: one dict per level.
+    """
+    return legacy_rows(LegacyLevel, rows)
+
+
+def stamped(parse, module):
+    """
+    Adds the response time the parsers of Huobi and Bybit add to their output.
+    """
+    def wrapper(msg):
+        return {'msg': parse(msg), 'respond_time_utc': module.Parser.parse_datetime(msg['ts'])}
+    return wrapper
+
+
+def legacy_huobi(parser):
+    return stamped(lambda m: legacy(parser, m['tick'].items()), huobi_ws)
+
+
+def legacy_huobi_depth(parser):
+    return stamped(lambda m: {**legacy(parser, m['tick'].items()),
+                              'bids': list(m['tick']['bids']), 'asks': list(m['tick']['asks'])}, huobi_ws)
+
+
+CASES = [
+    (binance_ws.TradeParser, 'binance', 'trade',
+     lambda m: legacy(binance_ws.TradeParser, m.items(), binance_ws.TradeParser.subset)),
+    (binance_ws.TickerParser, 'binance', 'ticker',
+     lambda m: legacy(binance_ws.TickerParser, m.items(), binance_ws.TickerParser.subset)),
+    (binance_ws.BarParser, 'binance', 'kline',
+     lambda m: legacy(binance_ws.BarParser, {**m, **m['k']}.items(), binance_ws.BarParser.subset)),
+    (huobi_ws.TickerParser, 'huobi', 'ticker', legacy_huobi(huobi_ws.TickerParser)),
+    (huobi_ws.BBOParser, 'huobi', 'bbo', legacy_huobi(huobi_ws.BBOParser)),
+    (huobi_ws.DetailParser, 'huobi', 'detail', legacy_huobi(huobi_ws.DetailParser)),
+    (huobi_ws.BarParser, 'huobi', 'kline.1min', legacy_huobi(huobi_ws.BarParser)),
+    (huobi_ws.DepthParser, 'huobi', 'depth.step0', legacy_huobi_depth(huobi_ws.DepthParser)),
+    (huobi_ws.ByPriceParser, 'huobi', 'mbp.refresh.20', legacy_huobi_depth(huobi_ws.ByPriceParser)),
+    (huobi_ws.TradeParser, 'huobi', 'trade.detail',
+     stamped(lambda m: ([legacy(huobi_ws.TradeParser, d.items()) for d in m['tick']['data']],
+                        huobi_ws.Parser.parse_datetime(m['tick']['ts'])), huobi_ws)),
+    (kraken_ws.TickerParser, 'kraken', 'ticker',
+     lambda m: legacy(kraken_ws.TickerParser, [((k, idx), i) for k, v in m[1].items() for idx, i in enumerate(v)])),
+    (kraken_ws.TradeParser, 'kraken', 'trade', lambda m: legacy_rows(kraken_ws.TradeParser, m[1])),
+    (kraken_ws.SpreadParser, 'kraken', 'spread', lambda m: legacy(kraken_ws.SpreadParser, enumerate(m[1]))),
+    (kraken_ws.BarParser, 'kraken', 'ohlc-1', lambda m: legacy(kraken_ws.BarParser, enumerate(m[1]))),
+    (kraken_ws.BookParser, 'kraken', 'book-10',
+     lambda m: (legacy_levels(m[1]['as']), legacy_levels(m[1]['bs']))),
+    (bybit_ws.TickerParser, 'bybit', 'tickers',
+     stamped(lambda m: legacy(bybit_ws.TickerParser, m['data'].items()), bybit_ws)),
+    (bybit_ws.BarParser, 'bybit', 'kline.1',
+     stamped(lambda m: legacy(bybit_ws.BarParser, m['data'][0].items()), bybit_ws)),
+    (bybit_ws.DepthParser, 'bybit', 'orderbook.50',
+     stamped(lambda m: (legacy_levels(m['data']['a']), legacy_levels(m['data']['b'])), bybit_ws)),
+    (bybit_ws.TradeParser, 'bybit', 'publicTrade',
+     stamped(lambda m: [legacy(bybit_ws.TradeParser, d.items()) for d in m['data']], bybit_ws)),
+]
+
+
+def rate(parse, msg, seconds):
+    """
+    Returns the number of messages per second a parser parses.
+    """
+    n, start = 0, time.perf_counter()
+
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(200):
+            parse(msg)
+        n += 200
+
+    return n / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=0.5, help='time spent per parser and implementation')
+    args = parser.parse_args(argv)
+
+    print(f"{'parser':<28}{'legacy msg/s':>16}{'plan msg/s':>16}{'speedup':>10}")
+
+    for cls, exchange, name, parse_legacy in CASES:
+        msg = MESSAGES[exchange][name]
+        before, after = rate(parse_legacy, msg, args.seconds), rate(cls.parse, msg, args.seconds)
+
+        print(f'{exchange + "." + cls.__name__:<28}{before:>16,.0f}{after:>16,.0f}{after / before:>9.2f}x')
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,122 @@
+"""
+Synthetic frames for the benchmarks, shaped after the messages documented by each exchange.
+"""
+import gzip
+import json
+
+
+def _levels(price, step, n, size=1.5):
+    return [[f'{price + i * step:.2f}', f'{size + i % 7 * 0.1:.4f}'] for i in range(n)]
+
+
+BINANCE = {
+    'trade': {'e': 'trade', 'E': 1672515782136, 's': 'BTCUSDT', 't': 2500000001, 'p': '16547.31000000',
+              'q': '0.00310000', 'b': 18000000001, 'a': 18000000002, 'T': 1672515782136, 'm': True, 'M': True},
+    'ticker': {'e': '24hrTicker', 'E': 1672515782136, 's': 'BTCUSDT', 'p': '-94.99999800', 'P': '-0.572',
+               'w': '16590.12345', 'x': '16640.31000000', 'c': '16547.31000000', 'Q': '0.00310000',
+               'b': '16547.30000000', 'B': '1.20000000', 'a': '16547.31000000', 'A': '0.50000000',
+               'o': '16642.31000000', 'h': '16710.00000000', 'l': '16500.00000000', 'v': '183242.12345000',
+               'q': '3041245123.12300000', 'O': 1672429382136, 'C': 1672515782136, 'F': 2499000000,
+               'L': 2500000001, 'n': 1000002},
+    'index': {'e': 'index', 'E': 1672515782136, 's': 'BTCUSDT', 'p': '16548.12345678'},
+    'kline': {'e': 'kline', 'E': 1672515782136, 's': 'BTCUSDT',
+              'k': {'t': 1672515780000, 'T': 1672515839999, 's': 'BTCUSDT', 'i': '1m', 'f': 2499999900,
+                    'L': 2500000001, 'o': '16540.00000000', 'c': '16547.31000000', 'h': '16550.00000000',
+                    'l': '16539.00000000', 'v': '12.31200000', 'n': 102, 'x': True, 'q': '203712.12300000',
+                    'V': '6.50000000', 'Q': '107551.12300000', 'B': '0'}},
+}
+
+HUOBI = {
+    'ticker': {'ch': 'market.btcusdt.ticker', 'ts': 1672515782136,
+               'tick': {'open': 16642.31, 'high': 16710.0, 'low': 16500.0, 'close': 16547.31,
+                        'amount': 12345.6789, 'vol': 204512345.12, 'count': 523412, 'bid': 16547.3,
+                        'bidSize': 1.2, 'ask': 16547.31, 'askSize': 0.5, 'lastPrice': 16547.31,
+                        'lastSize': 0.0031}},
+    'bbo': {'ch': 'market.btcusdt.bbo', 'ts': 1672515782136,
+            'tick': {'seqId': 161499562790, 'ask': 16547.31, 'askSize': 0.5, 'bid': 16547.3, 'bidSize': 1.2,
+                     'quoteTime': 1672515782135, 'symbol': 'btcusdt'}},
+    'trade.detail': {'ch': 'market.btcusdt.trade.detail', 'ts': 1672515782136,
+                     'tick': {'id': 161499562790, 'ts': 1672515782135,
+                              'data': [{'id': 1614995627901234567 + i, 'ts': 1672515782135,
+                                        'tradeId': 102755213000 + i, 'amount': 0.0031, 'price': 16547.31,
+                                        'direction': 'buy' if i % 2 else 'sell'} for i in range(3)]}},
+    'detail': {'ch': 'market.btcusdt.detail', 'ts': 1672515782136,
+               'tick': {'id': 161499562790, 'open': 16642.31, 'close': 16547.31, 'low': 16500.0,
+                        'high': 16710.0, 'amount': 12345.6789, 'vol': 204512345.12, 'count': 523412,
+                        'version': 161499562790}},
+    'kline.1min': {'ch': 'market.btcusdt.kline.1min', 'ts': 1672515782136,
+                   'tick': {'id': 1672515780, 'open': 16540.0, 'close': 16547.31, 'low': 16539.0, 'high': 16550.0,
+                            'amount': 12.312, 'vol': 203712.123, 'count': 102}},
+    'depth.step0': {'ch': 'market.btcusdt.depth.step0', 'ts': 1672515782136,
+                    'tick': {'bids': [[16547.3 - i * 0.01, 1.5 + i % 7 * 0.1] for i in range(150)],
+                             'asks': [[16547.31 + i * 0.01, 1.5 + i % 7 * 0.1] for i in range(150)],
+                             'version': 161499562790, 'ts': 1672515782135}},
+    'mbp.refresh.20': {'ch': 'market.btcusdt.mbp.refresh.20', 'ts': 1672515782136,
+                       'tick': {'seqNum': 161499562790,
+                                'bids': [[16547.3 - i * 0.01, 1.5 + i % 7 * 0.1] for i in range(20)],
+                                'asks': [[16547.31 + i * 0.01, 1.5 + i % 7 * 0.1] for i in range(20)]}},
+}
+
+KRAKEN = {
+    'ticker': [340, {'a': ['16547.31000', 0, '0.50000000'], 'b': ['16547.30000', 1, '1.20000000'],
+                     'c': ['16547.31000', '0.00310000'], 'v': ['1234.12345678', '5678.12345678'],
+                     'p': ['16590.12345', '16601.54321'], 't': [12345, 54321],
+                     'l': ['16500.00000', '16450.00000'], 'h': ['16710.00000', '16750.00000'],
+                     'o': ['16642.31000', '16600.00000']}, 'ticker', 'XBT/USD'],
+    'trade': [337, [['16547.31000', '0.00310000', '1672515782.136000', 'b' if i % 2 else 's', 'l', '']
+                    for i in range(3)], 'trade', 'XBT/USD'],
+    'spread': [338, ['16547.30000', '16547.31000', '1672515782.136000', '1.20000000', '0.50000000'],
+               'spread', 'XBT/USD'],
+    'ohlc-1': [342, ['1672515782.136000', '1672515840.000000', '16540.00000', '16550.00000', '16539.00000',
+                     '16547.31000', '16545.12345', '12.31200000', 102], 'ohlc-1', 'XBT/USD'],
+    'book-10': [336, {'as': [level + ['1672515782.136000'] for level in _levels(16547.31, 0.1, 10)],
+                      'bs': [level + ['1672515782.136000'] for level in _levels(16547.3, -0.1, 10)]},
+                'book-10', 'XBT/USD'],
+}
+
+BYBIT = {
+    'tickers': {'topic': 'tickers.BTCUSDT', 'ts': 1672515782136, 'type': 'snapshot', 'cs': 2588407389,
+                'data': {'symbol': 'BTCUSDT', 'lastPrice': '16547.31', 'highPrice24h': '16710.00',
+                         'lowPrice24h': '16500.00', 'prevPrice24h': '16642.31', 'volume24h': '12345.6789',
+                         'turnover24h': '204512345.12', 'price24hPcnt': '-0.0057', 'usdIndexPrice': '16548.1'}},
+    'publicTrade': {'topic': 'publicTrade.BTCUSDT', 'ts': 1672515782136, 'type': 'snapshot',
+                    'data': [{'i': f'22900000000616663{i:02d}', 'T': 1672515782135, 'p': '16547.31',
+                              'v': '0.0031', 'S': 'Buy' if i % 2 else 'Sell', 's': 'BTCUSDT', 'BT': False}
+                             for i in range(3)]},
+    'orderbook.50': {'topic': 'orderbook.50.BTCUSDT', 'ts': 1672515782136, 'type': 'delta',
+                     'data': {'s': 'BTCUSDT', 'b': _levels(16547.3, -0.01, 8), 'a': _levels(16547.31, 0.01, 8),
+                              'u': 18521288, 'seq': 7961638724}, 'cts': 1672515782130},
+    'kline.1': {'topic': 'kline.1.BTCUSDT', 'ts': 1672515782136, 'type': 'snapshot',
+                'data': [{'start': 1672515780000, 'end': 1672515839999, 'interval': '1', 'open': '16540',
+                          'close': '16547.31', 'high': '16550', 'low': '16539', 'volume': '12.312',
+                          'turnover': '203712.123', 'confirm': False, 'timestamp': 1672515782135}]},
+}
+
+MESSAGES = {
+    'binance': BINANCE,
+    'huobi': HUOBI,
+    'kraken': KRAKEN,
+    'bybit': BYBIT,
+}
+
+
+def frames(exchange):
+    """
+    Returns the raw frames of an exchange, as received on the socket.
+
+    Parameters
+    ----------
+    exchange : str
+        the name of the exchange, a key of MESSAGES
+
+    Returns
+    -------
+    dict
+        the raw bytes of each message, keyed by message name
+    """
+    raw = {name: json.dumps(msg, separators=(',', ':')).encode() for name, msg in MESSAGES[exchange].items()}
+
+    if exchange == 'huobi':
+        return {name: gzip.compress(frame) for name, frame in raw.items()}
+
+    return raw
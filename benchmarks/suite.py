@@ -0,0 +1,336 @@
+"""
+Benchmarks every parser and the full receiving loop of each exchange, and checks them against stored baselines.
+
+    python -m benchmarks.suite [--seconds 0.5] [--tolerance 0.25] [--only huobi] [--save]
+
+Parser cases time Parser.parse on the fixture of each parser class. Loop cases run the unchanged _loop of a
+client over its raw fixture frames: decoding, parsing, results update and publishing to a stub Redis.
+
+Parser and loop cases are also run with the compact record types of the parsers, the '/records' cases, see
+crypto_ws.parsing.Record, but for the depth parsers, which keep dicts. Records save memory on the messages held
+in the results rather than on the handling of each message, which the parser cases also measure: the bytes a
+message retains when the results of RETAINED_MARKETS markets are held.
+
+Each case reports messages per second, its throughput relative to a reference workload, the bytes allocated
+per message, the peak of the memory traced by tracemalloc while handling one message, and for the parser cases
+the bytes retained per message held. Throughputs are medians
+over several batches, each batch of a case being timed right after a batch of the reference, which only uses
+the standard library, so that the relative throughput holds across loads of the machine. The run exits with
+status 1 if a case is relatively slower, allocates or retains more than its baseline in benchmarks/baseline.json beyond
+the tolerance; the absolute throughputs are only reported. --save stores the results as the new baseline, the
+throughputs being the medians of SAVE_ROUNDS rounds of timing.
+"""
+import argparse
+import functools
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fixtures import MESSAGES, frames
+from crypto_ws import binance_ws, bybit_ws, huobi_ws, kraken_ws
+from crypto_ws.parsing import record_type
+from crypto_ws.replay import ReplayEnd
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+REPEATS = 7
+SAVE_ROUNDS = 3
+
+# a multiple of the number of frames of every loop case, so that each frame is measured as often
+ALLOCATED_MESSAGES = 140
+RETAINED_MARKETS = 1000
+
+PARSERS = {
+    'binance': {'trade': binance_ws.TradeParser, 'ticker': binance_ws.TickerParser, 'index': binance_ws.IndexParser,
+                'kline': binance_ws.BarParser},
+    'huobi': {'ticker': huobi_ws.TickerParser, 'bbo': huobi_ws.BBOParser, 'trade.detail': huobi_ws.TradeParser,
+              'detail': huobi_ws.DetailParser, 'kline.1min': huobi_ws.BarParser,
+              'depth.step0': huobi_ws.DepthParser, 'mbp.refresh.20': huobi_ws.ByPriceParser},
+    'kraken': {'ticker': kraken_ws.TickerParser, 'trade': kraken_ws.TradeParser, 'spread': kraken_ws.SpreadParser,
+               'ohlc-1': kraken_ws.BarParser, 'book-10': kraken_ws.BookParser},
+    'bybit': {'tickers': bybit_ws.TickerParser, 'publicTrade': bybit_ws.TradeParser,
+              'orderbook.50': bybit_ws.DepthParser, 'kline.1': bybit_ws.BarParser},
+}
+
+CLIENTS = {
+    'binance': (binance_ws.BinanceWS, ['btcusdt'], ['trade', 'ticker', 'index', 'kline_1m']),
+    'huobi': (huobi_ws.HuobiWS, ['btcusdt'], list(MESSAGES['huobi'])),
+    'kraken': (kraken_ws.KrakenWS, ['XBT/USD'], list(MESSAGES['kraken'])),
+    'bybit': (bybit_ws.BybitWS, ['BTCUSDT'], list(MESSAGES['bybit'])),
+}
+
+
+class StubRedis:
+    """
+    Stands in for redis.Redis and its pipelines, accepting every command without doing anything.
+    """
+
+    def publish(self, channel, message):
+        return 0
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        return 0
+
+    def expire(self, name, time):
+        return True
+
+    def execute(self):
+        return []
+
+
+class FrameSocket:
+    """
+    Stands in for a WebSocket connection, receiving the frames of an iterator, then raising ReplayEnd.
+    """
+
+    def __init__(self, frames, opcode):
+        self._frames = frames
+        self._opcode = opcode
+
+    def recv_data(self):
+        for frame in self._frames:
+            return self._opcode, frame
+        raise ReplayEnd()
+
+    def send(self, msg):
+        pass
+
+    def ping(self, payload=''):
+        pass
+
+
+def loop_frames(exchange):
+    """
+    Returns the raw frames of the loop case of an exchange, the Bybit order book being sent as snapshots so that
+    every frame updates the book.
+    """
+    if exchange != 'bybit':
+        return list(frames(exchange).values())
+
+    msgs = dict(MESSAGES['bybit'], **{'orderbook.50': dict(MESSAGES['bybit']['orderbook.50'], type='snapshot')})
+    return [json.dumps(msg, separators=(',', ':')).encode() for msg in msgs.values()]
+
+
+def has_records(cls):
+    """
+    Checks if a client with records set compiles a record type for a parser class, all but the depth parsers.
+    """
+    return 'depth' not in getattr(cls, 'extras', ())
+
+
+def record_plan(cls):
+    """
+    Returns the plan of a parser class with its record type, as compiled by a client with records set.
+    """
+    plan = sys.modules[cls.__module__].Parser.compile(cls.map, getattr(cls, 'subset', None))
+    plan.record = record_type(cls.__name__, plan, getattr(cls, 'extras', ()))
+    return plan
+
+
+def loop_case(exchange, records=False):
+    """
+    Returns a function running the _loop of a client of an exchange over n frames, publishing to a stub Redis.
+    """
+    cls, markets, channels = CLIENTS[exchange]
+
+    client = cls(markets=markets, channels=channels, do_publish=True, records=records)
+    client._redis = StubRedis()
+
+    raw, opcode = itertools.cycle(loop_frames(exchange)), 2 if exchange == 'huobi' else 1
+
+    def run(n):
+        client._socket = FrameSocket(itertools.islice(raw, n), opcode)
+        try:
+            client._loop()
+        except ReplayEnd:
+            pass
+
+    return run
+
+
+def cases(only=None):
+    """
+    Returns the (name, run, parse) of each case, run(n) handling n messages, parse() returning a parsed message
+    for the parser cases, None for the loop cases.
+    """
+    for exchange, parsers in PARSERS.items():
+        if only and exchange not in only:
+            continue
+
+        for name, cls in parsers.items():
+            def run(n, parse=cls.parse, msg=MESSAGES[exchange][name]):
+                for _ in range(n):
+                    parse(msg)
+
+            yield f'{exchange}.{cls.__name__}[{name}]', run, functools.partial(cls.parse, MESSAGES[exchange][name])
+
+            if has_records(cls):
+                def run_records(n, parse=cls.parse, msg=MESSAGES[exchange][name], plan=record_plan(cls)):
+                    for _ in range(n):
+                        parse(msg, plan=plan)
+
+                yield (f'{exchange}.{cls.__name__}[{name}]/records', run_records,
+                       functools.partial(cls.parse, MESSAGES[exchange][name], plan=record_plan(cls)))
+
+        yield f'{exchange}._loop', loop_case(exchange), None
+        yield f'{exchange}._loop/records', loop_case(exchange, records=True), None
+
+
+REFERENCE = json.dumps(MESSAGES['binance']['ticker'])
+REFERENCE_FIELDS = frozenset('pPwxcQbBaAohlvq')
+
+
+def reference(n):
+    """
+    The reference workload, decoding and converting a ticker with the standard library only, n times.
+    """
+    for _ in range(n):
+        {k: float(v) for k, v in json.loads(REFERENCE).items() if k in REFERENCE_FIELDS}
+
+
+def timed(run, n):
+    t0 = time.perf_counter()
+    run(n)
+    return n / (time.perf_counter() - t0)
+
+
+def batch(run, seconds):
+    """
+    Returns the number of messages a case handles in about the given time.
+    """
+    n = 50
+    while True:
+        t0 = time.perf_counter()
+        run(n)
+        elapsed = time.perf_counter() - t0
+
+        if elapsed >= seconds:
+            return n
+        n = int(n * min(max(seconds / elapsed, 1.5), 10)) if elapsed else n * 10
+
+
+def rate(run, seconds, repeats=REPEATS):
+    """
+    Returns the number of messages per second a case handles and its ratio to the rate of the reference workload,
+    the medians of several batches, each one timed right after a batch of the reference.
+    """
+    per_batch = seconds / (2 * repeats)
+    n, n_reference = batch(run, per_batch), batch(reference, per_batch)
+
+    rates, ratios = [], []
+    for _ in range(repeats):
+        base = timed(reference, n_reference)
+        rates.append(timed(run, n))
+        ratios.append(rates[-1] / base)
+
+    return statistics.median(rates), statistics.median(ratios)
+
+
+def allocated(run, n=ALLOCATED_MESSAGES):
+    """
+    Returns the bytes allocated per message by a case, the average peak of the traced memory over n messages
+    handled one at a time, after a warm-up.
+    """
+    run(n)
+
+    tracemalloc.start()
+    total = 0
+
+    for _ in range(n):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run(1)
+        total += tracemalloc.get_traced_memory()[1] - before
+
+    tracemalloc.stop()
+    return total / n
+
+
+def retained(parse, n=RETAINED_MARKETS):
+    """
+    Returns the bytes retained per message by the results of n markets, each holding a parsed message, as
+    measured by tracemalloc.
+    """
+    parse()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = {f'market{i}': parse() for i in range(n)}
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    del results
+    return held / n
+
+
+def check(result, baseline, tolerance):
+    """
+    Returns the regressions of a case against its baseline.
+    """
+    if baseline is None or 'relative' not in baseline:
+        return ['no baseline']
+
+    regressions = []
+    if result['relative'] < baseline['relative'] * (1 - tolerance):
+        regressions.append(f"{result['relative'] / baseline['relative'] - 1:+.0%} relative msg/s")
+    if result['bytes_per_msg'] > baseline['bytes_per_msg'] * (1 + tolerance) + 64:
+        regressions.append(f"{result['bytes_per_msg'] / baseline['bytes_per_msg'] - 1:+.0%} B/msg")
+    if result.get('retained_per_msg', 0) > baseline.get('retained_per_msg', 0) * (1 + tolerance) + 64:
+        regressions.append(f"{result['retained_per_msg'] / baseline.get('retained_per_msg', 1) - 1:+.0%} retained")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=1., help='time spent timing each case')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative regression tolerated')
+    parser.add_argument('--only', nargs='+', choices=list(PARSERS), help='exchanges to benchmark')
+    parser.add_argument('--baseline', default=BASELINE, help='path of the baseline file')
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the baseline, replacing it unless --only is given')
+    args = parser.parse_args(argv)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    results, failed = {}, False
+    print(f"{'case':<44}{'msg/s':>12}{'rel':>8}{'B/msg':>10}{'B held':>8}{'base rel':>10}{'base B/msg':>12}  status")
+
+    for name, run, parse in cases(args.only):
+        rounds = [rate(run, args.seconds) for _ in range(SAVE_ROUNDS if args.save else 1)]
+        msgs_per_sec, relative = (statistics.median(values) for values in zip(*rounds))
+        result = results[name] = {'msgs_per_sec': round(msgs_per_sec), 'relative': round(relative, 3),
+                                  'bytes_per_msg': round(allocated(run))}
+        if parse is not None:
+            result['retained_per_msg'] = round(retained(parse))
+        baseline = baselines.get(name)
+        regressions = [] if args.save else check(result, baseline, args.tolerance)
+        failed |= any(r != 'no baseline' for r in regressions)
+
+        base = baseline or {'relative': 0, 'bytes_per_msg': 0}
+        print(f"{name:<44}{result['msgs_per_sec']:>12,}{result['relative']:>8.3f}{result['bytes_per_msg']:>10,}"
+              f"{result.get('retained_per_msg', 0):>8,}{base['relative']:>10.3f}{base['bytes_per_msg']:>12,}"
+              f"  {', '.join(regressions) or 'ok'}")
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(baselines, **results) if args.only else results, f, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import websockets
+
+from crypto_ws.client_ws import WebsocketClient
+
+
+class AsyncSocket:
+    """
+    A class wrapping an asyncio WebSocket connection behind the blocking socket API.
+
+    ...
+
+    The exchange hooks (_subscribe, _keep_alive) call send() and ping() synchronously. Outgoing frames are
+    queued and written by a background task, so these hooks can be shared between the blocking and asyncio
+    clients.
+
+    Attributes
+    ----------
+    connection : websockets.WebSocketClientProtocol
+        the underlying asyncio WebSocket connection
+
+    Methods
+    -------
+    send(msg):
+        Queues a frame to be sent over the connection.
+    ping(payload=''):
+        Queues a ping to be sent over the connection.
+    recv():
+        Waits for the next frame received over the connection.
+    close():
+        Stops the writer task and closes the connection.
+    """
+
+    def __init__(self, connection):
+        """
+        Constructs all the necessary attributes for the AsyncSocket object.
+
+        Parameters
+        ----------
+            connection : websockets.WebSocketClientProtocol
+                the underlying asyncio WebSocket connection
+        """
+        self.connection = connection
+        self._outbox = asyncio.Queue()
+        self._writer = asyncio.get_running_loop().create_task(self._write())
+
+    async def _write(self):
+        while True:
+            kind, payload = await self._outbox.get()
+
+            if kind == 'ping':
+                await self.connection.ping(payload)
+            else:
+                await self.connection.send(payload)
+
+    def send(self, msg):
+        self._outbox.put_nowait(('send', msg))
+
+    def ping(self, payload=''):
+        self._outbox.put_nowait(('ping', payload))
+
+    async def recv(self):
+        return await self.connection.recv()
+
+    async def close(self):
+        self._writer.cancel()
+        await self.connection.close()
+
+
+class AsyncWebsocketClient(WebsocketClient):
+    """
+    A class to represent a WebSocket client running on an asyncio event loop.
+
+    ...
+
+    It reuses the _subscribe, _keep_alive and _decode hooks of WebsocketClient subclasses, so it is meant to be
+    listed first in the bases of an exchange client, e.g. class AsyncBinanceWS(AsyncCoreWS, BinanceWS).
+
+    Methods
+    -------
+    connect():
+        Establishes a WebSocket connection.
+    rcv():
+        Waits for a message over the WebSocket connection.
+    rcv_frame():
+        Waits for a raw frame over the WebSocket connection.
+    run():
+        Runs the WebSocket client, attempts to establish a connection and handle exceptions.
+    """
+
+    async def _connect(self):
+        """
+        Establishes a WebSocket connection to the specified URL, closing the previous one if any.
+        """
+        if self._socket is not None:
+            await self._socket.close()
+
+        self._socket = AsyncSocket(await websockets.connect(self.url, **self._options))
+
+    def _send(self, msg):
+        """
+        Queues a JSON message to be sent over the WebSocket connection.
+
+        Parameters
+        ----------
+        msg : dict
+            The message to be sent. This should be a dictionary that can be serialized to JSON.
+        """
+        self._socket.send(json.dumps(msg))
+
+    async def _rcv(self):
+        """
+        Waits for a message over the WebSocket connection.
+
+        Returns
+        -------
+        dict
+            The received message, deserialized by _decode.
+        """
+        return self._decode(await self._rcv_frame())
+
+    async def _rcv_frame(self):
+        """
+        Waits for a raw frame over the WebSocket connection, handing it to the recorder if any.
+
+        Returns
+        -------
+        bytes or str
+            The raw frame.
+        """
+        frame = await self._socket.recv()
+
+        if self._recorder is not None:
+            self._recorder.record(1 if isinstance(frame, str) else 2, frame)
+
+        return frame
+
+    async def run(self):
+        """
+        Runs the WebSocket client.
+        This coroutine tries to establish a connection and keep it alive.
+        If an error occurs, it attempts to reestablish the connection after a delay.
+        """
+        await self._connect()
+        self._keep_alive()
+
+        cnt = 0
+
+        while cnt <= 10:
+            print(f'INFO: Starting Loop #{cnt}/10')
+            try:
+                self._subscribe()
+                await self._loop()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error: {e}")
+                await asyncio.sleep(5)
+                cnt += 1
+                self.n_reconnects += 1
+                await self._connect()
+
+    async def _loop(self):
+        """
+        Placeholder coroutine to be overridden in subclasses.
+        This should handle incoming data.
+        """
+        pass
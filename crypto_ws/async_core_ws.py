@@ -0,0 +1,245 @@
+import asyncio
+import time
+
+import redis.asyncio
+
+from crypto_ws.async_client_ws import AsyncWebsocketClient
+from crypto_ws.core_ws import CoreWS
+from crypto_ws.utils import serialize
+
+
+class AsyncCoreWS(AsyncWebsocketClient, CoreWS):
+    """
+    A class used to represent a CoreWS client running on an asyncio event loop.
+
+    ...
+
+    Exchange clients get their asyncio flavour by listing it first in their bases, e.g.
+    class AsyncBinanceWS(AsyncCoreWS, BinanceWS). The exchange _subscribe, _keep_alive, _decode and _on_message
+    hooks are reused as is, while keep-alive signals, Redis caching and publishing run as background tasks on the
+    event loop so that they never block the reception of messages. As in the BatchPublisher of the threaded
+    clients, a failure of a task is counted and printed and the task goes on, and the messages wait to be published
+    in a queue bounded by publish_queue, the messages received while it is full being dropped and counted, since
+    the reception cannot wait for room.
+
+    Attributes
+    ----------
+    n_publish_failures : int
+        the number of pipelines which failed to be published
+    n_publish_dropped : int
+        the number of messages dropped as the publishing queue was full
+    n_cache_failures : int
+        the number of pipelines which failed to be cached
+
+    Methods
+    -------
+    run():
+        Runs the client, or all its shards on the running event loop when sharding is enabled.
+    _loop():
+        Receives frames and hands them to _on_message, running the background tasks alongside.
+    _publish(channel, msg, key=None):
+        Queues a message to be published on Redis by the publisher task, conflating it if it has a key.
+    metrics():
+        Yields the metrics of the client, including the ones of its publisher task.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructs all the necessary attributes for the AsyncCoreWS object.
+        Takes the same parameters as the exchange client it is mixed with.
+        """
+        super().__init__(*args, **kwargs)
+        self._outgoing = asyncio.Queue(maxsize=self._kwargs.get('publish_queue', 100000))
+        self._latest = {}
+
+        self.n_publish_failures = 0
+        self.n_publish_dropped = 0
+        self.n_cache_failures = 0
+
+    def _init_redis(self, redis_kwargs):
+
+        if self._do_cache or self._do_publish:
+            kw = redis_kwargs if redis_kwargs else {}
+            self._redis = redis.asyncio.Redis(**kw)
+
+    def _init_publisher(self, kwargs):
+        pass
+
+    async def run(self):
+        """
+        Runs the client. When sharding is enabled, runs each shard on the running event loop until they all stop.
+        The pending results are cached and the pending messages published when the client stops or is cancelled.
+        """
+        try:
+            if not self._sharded:
+                return await super().run()
+
+            await asyncio.gather(*(client.run() for client in self.shard()))
+        finally:
+            await self._flush_cache()
+            if self._do_publish:
+                batch = []
+                while not self._outgoing.empty():
+                    batch.append(self._outgoing.get_nowait())
+                await self._publish_batch(batch)
+
+            self.close()
+
+    async def _loop(self):
+        """
+        Receives frames and hands them over to _process, with their receive time when latency is set.
+        Keep-alive signals, caching and publishing run as tasks for as long as the loop runs.
+        """
+        tasks = [asyncio.create_task(self._keep_alive_task())]
+
+        if self._do_publish:
+            tasks.append(asyncio.create_task(self._publish_task()))
+        if self._do_cache:
+            tasks.append(asyncio.create_task(self._cache_task()))
+
+        clock = time.time_ns
+
+        try:
+            while self.latency is None:
+                self._process(await self._rcv_frame())
+
+            while True:
+                frame = await self._rcv_frame()
+                self._process(frame, clock())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _keep_alive_task(self):
+        while True:
+            await asyncio.sleep(self._heart_timer.limit)
+            self._keep_alive()
+
+    async def _cache_task(self):
+        while True:
+            await asyncio.sleep(self._redis_timer.limit)
+            await self._flush_cache()
+
+    async def _flush_cache(self):
+        """
+        Caches the results updated since the last call in one pipeline, counting and printing a failure.
+        """
+        if not self._do_cache or not self._dirty:
+            return
+
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                n_markets = self._queue_cache(pipe)
+                if n_markets:
+                    start = time.perf_counter_ns()
+                    await pipe.execute()
+                    self._count_flush(n_markets, time.perf_counter_ns() - start)
+        except Exception as e:
+            self.n_cache_failures += 1
+            print(f"Error: caching failed: {e}")
+
+    async def _publish_task(self):
+        max_batch = self._kwargs.get('publish_batch', 500)
+
+        while True:
+            batch = [await self._outgoing.get()]
+            while len(batch) < max_batch and not self._outgoing.empty():
+                batch.append(self._outgoing.get_nowait())
+
+            await self._publish_batch(batch)
+
+    async def _publish_batch(self, batch):
+        """
+        Publishes a batch of queued messages in one pipeline, counting and printing a failure.
+        """
+        if not batch:
+            return
+
+        # the markers are all resolved before anything can fail, so that no key is left without one
+        batch = [self._latest.pop(msg) if channel is None else (channel, msg) for channel, msg in batch]
+
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for channel, msg in batch:
+                    try:
+                        data = serialize(msg)
+                    except Exception as e:
+                        print(f"Error: serializing a message to {channel} failed: {e}")
+                        continue
+
+                    pipe.publish(f'{self._publish_channel}:{channel}', data)
+
+                start = time.perf_counter_ns()
+                await pipe.execute()
+                self.redis_latency['publish'].record(time.perf_counter_ns() - start)
+        except Exception as e:
+            self.n_publish_failures += 1
+            print(f"Error: publishing {len(batch)} messages failed: {e}")
+
+    def _publish(self, channel, msg, key=None):
+        """
+        Queues a message to be published on Redis by the publisher task. A message with a conflation key replaces
+        the pending message of its key, the queue then holding a (None, key) marker, which the task replaces with
+        the latest message of the key when it sends the batch. The message is dropped if the queue is full.
+
+        Parameters
+        ----------
+        channel : str
+            the channel to publish the message to
+        msg : dict
+            the message to publish
+        key : tuple
+            the (channel, market) conflation key of the message, when its channel is conflated (default is None)
+        """
+        if not self._do_publish:
+            return
+
+        if key is not None and key in self._latest:
+            self._latest[key] = (channel, msg)
+            self.conflated[channel] = self.conflated.get(channel, 0) + 1
+            return
+
+        try:
+            self._outgoing.put_nowait((channel, msg) if key is None else (None, key))
+        except asyncio.QueueFull:
+            self.n_publish_dropped += 1
+            return
+
+        if key is not None:
+            self._latest[key] = (channel, msg)
+
+    def metrics(self):
+        """
+        Yields the metrics of the client, including the ones of its publisher task, see crypto_ws.metrics.
+
+        Yields
+        ------
+        tuple
+            the name, labels and value of each sample
+        """
+        yield from super().metrics()
+
+        exchange = {'exchange': self.EXCHANGE or type(self).__name__}
+
+        if self._do_publish:
+            yield 'crypto_ws_publish_failures_total', exchange, self.n_publish_failures
+            yield 'crypto_ws_publish_dropped_total', exchange, self.n_publish_dropped
+            yield 'crypto_ws_publish_queue_depth', exchange, self._outgoing.qsize()
+
+        if self._do_cache:
+            yield 'crypto_ws_cache_failures_total', exchange, self.n_cache_failures
+
+
+def run_clients(clients):
+    """
+    Runs several asyncio clients on a single event loop until they all stop.
+
+    Parameters
+    ----------
+    clients : list
+        the AsyncCoreWS clients to run
+    """
+    async def _main():
+        await asyncio.gather(*(client.run() for client in clients))
+
+    asyncio.run(_main())
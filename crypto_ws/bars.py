@@ -0,0 +1,170 @@
+UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_interval(interval):
+    """
+    Parses a bar interval, e.g. '1s', '5m', '4h', '1d', or a number of seconds.
+
+    Parameters
+    ----------
+    interval : str or int
+        the interval
+
+    Returns
+    -------
+    tuple
+        the label of the interval and its length in nanoseconds
+    """
+    if isinstance(interval, (int, float)):
+        return f'{interval:g}s', int(interval * 10**9)
+
+    try:
+        return interval, int(float(interval[:-1]) * UNITS[interval[-1]] * 10**9)
+    except (KeyError, ValueError):
+        raise ValueError(f"Unknown bar interval {interval!r}, expected e.g. '1s', '5m', '4h' or '1d'") from None
+
+
+class Bar:
+    """
+    A class used to represent an OHLCV bar built from trades.
+
+    ...
+
+    Attributes
+    ----------
+    interval : str
+        the label of the interval, e.g. '1m'
+    start : int
+        the epoch start time of the bar, in nanoseconds
+    end : int
+        the epoch end time of the bar, excluded, in nanoseconds
+    last_ts : int
+        the epoch time of the last trade of the bar, in nanoseconds
+    open, high, low, close : float
+        the prices of the bar
+    volume : float
+        the traded size
+    turnover : float
+        the traded notional, sum of price times size
+    count : int
+        the number of trades
+    closed : bool
+        True once a trade of a later bar was received
+    """
+
+    __slots__ = ('interval', 'start', 'end', 'last_ts', 'open', 'high', 'low', 'close', 'volume', 'turnover',
+                 'count', 'closed')
+
+    def __init__(self, interval, start, end, ts, price, size):
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.last_ts = ts
+        self.open = self.high = self.low = self.close = price
+        self.volume = size
+        self.turnover = price * size
+        self.count = 1
+        self.closed = False
+
+    @property
+    def vwap(self):
+        """
+        Returns the volume weighted average price of the bar.
+        """
+        return self.turnover / self.volume if self.volume else self.close
+
+    def update(self, ts, price, size):
+        """
+        Adds a trade to the bar.
+
+        Parameters
+        ----------
+        ts : int
+            the epoch time of the trade, in nanoseconds
+        price : float
+            the price of the trade
+        size : float
+            the size of the trade
+        """
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+
+        self.close = price
+        self.last_ts = ts
+        self.volume += size
+        self.turnover += price * size
+        self.count += 1
+
+
+class BarAggregator:
+    """
+    A class used to build the OHLCV bars of a market, for several intervals, incrementally from its trades.
+
+    ...
+
+    Bars are aligned on the epoch, e.g. 1m bars start on the minute, and only exist for the intervals with
+    trades. A bar is closed when the first trade of a later bar is received.
+
+    Attributes
+    ----------
+    intervals : list
+        the (label, length in nanoseconds) of each interval
+
+    Methods
+    -------
+    update(rows):
+        Adds trades to the bars.
+    """
+
+    def __init__(self, intervals):
+        """
+        Constructs all the necessary attributes for the BarAggregator object.
+
+        Parameters
+        ----------
+            intervals : list
+                the intervals of the bars, e.g. ['1s', '1m'], see parse_interval
+        """
+        self.intervals = [parse_interval(interval) for interval in intervals]
+        self._bars = [None] * len(self.intervals)
+
+    def update(self, rows):
+        """
+        Adds trades to the bars.
+
+        Parameters
+        ----------
+        rows : list
+            the (ts, price, size, ...) tuples of the trades, ts being the epoch time in nanoseconds
+
+        Returns
+        -------
+        list
+            the bars closed by the trades, then the current bar of each interval which received trades
+        """
+        closed, current = [], {}
+
+        for idx, (label, length) in enumerate(self.intervals):
+            bar = self._bars[idx]
+
+            for row in rows:
+                ts, price, size = row[0], row[1], row[2]
+
+                if bar is None or ts >= bar.end:
+                    if bar is not None:
+                        bar.closed = True
+                        closed.append(bar)
+
+                    start = ts - ts % length
+                    bar = Bar(label, start, start + length, ts, price, size)
+
+                else:
+                    bar.update(ts, price, size)
+
+                current[idx] = bar
+
+            self._bars[idx] = bar
+
+        return closed + list(current.values())
@@ -1,20 +1,29 @@
-import datetime as dt
-
+from crypto_ws.async_core_ws import AsyncCoreWS
 from crypto_ws.core_ws import CoreWS
+from crypto_ws.parsing import compile_plan, run_plan
+from crypto_ws.utils import format_ms
 
 
 class BinanceWS(CoreWS):
 
     CACHING_KEY = 'default_redis_caching_key:binance'
     PUBLISH_CHANNEL = 'default_redis_publish_key:binance'
+    EXCHANGE = 'binance'
 
     CHANNELS = ['trade', 'ticker', 'index', 'kline_1m', 'kline_5m']
 
+    MAX_SUBSCRIPTIONS = 1024
+    CHANNEL_RATES = {'trade': 20, 'ticker': 1, 'index': 1, 'kline': 0.5}
+    CONFLATE = ('ticker', 'index')
+    CONFLATE_FRAMES = ('ticker', 'index')
+
     def __init__(self, url='wss://stream.binance.com:9443/ws', markets=('btcusdt', 'ethusdt'), channels=('trade',),
                  caching_freq=0.25, translate=None, redis_kwargs=None, **kwargs):
 
         super().__init__(url, markets, channels, caching_freq, translate, redis_kwargs, **kwargs)
 
+        self._plans = self._compile(Parser, (TradeParser, TickerParser, IndexParser, BarParser))
+
     # ----
 
     def _keep_alive(self):
@@ -24,54 +33,78 @@ class BinanceWS(CoreWS):
 
     def _subscribe(self):
 
-        subscriptions = [[f"{m}@{c}" for m in self.markets] for c in self.channels]
+        subscriptions = {}
+        for m, c in self.subscriptions:
+            subscriptions.setdefault(c, []).append(f"{m}@{c}")
 
-        for idx, subscription in enumerate(subscriptions):
+        for idx, subscription in enumerate(subscriptions.values()):
             self._send({'method': 'SUBSCRIBE', 'params': subscription, 'id': idx})
 
-    def _loop(self):
+    def _on_message(self, data):
+
+        if isinstance(data, dict) and 'e' in data.keys():
+
+            channel = data['e']
+            market = self._do_translate(data['s'].lower())
+
+            if channel == '24hrTicker':
+                channel = 'ticker'
+                msg = TickerParser.parse(data, plan=self._plans[TickerParser])
 
-        while True:
+            elif channel == 'trade':
+                msg = TradeParser.parse(data, plan=self._plans[TradeParser])
+                self._record_trades(market, TradeParser.rows, data)
 
-            self._heart_beat()
-            data = self._rcv()
+            elif channel == 'index':
+                msg = TradeParser.parse(data, plan=self._plans[TradeParser])
 
-            if isinstance(data, dict) and 'e' in data.keys():
+            elif 'kline' in channel:
+                channel = f"kline_{data['k']['i']}"
+                msg = BarParser.parse(data, plan=self._plans[BarParser])
+            else:
+                return
 
-                channel = data['e']
-                market = self._do_translate(data['s'].lower())
+            if not msg:
+                return
 
-                if channel == '24hrTicker':
-                    channel = 'ticker'
-                    msg = TickerParser.parse(data, subset=None)
+            self._handle(channel, market, msg)
 
-                elif channel == 'trade':
-                    msg = TradeParser.parse(data, subset=None)
+    def _from_bar(self, bar, market):
+        return BarParser.from_bar(bar, self._stamp_ns, market.upper())
 
-                elif channel == 'index':
-                    msg = TradeParser.parse(data, subset=None)
+    def _event_time(self, data):
+        return data['E'] * 10**6 if isinstance(data, dict) and 'E' in data else None
 
-                elif 'kline' in channel:
-                    channel = f"kline_{data['k']['i']}"
-                    msg = BarParser.parse(data, subset=None)
-                else:
-                    continue
+    def _frame_key(self, data):
 
-                if not msg:
-                    continue
+        if isinstance(data, dict) and 'e' in data and 's' in data:
+            channel = data['e']
+            if channel == '24hrTicker':
+                channel = 'ticker'
+            elif channel == 'kline':
+                channel = f"kline_{data['k']['i']}"
 
-                print({market: msg}) if self.verbose > 0 else None
+            return channel, self._do_translate(data['s'].lower())
 
-                self.results[channel].update({market: msg})
-                self._publish(channel, {market: msg})
-                self._cache()
+
+class AsyncBinanceWS(AsyncCoreWS, BinanceWS):
+    pass
 
 
 class Parser:
 
     @staticmethod
     def parse_datetime(x):
-        return dt.datetime.utcfromtimestamp(int(str(x)[:-3])).strftime('%Y-%m-%d %H:%M:%S.%MS')
+        return format_ms(x)
+
+    @staticmethod
+    def parse_epoch(x):
+        return int(x)
+
+    @staticmethod
+    def compile(mapping, subset=None, timestamps='str', lazy=False):
+        stamp = Parser.parse_epoch if timestamps == 'int' else Parser.parse_datetime
+        return compile_plan(mapping, subset, (Parser.parse_datetime, stamp), lazy)
 
 
 class TradeParser:
@@ -89,14 +122,20 @@ class TradeParser:
         'S': ['side', int]
     }
 
+    subset = ['event_type', 'event_time_utc', 'symbol', 'price', 'quantity', 'side', 'trade_id']
+    plan = Parser.compile(map, subset)
+
     @staticmethod
-    def parse(msg, subset=None):
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TradeParser.map, subset) if subset else TradeParser.plan
 
-        subset = subset if subset else ['event_type', 'event_time_utc', 'symbol', 'price', 'quantity', 'side',
-                                        'trade_id']
+        return run_plan(plan, msg)
 
-        return {key_value_pair[0]: key_value_pair[1](v) for k, v in msg.items()
-                if (key_value_pair := TradeParser.map.get(k, k))[0] in subset}
+    @staticmethod
+    def rows(msg):
+        # the buyer being the maker means the taker sold
+        return [(msg['T'] * 10**6, float(msg['p']), float(msg['q']), -1 if msg['m'] else 1, msg['t'])]
 
 
 class TickerParser:
@@ -133,15 +172,16 @@ class TickerParser:
         'eep': ['estimated_strike_price', float]
     }
 
-    @staticmethod
-    def parse(msg, subset=None):
+    subset = ['event_type', 'event_time_utc', 'open', 'high', 'low', 'close', 'price_change_pct',
+              'traded_volume_asset', 'bid', 'ask', 'bid_quantity', 'ask_quantity', 'symbol']
+    plan = Parser.compile(map, subset)
 
-        subset = subset if subset else ['event_type', 'event_time_utc', 'open', 'high', 'low', 'close',
-                                        'price_change_pct', 'traded_volume_asset', 'bid', 'ask', 'bid_quantity',
-                                        'ask_quantity', 'symbol']
+    @staticmethod
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TickerParser.map, subset) if subset else TickerParser.plan
 
-        return {key_value_pair[0]: key_value_pair[1](v) for k, v in msg.items()
-                if (key_value_pair := TickerParser.map.get(k, k))[0] in subset}
+        return run_plan(plan, msg)
 
 
 class IndexParser:
@@ -153,14 +193,15 @@ class IndexParser:
         'p': ['price', float]
     }
 
-    @staticmethod
-    def parse(msg, subset=None):
+    subset = ['event_type', 'event_time_utc', 'symbol', 'price', 'quantity', 'side', 'trade_id']
+    plan = Parser.compile(map, subset)
 
-        subset = subset if subset else ['event_type', 'event_time_utc', 'symbol', 'price', 'quantity', 'side',
-                                        'trade_id']
+    @staticmethod
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(IndexParser.map, subset) if subset else IndexParser.plan
 
-        return {key_value_pair[0]: key_value_pair[1](v) for k, v in msg.items()
-                if (key_value_pair := IndexParser.map.get(k, k))[0] in subset}
+        return run_plan(plan, msg)
 
 
 class BarParser:
@@ -186,23 +227,29 @@ class BarParser:
         'Q': ['number_trades_taker', int]
     }
 
-    @staticmethod
-    def parse(msg, subset=None):
+    subset = ['event_type', 'event_time_utc', 'symbol', 'start_time_utc', 'end_time_utc', 'period', 'open', 'high',
+              'low', 'close', 'number_trades', 'current_candle_completed']
+    plan = Parser.compile(map, subset)
 
-        subset = subset if subset else ['event_type', 'event_time_utc', 'symbol', 'start_time_utc', 'end_time_utc',
-                                        'period', 'open', 'high', 'low', 'close', 'number_trades',
-                                        'current_candle_completed']
-        msg.update(msg['k'])
-        msg.pop('k')
+    @staticmethod
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(BarParser.map, subset) if subset else BarParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg.items()
-               if (key_value_pair := BarParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, {**msg, **msg['k']})
 
         if dct['current_candle_completed']:
             return dct
 
         return None
 
+    @staticmethod
+    def from_bar(bar, stamp, symbol):
+        return {'event_type': 'kline', 'event_time_utc': stamp(bar.last_ts), 'symbol': symbol,
+                'start_time_utc': stamp(bar.start), 'end_time_utc': stamp(bar.end - 10**6), 'period': bar.interval,
+                'open': bar.open, 'high': bar.high, 'low': bar.low, 'close': bar.close, 'number_trades': bar.count,
+                'current_candle_completed': bar.closed}
+
 
 if __name__ == "__main__":
 
@@ -1,24 +1,59 @@
-import datetime as dt
-
 import numpy as np
 
+from crypto_ws.async_core_ws import AsyncCoreWS
 from crypto_ws.core_ws import CoreWS
+from crypto_ws.depth import Depth
+from crypto_ws.orderbook import OrderBook
+from crypto_ws.parsing import compile_plan, run_plan
+from crypto_ws.utils import format_ms
 
 
 class BybitWS(CoreWS):
+    """
+    A class used to represent a Bybit WebSocket client.
+
+    ...
+
+    The orderbook channels are maintained as local order books, one per topic, built from the snapshots and
+    updated with the deltas. A delta which does not follow the update id of the book resets it and the topic is
+    resubscribed to, so that a new snapshot is sent. The published messages hold the best levels of the book as a
+    Depth, as many as the book_depth keyword argument (default is None, all of them).
+
+    Attributes
+    ----------
+    books : dict
+        the local order books, keyed by topic, e.g. 'orderbook.50.BTCUSDT'
+
+    Methods
+    -------
+    book(market, channel='orderbook.50'):
+        Returns the local order book of a market.
+    """
 
     CACHING_KEY = 'default_redis_caching_key:bybit'
     PUBLISH_CHANNEL = 'default_redis_publish_key:bybit'
+    EXCHANGE = 'bybit'
 
     CHANNELS = ['publicTrade', 'tickers', 'orderbook.1', 'orderbook.50',
                 'kline.1', 'kline.3', 'kline.5', 'kline.15', 'kline.30', 'kline.60', 'kline.120', 'kline.240',
                 'kline.360', 'kline.720', 'kline.D', 'kline.W', 'kline.M']
 
+    CHANNEL_RATES = {'publicTrade': 20, 'tickers': 20, 'orderbook.1': 100, 'orderbook.50': 50, 'kline': 1}
+    # orderbook messages hold the best levels of the local book, each one superseding the previous one, but the
+    # orderbook frames are deltas of the book, which cannot be skipped
+    CONFLATE = ('tickers', 'orderbook')
+    CONFLATE_FRAMES = ('tickers',)
+
     def __init__(self, url='wss://stream.bybit.com/v5/public/spot', markets=('BTCUSDT', 'ETHUSDT'),
                  channels=('tickers',), caching_freq=0.25, translate=None, redis_kwargs=None, **kwargs):
 
         super().__init__(url, markets, channels, caching_freq, translate, redis_kwargs, **kwargs)
 
+        self.books = {}
+        self._book_depth = kwargs.get('book_depth')
+
+        self._plans = self._compile(Parser, (TickerParser, BarParser, DepthParser, TradeParser))
+
     # ----
 
     def _keep_alive(self):
@@ -28,52 +63,139 @@ class BybitWS(CoreWS):
 
     def _subscribe(self):
 
-        for m in self.markets:
-            for c in self.channels:
-                payload = {"op": "subscribe", "args": [f"{c}.{m}"]}
-                self._send(payload)
+        for m, c in self.subscriptions:
+            payload = {"op": "subscribe", "args": [f"{c}.{m}"]}
+            self._send(payload)
+
+    def _resubscribe(self, topic):
+
+        self._send({"op": "unsubscribe", "args": [topic]})
+        self._send({"op": "subscribe", "args": [topic]})
+
+    def book(self, market, channel='orderbook.50'):
+        """
+        Returns the local order book of a market.
+
+        Parameters
+        ----------
+        market : str
+            the market, as named by the exchange
+        channel : str
+            the orderbook channel (default is 'orderbook.50')
+
+        Returns
+        -------
+        OrderBook
+            the order book, None if no snapshot was received yet
+        """
+        return self.books.get(f'{channel}.{market}')
 
-    def _loop(self):
-        while True:
+    def _on_book(self, data):
+        """
+        Applies an orderbook snapshot or delta to the local book of its topic.
 
-            data = self._rcv()
-            self._heart_beat()
+        Parameters
+        ----------
+        data : dict
+            the decoded frame
 
-            if isinstance(data, dict) and 'data' in data.keys():
+        Returns
+        -------
+        dict
+            the best levels of the book as a Depth, None if the book is waiting for a snapshot
+        """
+        topic, d = data['topic'], data['data']
+
+        book = self.books.get(topic)
+        if book is None:
+            book = self.books[topic] = OrderBook()
+
+        u = d['u']
+
+        # u == 1 means the exchange restarted its book: the delta is a snapshot
+        if data['type'] == 'snapshot' or u == 1:
+            book.snapshot(d['b'], d['a'], u)
+
+        elif not book.synced:
+            return None
+
+        elif u != book.update_id + 1:
+            print(f'Bybit: update {u} of {topic} does not follow {book.update_id}, resubscribing')
+            book.reset()
+            self._resubscribe(topic)
+            return None
+
+        else:
+            book.apply(d['b'], d['a'], u)
+
+        plan = self._plans[DepthParser]
+
+        dct = run_plan(plan, d)
+        dct['depth'] = book.to_depth(self._book_depth)
+        dct['respond_time_utc'] = plan.stamp(data['ts'])
+
+        return dct
 
-                _ = data['topic'].split('.')
-                channel = '.'.join(_[:-1])
-                market = self._do_translate(_[-1])
+    def _on_message(self, data):
 
-                if 'tickers' in channel:
-                    msg = TickerParser.parse(data, subset=None)
+        if isinstance(data, dict) and 'data' in data.keys():
 
-                elif 'kline.' in channel:
-                    msg = BarParser.parse(data, subset=None)
+            _ = data['topic'].split('.')
+            channel = '.'.join(_[:-1])
+            market = self._do_translate(_[-1])
 
-                elif 'orderbook.' in channel:
-                    msg = DepthParser.parse(data, subset=None)
+            if 'tickers' in channel:
+                msg = TickerParser.parse(data, plan=self._plans[TickerParser])
 
-                elif 'publicTrade' in channel:
-                    msg = TradeParser.parse(data, subset=None)
+            elif 'kline.' in channel:
+                msg = BarParser.parse(data, plan=self._plans[BarParser])
 
-                else:
-                    continue
+            elif 'orderbook.' in channel:
+                msg = self._on_book(data)
 
-                if not msg:
-                    continue
+            elif 'publicTrade' in channel:
+                msg = TradeParser.parse(data, plan=self._plans[TradeParser])
+                self._record_trades(market, TradeParser.rows, data)
 
-                print({market: msg}) if self.verbose > 0 else None
+            else:
+                return
 
-                self.results[channel].update({market: msg})
-                self._publish(channel, {market: msg})
-                self._cache()
+            if not msg:
+                return
+
+            self._handle(channel, market, msg)
+
+    def _from_bar(self, bar, market):
+        return BarParser.from_bar(bar, self._stamp_ns)
+
+    def _event_time(self, data):
+        return int(data['ts']) * 10**6 if isinstance(data, dict) and 'ts' in data else None
+
+    def _frame_key(self, data):
+
+        # the tickers of the derivatives streams are deltas after the first snapshot
+        if isinstance(data, dict) and 'topic' in data and data.get('type') == 'snapshot':
+            channel, _, market = data['topic'].rpartition('.')
+            return channel, self._do_translate(market)
+
+
+class AsyncBybitWS(AsyncCoreWS, BybitWS):
+    pass
 
 
 class Parser:
     @staticmethod
     def parse_datetime(x):
-        return dt.datetime.utcfromtimestamp(int(str(x)[:-3])).strftime('%Y-%m-%d %H:%M:%S.%MS')
+        return format_ms(x)
+
+    @staticmethod
+    def parse_epoch(x):
+        return int(x)
+
+    @staticmethod
+    def compile(mapping, subset=None, timestamps='str', lazy=False):
+        stamp = Parser.parse_epoch if timestamps == 'int' else Parser.parse_datetime
+        return compile_plan(mapping, subset, (Parser.parse_datetime, stamp), lazy)
 
     @staticmethod
     def string2float(x):
@@ -97,14 +219,17 @@ class TickerParser:
         'usdIndexPrice': ['usd_index_price', Parser.string2float],
     }
 
+    extras = ['respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in TickerParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TickerParser.map, subset) if subset else TickerParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['data'].items()
-               if (key_value_pair := TickerParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['data'])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
@@ -124,38 +249,45 @@ class BarParser:
         'timestamp': ['timestamp', Parser.parse_datetime],
     }
 
+    extras = ['respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in BarParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(BarParser.map, subset) if subset else BarParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['data'][0].items()
-               if (key_value_pair := BarParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['data'][0])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
+    @staticmethod
+    def from_bar(bar, stamp):
+        return {'start': stamp(bar.start), 'end': stamp(bar.end - 10**6), 'interval': bar.interval,
+                'open': bar.open, 'close': bar.close, 'high': bar.high, 'low': bar.low, 'volume': bar.volume,
+                'turnover': bar.turnover, 'confirm': bar.closed, 'timestamp': stamp(bar.last_ts),
+                'respond_time_utc': stamp(bar.last_ts)}
+
 
 class DepthParser:
     map = {
-        0: ['price', float],
-        1: ['volume', float],
+        'u': ['update_id', int],
+        'seq': ['seq', int],
     }
 
-    @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in DepthParser.map.values()]
-
-        if msg['data']['u'] == 1:
-            return None
-
-        asks = [{key_value_pair[0]: key_value_pair[1](k) for idx, k in enumerate(_)
-                if (key_value_pair := DepthParser.map.get(idx, idx))[0] in subset} for _ in msg['data']['a']]
+    extras = ['depth', 'respond_time_utc']
+    plan = Parser.compile(map)
 
-        bids = [{key_value_pair[0]: key_value_pair[1](k) for idx, k in enumerate(_)
-                if (key_value_pair := DepthParser.map.get(idx, idx))[0] in subset} for _ in msg['data']['b']]
+    @staticmethod
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(DepthParser.map, subset) if subset else DepthParser.plan
 
-        dct = {'bids': bids, 'asks': asks, 'respond_time_utc': Parser.parse_datetime(msg['ts'])}
+        dct = run_plan(plan, msg['data'])
+        dct['depth'] = Depth.from_levels(msg['data']['b'], msg['data']['a'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
@@ -171,22 +303,24 @@ class TradeParser:
         'BT': ['is_block_trade', bool],
     }
 
-    @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in TradeParser.map.values()]
-
-        ls = []
-        for d in msg['data']:
+    plan = Parser.compile(map)
 
-            dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in d.items()
-                   if (key_value_pair := TradeParser.map.get(k, k))[0] in subset}
+    @staticmethod
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TradeParser.map, subset) if subset else TradeParser.plan
 
-            ls.append(dct)
+        ls = [run_plan(plan, d) for d in msg['data']]
 
-        dct = {'respond_time_utc': Parser.parse_datetime(msg['ts']), 'trade': ls}
+        dct = {'respond_time_utc': plan.stamp(msg['ts']), 'trade': ls}
 
         return dct
 
+    @staticmethod
+    def rows(msg):
+        return [(d['T'] * 10**6, float(d['p']), float(d['v']), 1 if d['S'] == 'Buy' else -1,
+                 int(d['i']) if d['i'].isdigit() else -1) for d in msg['data']]
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,46 @@
+import argparse
+import json
+
+from crypto_ws.supervisor import Supervisor
+
+
+def main(argv=None):
+    """
+    Entry point of the crypto-ws command: runs the clients of a JSON configuration file in worker processes.
+
+    Example of configuration:
+
+        {
+            "sinks": {"redis": {"host": "localhost"}, "do_cache": true, "caching_key": "crypto"},
+            "clients": [
+                {"exchange": "binance", "markets": ["btcusdt", "ethusdt"], "channels": ["trade"], "shards": 2},
+                {"exchange": "kraken", "markets": ["BTC/USD"], "channels": ["spread"]}
+            ],
+            "report_freq": 10
+        }
+
+    Parameters
+    ----------
+    argv : list
+        the command line arguments (default is None, sys.argv is used)
+    """
+    parser = argparse.ArgumentParser(prog='crypto-ws', description='Runs crypto websocket clients in worker processes.')
+    parser.add_argument('config', help='path to the JSON configuration file')
+    parser.add_argument('--report-freq', type=float, default=None, help='seconds between throughput reports')
+    parser.add_argument('--no-pin', action='store_true', help='do not pin the workers on CPUs')
+    args = parser.parse_args(argv)
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    if args.report_freq is not None:
+        config['report_freq'] = args.report_freq
+    if args.no_pin:
+        config['pin'] = False
+
+    Supervisor.from_config(config).run()
+
+
+if __name__ == "__main__":
+
+    main()
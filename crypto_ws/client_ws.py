@@ -3,6 +3,8 @@ import time
 
 import websocket
 
+from crypto_ws.decoders import get_decoder
+
 
 class WebsocketClient:
     """
@@ -18,6 +20,12 @@ class WebsocketClient:
         a WebSocket object representing the connection to the server
     _options :dict
         a dict of options for websocket connection
+    _loads : callable
+        the function deserializing the raw frames
+    _recorder : Recorder
+        the recorder of the raw frames received, None if they are not recorded
+    n_reconnects : int
+        the number of times the connection was reestablished after a failure
 
     Methods
     -------
@@ -29,6 +37,10 @@ class WebsocketClient:
         Sends a message over the WebSocket connection.
     rcv():
         Receives a message over the WebSocket connection.
+    rcv_frame():
+        Receives a raw frame over the WebSocket connection.
+    decode(msg):
+        Deserializes a raw frame received over the WebSocket connection.
     run():
         Runs the WebSocket client, attempts to establish a connection and handle exceptions.
     subscribe():
@@ -37,7 +49,7 @@ class WebsocketClient:
         Placeholder method to be overridden in subclasses, for handling incoming data.
     """
 
-    def __init__(self, url=None, **options):
+    def __init__(self, url=None, decoder='auto', recorder=None, **options):
         """
         Constructs all the necessary attributes for the WebSocketClient object.
 
@@ -45,10 +57,17 @@ class WebsocketClient:
         ----------
             url : str
                 the URL of the WebSocket server
+            decoder : str or callable
+                the JSON decoder of the frames, see crypto_ws.decoders.get_decoder (default is 'auto')
+            recorder : Recorder
+                a recorder to hand every raw frame received to, see crypto_ws.recorder (default is None)
         """
         self.url = url
         self._socket = None
         self._options = options
+        self.n_reconnects = 0
+        self._loads = get_decoder(decoder)
+        self._recorder = recorder
 
     def _connect(self):
         """
@@ -88,9 +107,40 @@ class WebsocketClient:
         dict
             The received message, deserialized from JSON.
         """
-        msg = self._socket.recv()
-        msg = msg if msg != '' else '{}'
-        return json.loads(msg)
+        return self._decode(self._rcv_frame())
+
+    def _rcv_frame(self):
+        """
+        Receives a raw frame over the WebSocket connection, handing it to the recorder if any.
+
+        Returns
+        -------
+        bytes or str
+            The raw frame, empty for control frames.
+        """
+        opcode, frame = self._socket.recv_data()
+
+        if self._recorder is not None:
+            self._recorder.record(opcode, frame)
+
+        return frame if opcode in (websocket.ABNF.OPCODE_TEXT, websocket.ABNF.OPCODE_BINARY) else b''
+
+    def _decode(self, msg):
+        """
+        Deserializes a raw frame received over the WebSocket connection.
+        To be overridden in subclasses receiving non JSON-text frames.
+
+        Parameters
+        ----------
+        msg : bytes or str
+            The raw frame, as returned by the socket.
+
+        Returns
+        -------
+        dict
+            The frame, deserialized from JSON by the client decoder.
+        """
+        return self._loads(msg)
 
     def run(self):
         """
@@ -112,6 +162,7 @@ class WebsocketClient:
                 print(f"Error: {e}")
                 time.sleep(5)
                 cnt += 1
+                self.n_reconnects += 1
                 self._connect()
 
     def _subscribe(self):
@@ -1,7 +1,22 @@
+import collections
+import concurrent.futures
 import json
+import threading
+import time
+
 import redis
+from crypto_ws.bars import BarAggregator
 from crypto_ws.client_ws import WebsocketClient
-from crypto_ws.utils import Timer, obj_to_list
+from crypto_ws.latency import Histogram, LatencyTracker, dump_on_signal
+from crypto_ws.metrics import registry
+from crypto_ws.parsing import record_type
+from crypto_ws.publisher import BatchPublisher
+from crypto_ws.recorder import Recorder
+from crypto_ws.ring import RingQueue
+from crypto_ws.scheduler import scheduler
+from crypto_ws.sharding import plan_shards
+from crypto_ws.trades import TradeBuffer
+from crypto_ws.utils import Timer, format_ns, obj_to_list, serialize
 
 
 class CoreWS(WebsocketClient):
@@ -16,25 +31,95 @@ class CoreWS(WebsocketClient):
         a default string to use as a key when caching data to Redis
     PUBLISH_CHANNEL : str
         a default string to use as a channel when publishing data to Redis
+    MAX_SUBSCRIPTIONS : int
+        the maximum number of subscriptions the exchange accepts on one connection, None if unlimited
+    CHANNEL_RATES : dict
+        the relative expected message rate of each channel, keyed by channel prefix, used to balance shards
+    EPOCH_UNIT : int
+        the number of nanoseconds per unit of the integer timestamps of the exchange
+    EXCHANGE : str
+        the name of the exchange in the metrics
+    CONFLATE : tuple
+        the prefixes of the channels conflated by default with conflate=True, whose messages are full snapshots,
+        e.g. tickers and best bid and offer, never trades or order book updates
+    CONFLATE_FRAMES : tuple
+        the prefixes of the channels whose raw frames are replaced by a newer one of the same market in the read
+        ring with overflow='conflate', whose frames are full snapshots on their own, never incremental book
+        updates, even if their messages are conflated by CONFLATE
+    n_messages : int
+        the number of messages handled since the client was created
+    n_frames, n_bytes : int
+        the number of frames and bytes received
+    n_skipped : int
+        the number of frames received which produced no message, e.g. subscription replies and heartbeats
+    n_failures : int
+        the number of frames which failed to decode or parse
+    n_flushes, n_flushed : int
+        the number of cache pipelines sent to Redis, and of market results they held
+    counts : dict
+        the [messages, bytes] handled per (channel, market), the bytes being those of the frames parsed
+    conflated : dict
+        the number of messages of each channel replaced by a newer one before they were published
+    redis_latency : dict
+        the Histogram of the latencies in nanoseconds of the 'cache' pipelines and 'publish' commands
+    trades : dict
+        the TradeBuffer of each (translated) market, empty unless trade_buffer is set
+    latency : LatencyTracker
+        the latency histograms of the stages of the messages per channel, None unless latency is set
 
     Methods
     -------
     __init__(url='', markets=('BTC/USD',), channels=('ticker',),
              caching_freq=0.25, translate=None, redis_kwargs=None, **kwargs):
         Constructs all the necessary attributes for the CoreWS object.
-    _heart_beat():
-        Checks if it's time to send a keep-alive signal.
+    _compile(parser, classes):
+        Compiles the plans of the parsers of the exchange.
     _do_translate(market):
         Translates a market name using a provided translation dictionary.
     _cache():
-        Caches the results in Redis if the cache time limit has been reached.
-    _publish(channel, msg):
+        Caches the results updated since the last call in Redis.
+    _publish(channel, msg, key=None):
         Publishes a message to a channel on Redis.
+    _record_trades(market, rows, data):
+        Appends the trades of a message to the trade buffer and the bars of a market.
+    _from_bar(bar, market):
+        Converts a bar built from trades into a message, overridden in subclasses.
+    _event_time(data):
+        Returns the exchange event time of a decoded frame, overridden in subclasses.
+    metrics():
+        Yields the metrics of the client, see crypto_ws.metrics.
+    shard():
+        Splits the subscriptions of the client over several clients sharing its results.
+    run():
+        Runs the client, or all its shards when sharding is enabled.
+    _schedule():
+        Schedules the keep-alive signals and the caching of the results on the background scheduler.
+    close():
+        Publishes the pending messages, caches the pending results and writes the pending recorded frames.
+    _loop():
+        Receives frames and hands them to _process until the connection fails.
+    _pipelined_loop():
+        Receives frames in a reader thread, through a bounded ring, and hands them to _process.
+    _frame_key(data):
+        Returns the (channel, market) of a decoded frame, overridden in subclasses.
+    _process(frame, received=None, decoded=None):
+        Decodes a frame and hands it to _on_message, counting the skipped and failed frames.
+    _on_message(data):
+        Parses a decoded frame, to be overridden in subclasses.
+    _handle(channel, market, msg, state=None):
+        Stores, publishes and caches a parsed message.
     """
 
     CACHING_KEY = 'default_redis_caching_key'
     PUBLISH_CHANNEL = 'default_redis_publish_channel'
 
+    MAX_SUBSCRIPTIONS = None
+    CHANNEL_RATES = {}
+    EPOCH_UNIT = 10**6
+    EXCHANGE = ''
+    CONFLATE = ()
+    CONFLATE_FRAMES = ()
+
     def __init__(self, url='', markets=('BTC/USD',), channels=('ticker',),
                  caching_freq=0.25, translate=None, redis_kwargs=None, **kwargs):
         """
@@ -60,6 +145,71 @@ class CoreWS(WebsocketClient):
             a string defining a part of the key the data will be cached on in Redis
         publish_channel : str
             a string defining a part of the channel the data will be published on in Redis
+        subscriptions : list
+            the (market, channel) pairs to subscribe to (default is every market for every channel)
+        shards : int
+            the number of connections to spread the subscriptions over (default is 1)
+        market_rates : dict
+            the relative expected message rate of each market, used to balance shards (default is 1 for all)
+        publish_window : float
+            the time in seconds messages are batched for before being published in one pipeline, from a
+            background thread (default is None, messages are published one by one as they are received)
+        publish_batch : int
+            the maximum number of messages published in one pipeline (default is 500)
+        publish_queue : int
+            the maximum number of messages waiting to be published, receiving blocks beyond, or the messages are
+            dropped by the asyncio clients (default is 100000)
+        conflate : bool or list
+            True to conflate the channels of CONFLATE, or the prefixes of the channels to conflate: while a
+            message of a market waits to be published, a newer one of the same channel and market replaces it,
+            so that a slow Redis or consumer gets the latest values rather than a growing backlog. Only applies
+            to the batch publisher of publish_window and to the asyncio clients, which queue the messages, and
+            raises a ValueError otherwise (default is None, every message is published)
+        decoder : str or callable
+            the JSON decoder of the frames: 'json', 'orjson', 'auto' or a function (default is 'auto')
+        timestamps : str
+            'str' to output timestamps as UTC strings with milliseconds, 'int' to keep the raw integer epoch
+            timestamps of the exchange, in milliseconds (nanoseconds for Kraken) (default is 'str')
+        lazy : bool
+            True for the parsers to return LazyMessage views on the decoded frames, converting each field on
+            first access, instead of dicts, see crypto_ws.parsing; the views turn into dicts when cached or
+            published (default is False)
+        records : bool
+            True for the parsers to return compact Record objects, with a slot per field, instead of dicts, see
+            crypto_ws.parsing; the records turn into dicts when cached or published, so that they save memory on
+            the results held rather than on the handling of each message; the depth parsers keep returning dicts
+            (default is False)
+        trade_buffer : int
+            the number of trades to keep per market in self.trades, on top of the last trade message kept in
+            the results (default is None, no trades are kept)
+        record : str or Recorder
+            a directory to record the raw frames received to, in files prefixed by the name of the class, or a
+            Recorder, see crypto_ws.recorder (default is None, frames are not recorded)
+        bars : list
+            the intervals of the bars to build from the trades, e.g. ['1s', '1m'], each one handled as a
+            'bar_<interval>' channel, e.g. 'bar_1m', in the schema of the bar parser of the exchange
+            (default is None, no bars are built)
+        latency : bool or LatencyTracker
+            True to record the latency histograms of the stages of the messages in self.latency, printed on
+            SIGUSR1, or a LatencyTracker to record them in, see crypto_ws.latency (default is None)
+        read_queue : int
+            the capacity of the ring the frames are handed over through by a reader thread, which only receives
+            and timestamps them, so that a slow Redis or parser never delays the reading of the socket, see
+            _pipelined_loop (default is None, frames are received, decoded and parsed by the client thread, or
+            1000 with decode_workers), ignored by the asyncio clients
+        overflow : str
+            what the reader does with a frame when the ring is full: 'block' to wait for room, 'drop_oldest' to
+            drop the oldest frame, or 'conflate' to replace the pending frame of the same channel and market, for
+            the channels of CONFLATE_FRAMES, see crypto_ws.ring (default is 'block')
+        decode_workers : int
+            the number of threads decoding the frames, e.g. decompressing the gzip frames of Huobi, between the
+            reader thread and the client thread, which parses them in the order received (default is None).
+            Only the decompression runs in parallel, the rest of the decoding holding the GIL: the hand-over to
+            the workers costs more than inflating frames of a few kilobytes, so this only pays off for large
+            compressed frames, e.g. full depth snapshots. Frames are not conflated with decode_workers
+        metrics_port : int
+            the local port to serve the metrics of all the clients on, in the Prometheus text format, see
+            crypto_ws.metrics (default is None, the metrics are only available from crypto_ws.metrics.registry)
         **kwargs : dict
             a dictionary of keyword arguments to control the behaviour of the CoreWS object
         """
@@ -72,16 +222,105 @@ class CoreWS(WebsocketClient):
         self._redis = None
         self._init_redis(redis_kwargs)
 
+        self._publisher = None
+        self._init_publisher(kwargs)
+
         self.markets = obj_to_list(markets)
         self.channels = obj_to_list(channels)
+        self.subscriptions = kwargs.get('subscriptions', [(m, c) for m in self.markets for c in self.channels])
+
+        self._shards = kwargs.get('shards', 1)
+        self._market_rates = kwargs.get('market_rates', {})
+        self._redis_kwargs = redis_kwargs
+        self._kwargs = kwargs
 
         self._publish_channel = kwargs.get('publish_channel', self.PUBLISH_CHANNEL)
 
+        conflate = kwargs.get('conflate')
+        self._conflate = tuple(self.CONFLATE if conflate is True else conflate or ())
+        self._conflated_channels = {}
+
         self.results = kwargs.get('results', {c: {} for c in self.channels})
         self._translate = translate if translate else {}
         self.verbose = kwargs.get('verbose', 0)
+        self.timestamps = kwargs.get('timestamps', 'str')
+        self.lazy = kwargs.get('lazy', False)
+        self.records = kwargs.get('records', False)
+        self.n_messages = 0
+        self.n_frames = 0
+        self.n_bytes = 0
+        self.n_skipped = 0
+        self.n_failures = 0
+        self.n_flushes = 0
+        self.n_flushed = 0
+        self.counts = {}
+        self.conflated = {}
+        self.redis_latency = {'cache': Histogram(), 'publish': Histogram()}
+        self._frame_size = 0
+        self.trades = kwargs.get('trades', {})
+        self._trade_buffer = kwargs.get('trade_buffer')
+
+        self._bars = kwargs.get('bars')
+        self._aggregators = {}
+        for interval in self._bars or ():
+            self.results.setdefault(f'bar_{interval}', {})
+        self._dirty = collections.deque()
+        self._pending = set()
+
+        self.latency = kwargs.get('latency')
+        if self.latency is True:
+            self.latency = LatencyTracker(type(self).__name__)
+            dump_on_signal()
+        self._frame_times = None
+
+        self._decoders = None
+        if kwargs.get('decode_workers'):
+            self._decoders = concurrent.futures.ThreadPoolExecutor(kwargs['decode_workers'],
+                                                                   thread_name_prefix='Decoder')
+
+        self._frames = None
+        if kwargs.get('read_queue') or self._decoders is not None:
+            self._frames = RingQueue(kwargs.get('read_queue') or 1000, kwargs.get('overflow', 'block'))
+
+        recorder = kwargs.get('record')
+        self._owns_recorder = isinstance(recorder, str)
+        if self._owns_recorder:
+            recorder = Recorder(recorder, prefix=type(self).__name__.lower())
+
+        super().__init__(url=url, decoder=kwargs.get('decoder', 'auto'), recorder=recorder)
+
+        registry.register(self)
+        if kwargs.get('metrics_port') is not None:
+            registry.serve(kwargs['metrics_port'])
+
+    def _compile(self, parser, classes):
+        """
+        Compiles the plans of the parser classes of the exchange, following the timestamps, lazy and records
+        options. The record types are named after the exchange and the parser, e.g. BinanceTicker.
+
+        Parameters
+        ----------
+        parser : type
+            the Parser class of the exchange, whose compile() compiles a map
+        classes : tuple
+            the parser classes, with their map, and optionally the subset of it to keep and the extras keys they
+            add outside of it
 
-        super().__init__(url=url)
+        Returns
+        -------
+        dict
+            the plan of each parser class
+        """
+        plans = {}
+        for cls in classes:
+            plan = plans[cls] = parser.compile(cls.map, getattr(cls, 'subset', None), self.timestamps, self.lazy)
+            # the depth parsers keep dicts: their messages are mostly the arrays of a Depth, which a record does
+            # not shrink, while it costs a conversion to a dict whenever the message is published or cached
+            if self.records and 'depth' not in getattr(cls, 'extras', ()):
+                name = f"{(self.EXCHANGE or type(self).__name__).capitalize()}{cls.__name__.replace('Parser', '')}"
+                plan.record = record_type(name, plan, getattr(cls, 'extras', ()))
+
+        return plans
 
     def _init_redis(self, redis_kwargs):
 
@@ -89,13 +328,16 @@ class CoreWS(WebsocketClient):
             kw = redis_kwargs if redis_kwargs else {}
             self._redis = redis.Redis(**kw)
 
-    def _heart_beat(self):
-        """
-        Checks if it's time to send a keep-alive signal. If it is, sends it and resets the heart timer.
-        """
-        if self._heart_timer.reached_limit:
-            self._keep_alive()
-            self._heart_timer.reset_now()
+    def _init_publisher(self, kwargs):
+
+        # messages published one by one are never pending, so there is nothing to conflate them with
+        if self._do_publish and kwargs.get('conflate') and kwargs.get('publish_window') is None:
+            raise ValueError('conflate requires publish_window, or an asyncio client')
+
+        if self._do_publish and kwargs.get('publish_window') is not None:
+            self._publisher = BatchPublisher(self._redis, window=kwargs['publish_window'],
+                                             max_batch=kwargs.get('publish_batch', 500),
+                                             max_queue=kwargs.get('publish_queue', 100000))
 
     def _do_translate(self, market):
         """
@@ -115,19 +357,63 @@ class CoreWS(WebsocketClient):
 
     def _cache(self):
         """
-        Caches the results in Redis if the cache time limit has been reached.
+        Caches the results updated since the last call in Redis. Run every caching_freq seconds by the scheduler.
+        """
+        if self._do_cache:
+            pipe = self._redis.pipeline(transaction=False)
+
+            n_markets = self._queue_cache(pipe)
+            if n_markets:
+                start = time.perf_counter_ns()
+                pipe.execute()
+                self._count_flush(n_markets, time.perf_counter_ns() - start)
+
+    def _count_flush(self, n_markets, elapsed):
+        self.n_flushes += 1
+        self.n_flushed += n_markets
+        self.redis_latency['cache'].record(elapsed)
+
+    def _queue_cache(self, pipe):
         """
-        if self._redis_timer.reached_limit and self._do_cache:
-            if self.verbose > 6:
-                print('Now Caching:')
-                print(self.results)
+        Queues on a Redis pipeline the writes of the results updated since the last call.
+
+        Each channel is cached as a hash keyed by market, so that only the updated markets are serialized and
+        written, and readers can fetch a single market (see read_cache). The updated markets are drained from a
+        deque, which the receiving thread appends a market to without locking when it is not already pending,
+        while the scheduler thread caches. A market leaves the pending set before its results are read, so that
+        an update made meanwhile is either read or queued again.
+
+        Parameters
+        ----------
+        pipe : redis.client.Pipeline
+            the pipeline to queue the writes on
+
+        Returns
+        -------
+        int
+            the number of markets queued
+        """
+        dirty = set()
+        while self._dirty:
+            key = self._dirty.popleft()
+            self._pending.discard(key)
+            dirty.add(key)
+
+        if self.verbose > 6:
+            print('Now Caching:')
+            print(dirty)
+
+        mappings = {}
+        for channel, market in dirty:
+            mappings.setdefault(channel, {})[market] = serialize(self.results[channel][market])
 
-            for channel, result in self.results.items():
-                self._redis.set(name=f'{self._caching_key}:{channel}', value=json.dumps(result), ex=60*60)
+        for channel, mapping in mappings.items():
+            pipe.hset(f'{self._caching_key}:{channel}', mapping=mapping)
+            pipe.expire(f'{self._caching_key}:{channel}', 60*60)
 
-            self._redis_timer.reset_now()
+        return len(dirty)
 
-    def _publish(self, channel, msg):
+    def _publish(self, channel, msg, key=None):
         """
         Publishes a message to a channel on Redis.
 
@@ -137,6 +423,488 @@ class CoreWS(WebsocketClient):
             the channel to publish the message to
         msg : dict
             the message to publish
+        key : tuple
+            the (channel, market) conflation key of the message, when its channel is conflated (default is None)
+        """
+        if self._publisher is not None:
+            if self._publisher.publish(f'{self._publish_channel}:{channel}', msg, key):
+                self.conflated[channel] = self.conflated.get(channel, 0) + 1
+        elif self._do_publish:
+            start = time.perf_counter_ns()
+            self._redis.publish(channel=f'{self._publish_channel}:{channel}', message=serialize(msg))
+            self.redis_latency['publish'].record(time.perf_counter_ns() - start)
+
+    def _record_trades(self, market, rows, data):
+        """
+        Appends the trades of a message to the trade buffer of a market, when trade_buffer is set, and handles the
+        bars they update, when bars is set.
+
+        Parameters
+        ----------
+        market : str
+            the (translated) market the trades belong to
+        rows : callable
+            the function extracting the (ts, price, size, side, trade_id) tuples of the trades from the message
+        data : dict or list
+            the decoded frame
+        """
+        if not self._trade_buffer and not self._bars:
+            return
+
+        rows = rows(data)
+
+        if self._trade_buffer:
+            buffer = self.trades.get(market)
+            if buffer is None:
+                buffer = self.trades[market] = TradeBuffer(self._trade_buffer)
+
+            buffer.extend(rows)
+
+        if self._bars:
+            aggregator = self._aggregators.get(market)
+            if aggregator is None:
+                aggregator = self._aggregators[market] = BarAggregator(self._bars)
+
+            for bar in aggregator.update(rows):
+                self._handle(f'bar_{bar.interval}', market, self._from_bar(bar, market))
+
+    def _stamp_ns(self, ts):
+        """
+        Converts an epoch time in nanoseconds to the timestamps of the client.
+
+        Parameters
+        ----------
+        ts : int
+            the epoch time, in nanoseconds
+
+        Returns
+        -------
+        str or int
+            the UTC string with milliseconds, or the integer timestamp in the unit of the exchange
+        """
+        return ts // self.EPOCH_UNIT if self.timestamps == 'int' else format_ns(ts)
+
+    def _from_bar(self, bar, market):
+        """
+        Converts a bar built from trades into a message.
+        Overridden in subclasses to follow the schema of the bar parser of the exchange.
+
+        Parameters
+        ----------
+        bar : Bar
+            the bar
+        market : str
+            the (translated) market of the trades the bar was built from
+
+        Returns
+        -------
+        dict
+            the bar message
+        """
+        return {'start': self._stamp_ns(bar.start), 'end': self._stamp_ns(bar.end), 'open': bar.open,
+                'high': bar.high, 'low': bar.low, 'close': bar.close, 'volume': bar.volume, 'count': bar.count,
+                'closed': bar.closed}
+
+    def _event_time(self, data):
+        """
+        Returns the exchange event time of a decoded frame, for the latency histograms.
+        Overridden in subclasses.
+
+        Parameters
+        ----------
+        data : dict or list
+            the decoded frame
+
+        Returns
+        -------
+        int
+            the epoch event time in nanoseconds, None if the frame carries none
+        """
+        return None
+
+    def _rate(self, market, channel):
+        """
+        Returns the relative expected message rate of a subscription.
+
+        Parameters
+        ----------
+        market : str
+            the market subscribed to
+        channel : str
+            the channel subscribed to
+
+        Returns
+        -------
+        float
+            the expected message rate of the channel, times the one of the market
+        """
+        rate = next((v for k, v in self.CHANNEL_RATES.items() if channel.startswith(k)), 1)
+        return rate * self._market_rates.get(market, 1)
+
+    @property
+    def _sharded(self):
+        """
+        Checks if the subscriptions are to be spread over several connections.
+
+        Returns
+        -------
+        bool
+            True if more than one shard was requested or the subscriptions exceed MAX_SUBSCRIPTIONS.
+        """
+        cap = self.MAX_SUBSCRIPTIONS
+        return self._shards > 1 or bool(cap and len(self.subscriptions) > cap)
+
+    def shard(self):
+        """
+        Splits the subscriptions over several clients of the same class, balancing their expected message rate
+        and respecting MAX_SUBSCRIPTIONS. All the shards share the results of this client, each one caching the
+        markets it receives.
+
+        Returns
+        -------
+        list
+            the clients, one per connection
+        """
+        weights = {(m, c): self._rate(m, c) for m, c in self.subscriptions}
+        plan = plan_shards(self.subscriptions, self._shards, weights, self.MAX_SUBSCRIPTIONS)
+
+        shards = []
+        for subscriptions in plan:
+            kwargs = dict(self._kwargs, subscriptions=subscriptions, results=self.results, trades=self.trades,
+                          record=self._recorder, latency=self.latency, shards=1)
+
+            markets = list(dict.fromkeys(m for m, _ in subscriptions))
+            shards.append(type(self)(self.url, markets, self.channels, self._redis_timer.limit, self._translate,
+                                     self._redis_kwargs, **kwargs))
+
+        return shards
+
+    def run(self):
+        """
+        Runs the client. When sharding is enabled, runs each shard in its own thread until they all stop.
+        """
+        if not self._sharded:
+            jobs = self._schedule()
+            try:
+                return super().run()
+            finally:
+                for job in jobs:
+                    job.cancel()
+                self.close()
+
+        threads = [threading.Thread(target=client.run, daemon=True) for client in self.shard()]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.close()
+
+    def _schedule(self):
+        """
+        Schedules the keep-alive signals and the caching of the results on the background scheduler, so that the
+        receiving loop does no timer work.
+
+        Returns
+        -------
+        list
+            the scheduled jobs, to be cancelled when the client stops
+        """
+        jobs = [scheduler.every(self._heart_timer.limit, self._keep_alive)]
+
+        if self._do_cache:
+            jobs.append(scheduler.every(self._redis_timer.limit, self._cache))
+
+        return jobs
+
+    def close(self):
+        """
+        Publishes the pending messages, caches the pending results and writes the pending recorded frames.
+        """
+        if self._publisher is not None:
+            self._publisher.close()
+
+        if self._owns_recorder:
+            self._recorder.close()
+
+        if self._decoders is not None:
+            self._decoders.shutdown(wait=False)
+
+        if self._do_cache and self._dirty:
+            pipe = self._redis.pipeline(transaction=False)
+            self._queue_cache(pipe)
+            pipe.execute()
+
+    def _loop(self):
+        """
+        Receives frames and hands them over to _process, with their receive time when latency is set.
+        """
+        if self._frames is not None:
+            return self._pipelined_loop()
+
+        if self.latency is None:
+            while True:
+                self._process(self._rcv_frame())
+
+        clock = time.time_ns
+        while True:
+            frame = self._rcv_frame()
+            self._process(frame, clock())
+
+    def _pipelined_loop(self):
+        """
+        Receives frames in a reader thread, which only receives and timestamps them and puts them in a bounded
+        ring, from which the client thread takes them in batches and hands them over to _process. The reader
+        thread never waits on Redis or on parsing, only on the overflow policy of the ring when it is full.
+
+        With decode_workers, the reader submits each frame to the workers and queues its pending decoding. With
+        the conflate overflow policy, the reader decodes the frames itself to find their channel and market,
+        and only replaces the frames of the channels of CONFLATE_FRAMES.
+        A receiving failure is queued after the frames received before it and raised once they are processed.
+        When the loop stops, the ring is closed and the socket shut down, so that the reader stops before the
+        client reconnects.
+        """
+        frames = self._frames
+        frames.clear()
+
+        stop = threading.Event()
+        clock = time.time_ns if self.latency is not None else None
+        decoders = self._decoders
+
+        conflate = frames.overflow == 'conflate' and decoders is None
+        channels = tuple(self.CONFLATE_FRAMES)
+
+        def read():
+            try:
+                while not stop.is_set():
+                    frame = self._rcv_frame()
+                    received = clock() if clock is not None else None
+
+                    if decoders is not None:
+                        frames.put((frame, received, decoders.submit(self._decode, frame)))
+
+                    elif conflate:
+                        try:
+                            data = self._decode(frame)
+                        except Exception:
+                            # decoded again by _process, which counts and raises the failure
+                            frames.put((frame, received, None))
+                            continue
+
+                        key = self._frame_key(data)
+                        frames.put((frame, received, data), key if key and key[0].startswith(channels) else None)
+
+                    else:
+                        frames.put((frame, received, None))
+
+            except Exception as e:
+                frames.put((None, None, e))
+
+        reader = threading.Thread(target=read, name='Reader', daemon=True)
+        reader.start()
+
+        try:
+            while True:
+                for frame, received, decoded in frames.get():
+                    if frame is None:
+                        raise decoded
+
+                    self._process(frame, received, decoded)
+
+        finally:
+            stop.set()
+            frames.close()
+            if reader.is_alive():
+                try:
+                    getattr(self._socket, 'shutdown', self._socket.close)()
+                except Exception:
+                    pass
+            reader.join(1)
+
+    def _frame_key(self, data):
+        """
+        Placeholder method to be overridden in subclasses.
+        This should return the channel and market of a decoded frame, as named in the results, for the reader
+        thread to conflate the frames of the same market.
+
+        Parameters
+        ----------
+        data : dict or list
+            the decoded frame
+
+        Returns
+        -------
+        tuple
+            the (channel, market) of the frame, None if it carries no market data, e.g. a heartbeat
+        """
+        return None
+
+    def _process(self, frame, received=None, decoded=None):
+        """
+        Decodes a raw frame and hands it over to _on_message, counting the frames which produce no message and
+        the ones which fail to decode or parse. The failures are raised on, for the client to reconnect.
+
+        Parameters
+        ----------
+        frame : bytes or str
+            the raw frame
+        received : int
+            the epoch receive time of the frame in nanoseconds, to time its stages (default is None, untimed)
+        decoded : object
+            the frame decoded by the reader thread, or its decoding by the decode workers as a Future (default
+            is None, the frame is decoded here)
+        """
+        self._frame_size = size = len(frame)
+        self.n_frames += 1
+        self.n_bytes += size
+        n_messages = self.n_messages
+
+        try:
+            if decoded is None:
+                data = self._decode(frame)
+            elif isinstance(decoded, concurrent.futures.Future):
+                data = decoded.result()
+            else:
+                data = decoded
+            if received is not None:
+                self._frame_times = (data, received, time.time_ns())
+
+            self._on_message(data)
+
+        except Exception:
+            self.n_failures += 1
+            raise
+
+        if self.n_messages == n_messages:
+            self.n_skipped += 1
+
+    def _time(self, channel, parsed):
+        """
+        Records the stage latencies of the message being handled, if its frame was timed.
+        """
+        if self._frame_times is not None:
+            data, received, decoded = self._frame_times
+            self.latency.record(channel, self._event_time(data), received, decoded, parsed, time.time_ns())
+
+    def _on_message(self, data):
+        """
+        Placeholder method to be overridden in subclasses.
+        This should parse a decoded frame and pass the result to _handle.
+
+        Parameters
+        ----------
+        data : dict or list
+            the decoded frame
+        """
+        pass
+
+    def _handle(self, channel, market, msg, state=None):
+        """
+        Stores a parsed message in the results, publishes it and marks it to be cached.
+
+        Parameters
+        ----------
+        channel : str
+            the channel the message was received on
+        market : str
+            the (translated) market the message refers to
+        msg : dict
+            the parsed message
+        state : dict
+            the state to store and cache in place of the message, when the message is an update of it, e.g. the
+            changed levels of an order book (default is None, the message is stored)
         """
-        if self._do_publish:
-            self._redis.publish(channel=f'{self._publish_channel}:{channel}', message=msg)
+        parsed = time.time_ns() if self.latency is not None else None
+
+        print({market: msg}) if self.verbose > 0 else None
+
+        self.n_messages += 1
+        counts = self.counts.get((channel, market))
+        if counts is None:
+            counts = self.counts[(channel, market)] = [0, 0]
+        counts[0] += 1
+        counts[1] += self._frame_size
+
+        self.results[channel].update({market: msg if state is None else state})
+        if self._do_cache and (channel, market) not in self._pending:
+            self._pending.add((channel, market))
+            self._dirty.append((channel, market))
+        conflated = self._conflated_channels.get(channel)
+        if conflated is None:
+            conflated = self._conflated_channels[channel] = bool(self._conflate) and channel.startswith(self._conflate)
+
+        self._publish(channel, {market: msg}, (channel, market) if conflated else None)
+
+        if parsed is not None:
+            self._time(channel, parsed)
+
+    def metrics(self):
+        """
+        Yields the metrics of the client, read from its counters without locking, see crypto_ws.metrics.
+
+        Yields
+        ------
+        tuple
+            the name, labels and value of each sample
+        """
+        exchange = {'exchange': self.EXCHANGE or type(self).__name__}
+
+        yield 'crypto_ws_frames_total', exchange, self.n_frames
+        yield 'crypto_ws_frame_bytes_total', exchange, self.n_bytes
+        yield 'crypto_ws_skipped_frames_total', exchange, self.n_skipped
+        yield 'crypto_ws_parse_failures_total', exchange, self.n_failures
+        yield 'crypto_ws_reconnects_total', exchange, self.n_reconnects
+
+        for (channel, market), (n_messages, n_bytes) in list(self.counts.items()):
+            labels = dict(exchange, channel=channel, market=market)
+            yield 'crypto_ws_messages_total', labels, n_messages
+            yield 'crypto_ws_message_bytes_total', labels, n_bytes
+
+        if self._do_cache:
+            yield 'crypto_ws_cache_flushes_total', exchange, self.n_flushes
+            yield 'crypto_ws_cache_flushed_total', exchange, self.n_flushed
+            yield 'crypto_ws_cache_pending', exchange, len(self._dirty)
+
+        if self._publisher is not None:
+            yield from self._publisher.metrics(exchange)
+
+        for channel, n_conflated in list(self.conflated.items()):
+            yield 'crypto_ws_conflated_total', dict(exchange, channel=channel), n_conflated
+
+        if self._frames is not None:
+            yield 'crypto_ws_read_queue_depth', exchange, len(self._frames)
+            yield 'crypto_ws_read_dropped_total', exchange, self._frames.n_dropped
+            yield 'crypto_ws_read_conflated_total', exchange, self._frames.n_conflated
+            yield 'crypto_ws_read_blocked_total', exchange, self._frames.n_blocked
+
+        for op, histogram in self.redis_latency.items():
+            if histogram.count:
+                yield 'crypto_ws_redis_latency_seconds', dict(exchange, op=op), histogram
+
+
+def read_cache(client, caching_key, channel, market=None):
+    """
+    Reads the results cached by a CoreWS client in Redis.
+
+    Parameters
+    ----------
+    client : redis.Redis
+        the Redis client to read with
+    caching_key : str
+        the caching key of the CoreWS client
+    channel : str
+        the channel to read
+    market : str
+        the market to read, or None to read all the markets of the channel (default is None)
+
+    Returns
+    -------
+    dict
+        the cached message of the market, or the cached messages of the channel keyed by market
+    """
+    if market is not None:
+        value = client.hget(f'{caching_key}:{channel}', market)
+        return json.loads(value) if value is not None else None
+
+    return {k.decode(): json.loads(v) for k, v in client.hgetall(f'{caching_key}:{channel}').items()}
@@ -0,0 +1,73 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_decode(frame):
+    """
+    Deserializes a JSON frame with the standard library.
+
+    Parameters
+    ----------
+    frame : bytes or str
+        the raw frame, an empty frame is decoded as an empty dict
+
+    Returns
+    -------
+    dict or list
+        the deserialized frame
+    """
+    return json.loads(frame) if frame else {}
+
+
+def orjson_decode(frame):
+    """
+    Deserializes a JSON frame with orjson, without an intermediate str for bytes frames.
+
+    Parameters
+    ----------
+    frame : bytes or str
+        the raw frame, an empty frame is decoded as an empty dict
+
+    Returns
+    -------
+    dict or list
+        the deserialized frame
+    """
+    return orjson.loads(frame) if frame else {}
+
+
+DECODERS = {
+    'json': json_decode,
+    'orjson': orjson_decode,
+}
+
+
+def get_decoder(decoder='auto'):
+    """
+    Returns the function deserializing the frames received by a client.
+
+    Parameters
+    ----------
+    decoder : str or callable
+        'json', 'orjson', 'auto' to use orjson if it is installed and json otherwise, or a function taking the raw
+        bytes of a frame and returning the deserialized frame (default is 'auto')
+
+    Returns
+    -------
+    callable
+        the decoding function
+    """
+    if callable(decoder):
+        return decoder
+
+    if decoder == 'auto':
+        decoder = 'orjson' if orjson is not None else 'json'
+
+    if decoder == 'orjson' and orjson is None:
+        raise ImportError("The 'orjson' decoder requires the orjson package: pip install crypto_ws[fast]")
+
+    return DECODERS[decoder]
@@ -0,0 +1,249 @@
+import itertools
+
+import numpy as np
+
+
+def _levels(rows):
+    """
+    Converts [price, size, ...] rows, as numbers or strings, into a (n, 2) float array.
+    np.fromiter converts the values one by one, several times faster than np.array on nested lists.
+    """
+    n = len(rows)
+    if not n:
+        return np.empty((0, 2))
+
+    if len(rows[0]) == 2:
+        values = itertools.chain.from_iterable(rows)
+    else:
+        values = (x for row in rows for x in row[:2])
+
+    return np.fromiter(values, float, 2 * n).reshape(n, 2)
+
+
+class Depth:
+    """
+    A class used to represent the depth of a market, its bid and ask levels held in NumPy arrays.
+
+    ...
+
+    Each side is a (n, 2) float array of [price, size] rows, best level first, so that the analytics are
+    vectorized and a message costs a couple of arrays instead of a dict per level. It is serialized as
+    {'bids': [prices, sizes], 'asks': [prices, sizes]}, see to_dict and from_dict.
+
+    Attributes
+    ----------
+    bids : np.ndarray
+        the [price, size] bid levels, highest price first
+    asks : np.ndarray
+        the [price, size] ask levels, lowest price first
+
+    Methods
+    -------
+    from_levels(bids, asks):
+        Builds a Depth from lists of [price, size] levels.
+    from_dict(dct):
+        Builds a Depth from its serialized form.
+    to_dict():
+        Returns the serialized form of the Depth.
+    cumulative(side):
+        Returns the cumulative size of a side.
+    vwap(size, side):
+        Returns the average price to fill a size.
+    imbalance(n=None):
+        Returns the imbalance between the bid and ask sizes.
+    slippage(notional, side):
+        Returns the relative cost of filling a notional against the best price.
+    """
+
+    __slots__ = ('bids', 'asks')
+
+    def __init__(self, bids, asks):
+        """
+        Constructs all the necessary attributes for the Depth object.
+
+        Parameters
+        ----------
+            bids : np.ndarray
+                the (n, 2) [price, size] bid levels, highest price first
+            asks : np.ndarray
+                the (n, 2) [price, size] ask levels, lowest price first
+        """
+        self.bids = bids
+        self.asks = asks
+
+    def __repr__(self):
+        return f'Depth(bids={len(self.bids)}, asks={len(self.asks)}, mid={self.mid}, spread={self.spread})'
+
+    @classmethod
+    def from_levels(cls, bids, asks):
+        """
+        Builds a Depth from lists of levels, as sent by the exchanges.
+
+        Parameters
+        ----------
+        bids : list
+            the [price, size, ...] bid levels, as numbers or strings, highest price first
+        asks : list
+            the [price, size, ...] ask levels, as numbers or strings, lowest price first
+
+        Returns
+        -------
+        Depth
+            the depth
+        """
+        return cls(_levels(bids), _levels(asks))
+
+    @classmethod
+    def from_dict(cls, dct):
+        """
+        Builds a Depth from its serialized form, e.g. as read from the cache.
+
+        Parameters
+        ----------
+        dct : dict
+            the serialized depth, as returned by to_dict
+
+        Returns
+        -------
+        Depth
+            the depth
+        """
+        return cls(np.array(dct['bids'], dtype=float).reshape(2, -1).T,
+                   np.array(dct['asks'], dtype=float).reshape(2, -1).T)
+
+    def to_dict(self):
+        """
+        Returns the serialized form of the Depth, each side as a list of prices and a list of sizes.
+
+        Returns
+        -------
+        dict
+            {'bids': [prices, sizes], 'asks': [prices, sizes]}
+        """
+        return {'bids': self.bids.T.tolist(), 'asks': self.asks.T.tolist()}
+
+    def _side(self, side):
+        if side in ('bids', 'sell'):
+            return self.bids
+        if side in ('asks', 'buy'):
+            return self.asks
+        raise ValueError(f"Unknown side {side!r}, expected 'bids', 'asks', 'buy' or 'sell'")
+
+    @property
+    def best_bid(self):
+        """
+        Returns the best bid price, nan if there are no bids.
+        """
+        return self.bids[0, 0] if len(self.bids) else np.nan
+
+    @property
+    def best_ask(self):
+        """
+        Returns the best ask price, nan if there are no asks.
+        """
+        return self.asks[0, 0] if len(self.asks) else np.nan
+
+    @property
+    def mid(self):
+        """
+        Returns the average of the best bid and ask prices.
+        """
+        return (self.best_bid + self.best_ask) / 2
+
+    @property
+    def spread(self):
+        """
+        Returns the best ask price minus the best bid price.
+        """
+        return self.best_ask - self.best_bid
+
+    def cumulative(self, side='bids'):
+        """
+        Returns the cumulative size of a side, from the best level.
+
+        Parameters
+        ----------
+        side : str
+            'bids' or 'asks' (default is 'bids')
+
+        Returns
+        -------
+        np.ndarray
+            the size available up to each level
+        """
+        return np.cumsum(self._side(side)[:, 1])
+
+    def vwap(self, size, side='asks'):
+        """
+        Returns the volume weighted average price to fill a size, walking a side from its best level.
+
+        Parameters
+        ----------
+        size : float
+            the size to fill
+        side : str
+            'asks' or 'buy' to buy from the asks, 'bids' or 'sell' to sell to the bids (default is 'asks')
+
+        Returns
+        -------
+        float
+            the average price, nan if the side is not deep enough
+        """
+        levels = self._side(side)
+        sizes = levels[:, 1]
+        before = np.cumsum(sizes) - sizes
+
+        filled = np.clip(size - before, 0, sizes)
+        total = filled.sum()
+
+        if size <= 0 or total < size * (1 - 1e-12):
+            return np.nan
+
+        return float(levels[:, 0] @ filled / total)
+
+    def imbalance(self, n=None):
+        """
+        Returns the imbalance between the sizes of the n best bid and ask levels.
+
+        Parameters
+        ----------
+        n : int
+            the number of levels per side (default is None, all of them)
+
+        Returns
+        -------
+        float
+            (bid size - ask size) / (bid size + ask size), between -1 and 1, nan if the depth is empty
+        """
+        bid, ask = self.bids[:n, 1].sum(), self.asks[:n, 1].sum()
+        return float((bid - ask) / (bid + ask)) if bid + ask else np.nan
+
+    def slippage(self, notional, side='buy'):
+        """
+        Returns the relative cost of filling a notional, compared to the best price.
+
+        Parameters
+        ----------
+        notional : float
+            the amount to fill, in quote currency
+        side : str
+            'buy' to buy from the asks, 'sell' to sell to the bids (default is 'buy')
+
+        Returns
+        -------
+        float
+            the average fill price over the best price minus 1 for a buy, 1 minus it for a sell, nan if the side
+            is not deep enough
+        """
+        levels = self._side(side)
+        prices, sizes = levels[:, 0], levels[:, 1]
+        notionals = prices * sizes
+        before = np.cumsum(notionals) - notionals
+
+        filled = np.clip(notional - before, 0, notionals)
+
+        if notional <= 0 or filled.sum() < notional * (1 - 1e-12):
+            return np.nan
+
+        avg = notional / (filled / prices).sum()
+        return float(avg / prices[0] - 1 if levels is self.asks else 1 - avg / prices[0])
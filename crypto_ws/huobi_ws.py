@@ -1,95 +1,128 @@
-import datetime as dt
-import gzip
-import json
+import zlib
 
+from crypto_ws.async_core_ws import AsyncCoreWS
 from crypto_ws.core_ws import CoreWS
+from crypto_ws.depth import Depth
+from crypto_ws.parsing import compile_plan, run_plan
+from crypto_ws.utils import format_ms
 
 
 class HuobiWS(CoreWS):
 
     CACHING_KEY = 'default_redis_caching_key:huobi'
     PUBLISH_CHANNEL = 'default_redis_publish_key:huobi'
+    EXCHANGE = 'huobi'
 
     CHANNELS = ['ticker', 'bbo', 'trade.detail', 'detail',
                 'depth.step0', 'depth.step1', 'depth.step2', 'depth.step3', 'depth.step4', 'depth.step5',
                 'mbp.refresh.5', 'mbp.refresh.10', 'mbp.refresh.20',
                 'kline.1min', 'kline.5min', 'kline.15min', 'kline.30min']
 
+    CHANNEL_RATES = {'ticker': 10, 'bbo': 20, 'trade.detail': 10, 'detail': 1, 'depth.step': 10, 'mbp.refresh': 10,
+                     'kline': 1}
+    # depth and mbp.refresh messages are full snapshots; kline messages are not conflated, as the update of a new
+    # bar would replace the last update of the previous one
+    CONFLATE = ('ticker', 'bbo', 'detail', 'depth.step', 'mbp.refresh')
+    CONFLATE_FRAMES = ('ticker', 'bbo', 'detail', 'depth.step', 'mbp.refresh')
+
     def __init__(self, url='wss://api.huobi.pro/ws', markets=('btcusdt', 'ethusdt'), channels=('ticker',),
                  caching_freq=0.25, translate=None, redis_kwargs=None, **kwargs):
 
         super().__init__(url, markets, channels, caching_freq, translate, redis_kwargs, **kwargs)
 
+        self._plans = self._compile(Parser, (TickerParser, BarParser, DepthParser, ByPriceParser, BBOParser,
+                                             TradeParser, DetailParser))
+
     # ----
 
-    def _heart_beat(self, msg):
+    def _pong(self, msg):
         self._send({'pong': msg['ping']}) if 'ping' in msg.keys() else None
 
     # ----
 
     def _subscribe(self):
 
-        for m in self.markets:
-            for c in self.channels:
-                self._send({"sub": f"market.{m}.{c}"})
+        for m, c in self.subscriptions:
+            self._send({"sub": f"market.{m}.{c}"})
+
+    def _decode(self, msg):
+        # the empty payload of a close frame is not a gzip stream
+        if not msg:
+            return self._loads(b'')
+
+        # zlib parses the gzip header in C, and releases the GIL while inflating for the decode workers
+        return self._loads(zlib.decompress(msg, 31))
+
+    def _on_message(self, data):
+
+        self._pong(data)
 
-    def _rcv(self):
-        msg = self._socket.recv()
-        msg = gzip.decompress(msg).decode()
-        msg = msg if msg != '' else '{}'
+        if isinstance(data, dict) and 'tick' in data.keys():
 
-        return json.loads(msg)
+            key = data['ch']
+            _, market, channel = key.split('.', 2)
+            market = self._do_translate(market)
 
-    def _loop(self):
-        while True:
+            if 'ticker' in channel:
+                msg = TickerParser.parse(data, plan=self._plans[TickerParser])
 
-            data = self._rcv()
-            self._heart_beat(data)
+            elif 'kline.' in channel:
+                msg = BarParser.parse(data, plan=self._plans[BarParser])
 
-            if isinstance(data, dict) and 'tick' in data.keys():
+            elif 'depth.step' in channel:
+                msg = DepthParser.parse(data, plan=self._plans[DepthParser])
 
-                key = data['ch']
-                _, market, channel = key.split('.', 2)
-                market = self._do_translate(market)
+            elif 'mbp.refresh' in channel:
+                msg = ByPriceParser.parse(data, plan=self._plans[ByPriceParser])
 
-                if 'ticker' in channel:
-                    msg = TickerParser.parse(data, subset=None)
+            elif 'bbo' in channel:
+                msg = BBOParser.parse(data, plan=self._plans[BBOParser])
 
-                elif 'kline.' in channel:
-                    msg = BarParser.parse(data, subset=None)
+            elif 'trade.detail' in channel:
+                msg = TradeParser.parse(data, plan=self._plans[TradeParser])
+                self._record_trades(market, TradeParser.rows, data)
 
-                elif 'depth.step' in channel:
-                    msg = DepthParser.parse(data, subset=None)
+            elif 'detail' in channel:
+                msg = DetailParser.parse(data, plan=self._plans[DetailParser])
 
-                elif 'mbp.refresh' in channel:
-                    msg = ByPriceParser.parse(data, subset=None)
+            else:
+                return
 
-                elif 'bbo' in channel:
-                    msg = BBOParser.parse(data, subset=None)
+            if not msg:
+                return
 
-                elif 'trade.detail' in channel:
-                    msg = TradeParser.parse(data, subset=None)
+            self._handle(channel, market, msg)
 
-                elif 'detail' in channel:
-                    msg = DetailParser.parse(data, subset=None)
+    def _from_bar(self, bar, market):
+        return BarParser.from_bar(bar, self._stamp_ns)
 
-                else:
-                    continue
+    def _event_time(self, data):
+        return data['ts'] * 10**6 if isinstance(data, dict) and 'ts' in data else None
 
-                if not msg:
-                    continue
+    def _frame_key(self, data):
 
-                print({market: msg}) if self.verbose > 0 else None
+        if isinstance(data, dict) and 'tick' in data:
+            _, market, channel = data['ch'].split('.', 2)
+            return channel, self._do_translate(market)
 
-                self.results[channel].update({market: msg})
-                self._publish(channel, {market: msg})
-                self._cache()
+
+class AsyncHuobiWS(AsyncCoreWS, HuobiWS):
+    pass
 
 
 class Parser:
     @staticmethod
     def parse_datetime(x):
-        return dt.datetime.utcfromtimestamp(int(str(x)[:-3])).strftime('%Y-%m-%d %H:%M:%S.%MS')
+        return format_ms(x)
+
+    @staticmethod
+    def parse_epoch(x):
+        return int(x)
+
+    @staticmethod
+    def compile(mapping, subset=None, timestamps='str', lazy=False):
+        stamp = Parser.parse_epoch if timestamps == 'int' else Parser.parse_datetime
+        return compile_plan(mapping, subset, (Parser.parse_datetime, stamp), lazy)
 
 
 class TickerParser:
@@ -111,14 +144,17 @@ class TickerParser:
         'lastSize': ['lastSize', float]
     }
 
+    extras = ['respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in TickerParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TickerParser.map, subset) if subset else TickerParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['tick'].items()
-               if (key_value_pair := TickerParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['tick'])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
@@ -135,34 +171,45 @@ class BarParser:
         'vol': ['vol', float]
     }
 
+    extras = ['respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in BarParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(BarParser.map, subset) if subset else BarParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['tick'].items()
-               if (key_value_pair := BarParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['tick'])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
+    @staticmethod
+    def from_bar(bar, stamp):
+        return {'id': str(bar.start // 10**9), 'amount': bar.volume, 'count': bar.count, 'open': bar.open,
+                'close': bar.close, 'low': bar.low, 'high': bar.high, 'vol': bar.turnover,
+                'respond_time_utc': stamp(bar.last_ts)}
+
 
 class DepthParser:
     map = {
         'ts': ['time_utc', Parser.parse_datetime],
         'version': ['version', str],
-        'bids': ['bids', list],
-        'asks': ['asks', list]
     }
 
+    extras = ['depth', 'respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in DepthParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(DepthParser.map, subset) if subset else DepthParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['tick'].items()
-               if (key_value_pair := DepthParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['tick'])
+        dct['depth'] = Depth.from_levels(msg['tick']['bids'], msg['tick']['asks'])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
@@ -171,18 +218,20 @@ class ByPriceParser:
 
     map = {
         'seqNum': ['seqNum', str],
-        'bids': ['bids', list],
-        'asks': ['asks', list]
     }
 
+    extras = ['depth', 'respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in ByPriceParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(ByPriceParser.map, subset) if subset else ByPriceParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['tick'].items()
-               if (key_value_pair := ByPriceParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['tick'])
+        dct['depth'] = Depth.from_levels(msg['tick']['bids'], msg['tick']['asks'])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
@@ -199,14 +248,17 @@ class BBOParser:
         'symbol': ['symbol', str],
     }
 
+    extras = ['respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in BBOParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(BBOParser.map, subset) if subset else BBOParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['tick'].items()
-               if (key_value_pair := BBOParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['tick'])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
@@ -222,22 +274,25 @@ class TradeParser:
         'direction': ['direction', str],
     }
 
-    @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in TradeParser.map.values()]
+    plan = Parser.compile(map)
 
-        ls = []
-        for d in msg['tick']['data']:
-            dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in d.items()
-                   if (key_value_pair := TradeParser.map.get(k, k))[0] in subset}
+    @staticmethod
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TradeParser.map, subset) if subset else TradeParser.plan
 
-            ls.append(dct)
+        ls = [run_plan(plan, d) for d in msg['tick']['data']]
 
-        dct = {'respond_time_utc': Parser.parse_datetime(msg['ts']), 'trade': ls,
-               'last_creation_utc': Parser.parse_datetime(msg['tick']['ts'])}
+        dct = {'respond_time_utc': plan.stamp(msg['ts']), 'trade': ls,
+               'last_creation_utc': plan.stamp(msg['tick']['ts'])}
 
         return dct
 
+    @staticmethod
+    def rows(msg):
+        return [(d['ts'] * 10**6, float(d['price']), float(d['amount']), 1 if d['direction'] == 'buy' else -1,
+                 int(d['tradeId'])) for d in msg['tick']['data']]
+
 
 class DetailParser:
 
@@ -253,14 +308,17 @@ class DetailParser:
         'version': ['version', str],
     }
 
+    extras = ['respond_time_utc']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in DetailParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(DetailParser.map, subset) if subset else DetailParser.plan
 
-        dct = {key_value_pair[0]: key_value_pair[1](v) for k, v in msg['tick'].items()
-               if (key_value_pair := DetailParser.map.get(k, k))[0] in subset}
+        dct = run_plan(plan, msg['tick'])
 
-        dct['respond_time_utc'] = Parser.parse_datetime(msg['ts'])
+        dct['respond_time_utc'] = plan.stamp(msg['ts'])
 
         return dct
 
@@ -1,22 +1,61 @@
-import datetime as dt
 import gzip
 import json
+import operator
+import zlib
 
+from crypto_ws.async_core_ws import AsyncCoreWS
 from crypto_ws.core_ws import CoreWS
+from crypto_ws.depth import Depth
+from crypto_ws.orderbook import OrderBook
+from crypto_ws.parsing import LazyMessage, compile_plan, run_row_plan
+from crypto_ws.utils import format_ns
 
 
 class KrakenWS(CoreWS):
+    """
+    A class used to represent a Kraken WebSocket client.
+
+    ...
+
+    The book channels are maintained as local order books of the subscribed depth, built from the snapshots and
+    updated with the 'a' and 'b' updates. After each update the book is checked against the checksum sent by
+    Kraken; on a mismatch it is reset and the book is resubscribed to, so that a new snapshot is sent. Snapshots
+    are published whole and updates as the changed levels only, along with the best bid and ask of the book,
+    while the results keep the whole book. Levels are held in a Depth, a removed level having a size of 0.
+
+    Attributes
+    ----------
+    books : dict
+        the local order books, keyed by (channel, pair), e.g. ('book-10', 'XBT/USD')
+
+    Methods
+    -------
+    book(market, channel='book-10'):
+        Returns the local order book of a market.
+    """
 
     CACHING_KEY = 'default_redis_caching_key:huobi'
     PUBLISH_CHANNEL = 'default_redis_publish_key:huobi'
+    EXCHANGE = 'kraken'
 
-    CHANNELS = ['ticker', 'trade', 'spread', 'book-10', 'ohlc-1']
+    CHANNELS = ['ticker', 'trade', 'spread', 'book-10', 'book-25', 'book-100', 'book-500', 'book-1000', 'ohlc-1']
+
+    CHANNEL_RATES = {'ticker': 1, 'trade': 5, 'spread': 20, 'book': 20, 'ohlc': 1}
+    # book messages are updates of the local book, which cannot be skipped
+    CONFLATE = ('ticker', 'spread')
+    CONFLATE_FRAMES = ('ticker', 'spread')
+
+    EPOCH_UNIT = 1
 
     def __init__(self, url='wss://ws.kraken.com', markets=('btcusdt', 'ethusdt'), channels=('ticker',),
                  caching_freq=0.25, translate=None, redis_kwargs=None, **kwargs):
 
         super().__init__(url, markets, channels, caching_freq, translate, redis_kwargs, **kwargs)
 
+        self.books = {}
+
+        self._plans = self._compile(Parser, (TickerParser, BarParser, BookParser, SpreadParser, TradeParser))
+
     # ----
 
     def _keep_alive(self):
@@ -26,100 +65,241 @@ class KrakenWS(CoreWS):
 
     def _subscribe(self):
 
-        for m in self.markets:
-            for c in self.channels:
+        for m, c in self.subscriptions:
 
-                payload = {
-                    "event": "subscribe",
-                    "pair": [m],
-                    "subscription": {"name": c}
-                }
+            payload = {
+                "event": "subscribe",
+                "pair": [m],
+                "subscription": self._subscription(c)
+            }
 
-                self._send(payload)
+            self._send(payload)
 
-    def _loop(self):
-        while True:
+    @staticmethod
+    def _subscription(channel):
+
+        if channel.startswith('book-'):
+            return {"name": "book", "depth": int(channel[5:])}
+        return {"name": channel}
 
-            data = self._rcv()
-            self._heart_beat()
+    def _resubscribe(self, channel, pair):
+
+        for event in ('unsubscribe', 'subscribe'):
+            self._send({"event": event, "pair": [pair], "subscription": self._subscription(channel)})
 
-            if isinstance(data, list) and data[2] in self.CHANNELS:
+    def book(self, market, channel='book-10'):
+        """
+        Returns the local order book of a market.
 
-                channel = data[2]
-                market = self._do_translate(data[3])
+        Parameters
+        ----------
+        market : str
+            the market, as named by the exchange, e.g. 'XBT/USD'
+        channel : str
+            the book channel (default is 'book-10')
 
-                if 'ticker' in channel:
-                    msg = TickerParser.parse(data, subset=None)
+        Returns
+        -------
+        KrakenBook
+            the order book, None if no snapshot was received yet
+        """
+        return self.books.get((channel, market))
 
-                elif 'ohlc' in channel:
-                    msg = BarParser.parse(data, subset=None)
+    def _on_book(self, data, channel, pair):
+        """
+        Applies a book snapshot or update to the local book of its pair, checking it against the checksum.
 
-                elif 'book' in channel:
-                    msg = BookParser.parse(data, subset=None)
+        An update holds the 'a' and 'b' levels either in one dict or, when both sides changed, in two dicts, the
+        message then having 5 elements.
 
-                elif 'spread' in channel:
-                    msg = SpreadParser.parse(data, subset=None)
+        Parameters
+        ----------
+        data : list
+            the decoded frame
+        channel : str
+            the book channel, e.g. 'book-10'
+        pair : str
+            the pair, as named by the exchange
 
-                elif 'trade' in channel:
-                    msg = TradeParser.parse(data, subset=None)
+        Returns
+        -------
+        tuple
+            the message to publish and the whole book to store, (None, None) if the book is waiting for a snapshot
+        """
+        book = self.books.get((channel, pair))
+        if book is None:
+            book = self.books[(channel, pair)] = KrakenBook(int(channel[5:]))
 
-                else:
-                    continue
+        if 'as' in data[1] or 'bs' in data[1]:
+            book.snapshot(data[1].get('bs', ()), data[1].get('as', ()))
+            msg = BookParser.parse(data, plan=self._plans[BookParser])
+            msg['type'] = 'snapshot'
+
+        elif not book.synced:
+            return None, None
+
+        else:
+            msg = BookParser.parse(data, plan=self._plans[BookParser])
+            msg['type'] = 'update'
+
+            checksum = None
+            for part in data[1:-2]:
+                book.apply(part.get('b', ()), part.get('a', ()))
+                checksum = part.get('c', checksum)
+
+            if checksum is not None and book.checksum() != int(checksum):
+                print(f'Kraken: checksum mismatch on {channel} {pair}, resubscribing')
+                book.reset()
+                self._resubscribe(channel, pair)
+                return None, None
+
+        msg['best_bid'] = book.best_bid
+        msg['best_ask'] = book.best_ask
+
+        state = {'depth': book.to_depth()}
+        if 'time_utc' in msg:
+            state['time_utc'] = msg['time_utc']
+
+        return msg, state
+
+    def _on_message(self, data):
+
+        if isinstance(data, list) and data[-2] in self.CHANNELS:
+
+            channel = data[-2]
+            market = self._do_translate(data[-1])
+            state = None
+
+            if 'ticker' in channel:
+                msg = TickerParser.parse(data, plan=self._plans[TickerParser])
+
+            elif 'ohlc' in channel:
+                msg = BarParser.parse(data, plan=self._plans[BarParser])
+
+            elif 'book' in channel:
+                msg, state = self._on_book(data, channel, data[-1])
+
+            elif 'spread' in channel:
+                msg = SpreadParser.parse(data, plan=self._plans[SpreadParser])
+
+            elif 'trade' in channel:
+                msg = TradeParser.parse(data, plan=self._plans[TradeParser])
+                self._record_trades(market, TradeParser.rows, data)
+
+            else:
+                return
+
+            if not msg:
+                return
+
+            self._handle(channel, market, msg, state)
+
+    def _from_bar(self, bar, market):
+        return BarParser.from_bar(bar, self._stamp_ns)
+
+    def _event_time(self, data):
+
+        if not isinstance(data, list) or len(data) < 4:
+            return None
+
+        channel, payload = data[-2], data[1]
 
-                if not msg:
-                    continue
+        if channel == 'trade':
+            return Parser.parse_epoch(payload[-1][2])
+        if channel == 'spread':
+            return Parser.parse_epoch(payload[2])
+        if channel.startswith('ohlc'):
+            return Parser.parse_epoch(payload[0])
+        if channel.startswith('book'):
+            times = [level[2] for part in data[1:-2] for key in ('as', 'bs', 'a', 'b') for level in part.get(key, ())]
+            return Parser.parse_epoch(max(times, key=float)) if times else None
 
-                print({market: msg}) if self.verbose > 0 else None
+        return None
 
-                self.results[channel].update({market: msg})
-                self._publish(channel, {market: msg})
-                self._cache()
+    def _frame_key(self, data):
+
+        if isinstance(data, list) and len(data) >= 4:
+            return data[-2], self._do_translate(data[-1])
+
+
+class AsyncKrakenWS(AsyncCoreWS, KrakenWS):
+    pass
 
 
 class Parser:
     @staticmethod
     def parse_datetime(x):
-        return dt.datetime.utcfromtimestamp(float(x)).strftime('%Y-%m-%d %H:%M:%S.%MS')
+        return format_ns(Parser.parse_epoch(x))
+
+    @staticmethod
+    def parse_epoch(x):
+        sec, _, frac = str(x).partition('.')
+        return int(sec) * 10**9 + int(frac[:9].ljust(9, '0'))
 
     @staticmethod
-    def flatten(msg):
-        return {f'{k}{idx}': i for k, v in msg.items() for idx, i in enumerate(v)}
+    def compile(mapping, subset=None, timestamps='str', lazy=False):
+        stamp = Parser.parse_epoch if timestamps == 'int' else Parser.parse_datetime
+        return compile_plan(mapping, subset, (Parser.parse_datetime, stamp), lazy)
 
 
 class TickerParser:
 
     map = {
-        'a0': ['ask_price', float],
-        'a1': ['ask_whole_lot_volume', int],
-        'a2': ['ask_lot_volume', float],
-        'b0': ['bid_price', float],
-        'b1': ['bid_whole_lot_volume', int],
-        'b2': ['bid_lot_volume', float],
-        'c0': ['close_price', float],
-        'c1': ['close_lot_volume', float],
-        'v0': ['volume_day', float],
-        'v1': ['volume_24h', float],
-        'p0': ['vwap_day', float],
-        'p1': ['vwap_24h', float],
-        't0': ['trades_nb_day', int],
-        't1': ['trades_nb_24h', int],
-        'l0': ['low_day', float],
-        'l1': ['low_24h', float],
-        'h0': ['high_day', float],
-        'h1': ['high_24h', float],
-        'o0': ['open_day', float],
-        'o1': ['open_24h', float],
+        ('a', 0): ['ask_price', float],
+        ('a', 1): ['ask_whole_lot_volume', int],
+        ('a', 2): ['ask_lot_volume', float],
+        ('b', 0): ['bid_price', float],
+        ('b', 1): ['bid_whole_lot_volume', int],
+        ('b', 2): ['bid_lot_volume', float],
+        ('c', 0): ['close_price', float],
+        ('c', 1): ['close_lot_volume', float],
+        ('v', 0): ['volume_day', float],
+        ('v', 1): ['volume_24h', float],
+        ('p', 0): ['vwap_day', float],
+        ('p', 1): ['vwap_24h', float],
+        ('t', 0): ['trades_nb_day', int],
+        ('t', 1): ['trades_nb_24h', int],
+        ('l', 0): ['low_day', float],
+        ('l', 1): ['low_24h', float],
+        ('h', 0): ['high_day', float],
+        ('h', 1): ['high_24h', float],
+        ('o', 0): ['open_day', float],
+        ('o', 1): ['open_24h', float],
     }
 
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in TickerParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TickerParser.map, subset) if subset else TickerParser.plan
+        data = msg[1]
+
+        if plan.record is not None:
+            return plan.record.build(data)
+        if plan.lazy:
+            return LazyTicker(plan, data)
+
+        return {out: conv(data[k][idx]) for (k, idx), out, conv in plan if k in data}
 
-        return {
-            key_value_pair[0]: key_value_pair[1](v)
-            for k, v in Parser.flatten(msg[1]).items()
-            if (key_value_pair := TickerParser.map.get(k, k))[0] in subset
-        }
+
+class LazyTicker(LazyMessage):
+    """
+    A class used to represent a parsed ticker as a lazy view on its data, the source keys of its plan being
+    (key, index) pairs.
+    """
+
+    __slots__ = ()
+
+    def _has(self, src):
+        return src[0] in self._source
+
+    def _get(self, src):
+        return self._source[src[0]][src[1]]
+
+    def _convert(self):
+        data = self._source
+        return {out: conv(data[k][idx]) for (k, idx), out, conv in self._plan if k in data}
 
 
 class BarParser:
@@ -135,35 +315,121 @@ class BarParser:
         8: ['count', int]
     }
 
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in BarParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(BarParser.map, subset) if subset else BarParser.plan
 
-        return {
-            key_value_pair[0]: key_value_pair[1](k)
-            for idx, k in enumerate(msg[1])
-            if (key_value_pair := BarParser.map.get(idx, idx))[0] in subset
-        }
+        return run_row_plan(plan, msg[1])
+
+    @staticmethod
+    def from_bar(bar, stamp):
+        return {'start_time_utc': stamp(bar.start), 'end_time_utc': stamp(bar.end), 'open': bar.open,
+                'high': bar.high, 'low': bar.low, 'close': bar.close, 'vwap': bar.vwap, 'volume': bar.volume,
+                'count': bar.count}
+
+
+class KrakenBook(OrderBook):
+    """
+    A class used to represent a local Kraken order book, which can compute the checksum Kraken sends with updates.
+
+    ...
+
+    Kraken computes its checksum from the price and volume strings of the levels, which floats cannot always
+    format back, e.g. large volumes with 8 decimals. The raw strings of each level are therefore kept as they
+    arrive in the snapshots and updates, alongside the float levels of the book.
+
+    Methods
+    -------
+    checksum():
+        Returns the CRC32 checksum of the book, as computed by Kraken.
+    """
+
+    def __init__(self, depth=10):
+        """
+        Constructs all the necessary attributes for the KrakenBook object.
+
+        Parameters
+        ----------
+            depth : int
+                the subscribed depth of the book (default is 10)
+        """
+        super().__init__(depth)
+        self._strings = ({}, {})
+
+    def apply(self, bids, asks, update_id=0):
+        super().apply(bids, asks, update_id)
+
+        for side, strings, levels in zip((self.bids, self.asks), self._strings, (bids, asks)):
+            sizes = side.sizes
+            for level in levels:
+                price = float(level[0])
+                if price in sizes:
+                    strings[price] = (level[0], level[1])
+                else:
+                    strings.pop(price, None)
+
+            # the levels truncated beyond the depth of the book
+            if len(strings) > len(sizes):
+                for price in [price for price in strings if price not in sizes]:
+                    del strings[price]
+
+    def reset(self):
+        super().reset()
+        self._strings = ({}, {})
+
+    def snapshot(self, bids, asks, update_id=0):
+        self._strings = ({}, {})
+        super().snapshot(bids, asks, update_id)
+
+    def checksum(self):
+        """
+        Returns the CRC32 checksum of the book, computed from the 10 best asks then the 10 best bids, each level
+        contributing its price and volume strings without the decimal point and leading zeros.
+
+        Returns
+        -------
+        int
+            the checksum
+        """
+        bids, asks = self.top(10)
+        bid_strings, ask_strings = self._strings
+
+        s = ''.join(p.replace('.', '').lstrip('0') + v.replace('.', '').lstrip('0')
+                    for p, v in [ask_strings[p] for p, _ in asks] + [bid_strings[p] for p, _ in bids])
+
+        return zlib.crc32(s.encode())
 
 
 class BookParser:
     map = {
-        0: ['price', float],
-        1: ['volume', float],
         2: ['time_utc', Parser.parse_datetime]
     }
 
+    extras = ['depth', 'type', 'best_bid', 'best_ask']
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in BookParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        """
+        Parses a book snapshot, or the levels of an update, into a Depth, along with the time of its latest level.
+        """
+        if plan is None:
+            plan = Parser.compile(BookParser.map, subset) if subset else BookParser.plan
+
+        asks, bids = [], []
+        for part in msg[1:-2]:
+            asks += part.get('as') or part.get('a', ())
+            bids += part.get('bs') or part.get('b', ())
 
-        asks = [{key_value_pair[0]: key_value_pair[1](k) for idx, k in enumerate(_)
-                if (key_value_pair := BookParser.map.get(idx, idx))[0] in subset} for _ in msg[1]['as']]
+        latest = max(asks + bids, key=operator.itemgetter(2), default=None)
 
-        bids = [{key_value_pair[0]: key_value_pair[1](k) for idx, k in enumerate(_)
-                if (key_value_pair := BookParser.map.get(idx, idx))[0] in subset} for _ in msg[1]['bs']]
+        dct = run_row_plan(plan, latest) if latest else {}
+        dct['depth'] = Depth.from_levels(bids, asks)
 
-        return {'bids': bids, 'asks': asks}
+        return dct
 
 
 class SpreadParser:
@@ -176,12 +442,14 @@ class SpreadParser:
         4: ['ask_volume', float],
     }
 
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in SpreadParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(SpreadParser.map, subset) if subset else SpreadParser.plan
 
-        return {key_value_pair[0]: key_value_pair[1](k) for idx, k in enumerate(msg[1])
-                if (key_value_pair := SpreadParser.map.get(idx, idx))[0] in subset}
+        return run_row_plan(plan, msg[1])
 
 
 class TradeParser:
@@ -195,16 +463,19 @@ class TradeParser:
         5: ['misc', str],
     }
 
+    plan = Parser.compile(map)
+
     @staticmethod
-    def parse(msg, subset=None):
-        subset = subset if subset else [k[0] for k in TradeParser.map.values()]
+    def parse(msg, subset=None, plan=None):
+        if plan is None:
+            plan = Parser.compile(TradeParser.map, subset) if subset else TradeParser.plan
 
-        ls = []
-        for d in msg[1]:
-            ls.append({key_value_pair[0]: key_value_pair[1](k) for idx, k in enumerate(d)
-                       if (key_value_pair := TradeParser.map.get(idx, idx))[0] in subset})
+        return {'trade': [run_row_plan(plan, d) for d in msg[1]]}
 
-        return {'trade': ls}
+    @staticmethod
+    def rows(msg):
+        # Kraken sends no trade id
+        return [(Parser.parse_epoch(d[2]), float(d[0]), float(d[1]), 1 if d[3] == 'b' else -1, -1) for d in msg[1]]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,340 @@
+import signal
+import threading
+import weakref
+
+import numpy as np
+
+
+STAGES = ('network', 'decode', 'parse', 'publish', 'total')
+
+_trackers = weakref.WeakSet()
+_installed = set()
+
+
+class Histogram:
+    """
+    A class used to count latencies in log-linear buckets, in the manner of HdrHistogram.
+
+    ...
+
+    Values below 2**sub_bits are counted exactly, larger ones in buckets 1/2**(sub_bits-1) of their magnitude
+    wide, e.g. within 1% with the default of 8 bits. The counts are held in a list allocated once, covering
+    values up to max_value, larger values being counted in the last bucket, so that recording is a few integer
+    operations and memory does not grow. Negative values, e.g. from clock skew, are counted as 0.
+
+    Attributes
+    ----------
+    count : int
+        the number of values recorded
+    max : int
+        the largest value recorded
+    total : int
+        the sum of the values recorded
+
+    Methods
+    -------
+    record(value):
+        Counts a value.
+    percentile(q):
+        Returns the value below which q percent of the values fall.
+    percentiles(qs):
+        Returns the values below which each of qs percent of the values fall.
+    merge(other):
+        Adds the counts of another histogram of the same layout.
+    reset():
+        Clears the counts.
+    """
+
+    def __init__(self, sub_bits=8, max_value=2**40):
+        """
+        Constructs all the necessary attributes for the Histogram object and allocates its counts.
+
+        Parameters
+        ----------
+            sub_bits : int
+                the number of bits of precision of the buckets (default is 8, within 1%)
+            max_value : int
+                the largest value counted in its own bucket (default is 2**40, about 18 minutes in nanoseconds)
+        """
+        self.sub_bits = sub_bits
+        self.max_value = max_value
+
+        self._half = 1 << (sub_bits - 1)
+        self._counts = [0] * (self._index(max_value) + 1)
+
+        self.count = 0
+        self.max = 0
+        self.total = 0
+
+    def _index(self, value):
+        shift = value.bit_length() - self.sub_bits
+        if shift <= 0:
+            return value
+
+        return shift * self._half + (value >> shift)
+
+    def _value(self, index):
+        """
+        Returns the highest value counted in a bucket.
+        """
+        shift = index // self._half - 1
+        if shift <= 0:
+            return index
+
+        return ((index - shift * self._half + 1) << shift) - 1
+
+    def record(self, value):
+        """
+        Counts a value.
+
+        Parameters
+        ----------
+        value : int
+            the value, e.g. a latency in nanoseconds
+        """
+        if value < 0:
+            value = 0
+        elif value > self.max:
+            self.max = value
+
+        self._counts[self._index(min(value, self.max_value))] += 1
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.
+
+    def percentiles(self, qs):
+        """
+        Returns the values below which each of qs percent of the values fall, within the precision of the buckets.
+
+        Parameters
+        ----------
+        qs : iterable
+            the percentiles, between 0 and 100
+
+        Returns
+        -------
+        list
+            the value of each percentile, 0 if nothing was recorded
+        """
+        if not self.count:
+            return [0 for _ in qs]
+
+        cumulative = np.cumsum(self._counts)
+        ranks = np.maximum(np.ceil(np.asarray(qs, dtype=float) / 100 * cumulative[-1]), 1)
+
+        # the last bucket holds the values beyond max_value, reported as the largest one
+        last = len(self._counts) - 1
+        return [self.max if index == last else min(self._value(int(index)), self.max)
+                for index in np.searchsorted(cumulative, ranks)]
+
+    def percentile(self, q):
+        """
+        Returns the value below which q percent of the values fall, within the precision of the buckets.
+
+        Parameters
+        ----------
+        q : float
+            the percentile, between 0 and 100
+
+        Returns
+        -------
+        int
+            the value of the percentile, 0 if nothing was recorded
+        """
+        return self.percentiles([q])[0]
+
+    def merge(self, other):
+        """
+        Adds the counts of another histogram of the same layout.
+
+        Parameters
+        ----------
+        other : Histogram
+            the histogram to add
+        """
+        self._counts = [a + b for a, b in zip(self._counts, other._counts)]
+        self.count += other.count
+        self.max = max(self.max, other.max)
+        self.total += other.total
+
+    def reset(self):
+        """
+        Clears the counts.
+        """
+        self._counts = [0] * len(self._counts)
+        self.count = self.max = self.total = 0
+
+
+class LatencyTracker:
+    """
+    A class used to keep the latency histograms of the stages messages go through in a client, per channel.
+
+    ...
+
+    The stages of a message are measured between the exchange event time, the receive time of its frame, the
+    end of its decoding, the end of its parsing and the end of its handling (storing it and publishing it, or
+    queueing it to the batch publisher):
+
+        network: receive time - exchange event time, including the clock offset with the exchange
+        decode: decoding of the frame
+        parse: parsing of the decoded frame
+        publish: storing and publishing of the parsed message
+        total: end of the handling - exchange event time
+
+    The network and total stages are only recorded for the messages carrying an event time. All times are in
+    nanoseconds. Trackers are registered to be printed by dump(), which dump_on_signal() runs on a signal.
+
+    Attributes
+    ----------
+    name : str
+        the name of the tracker in the reports, e.g. the name of the client class
+    histograms : dict
+        the Histogram of each stage, in a dict keyed by stage, keyed by channel
+
+    Methods
+    -------
+    record(channel, event, received, decoded, parsed, handled):
+        Records the stage latencies of a message.
+    percentiles(qs=(50, 90, 99, 99.9), channel=None):
+        Returns the percentiles of the stage latencies.
+    report(qs=(50, 90, 99, 99.9)):
+        Returns a table of the percentiles of the stage latencies, in microseconds.
+    reset():
+        Clears the histograms.
+    """
+
+    def __init__(self, name='', sub_bits=8):
+        """
+        Constructs all the necessary attributes for the LatencyTracker object and registers it.
+
+        Parameters
+        ----------
+            name : str
+                the name of the tracker in the reports (default is '')
+            sub_bits : int
+                the number of bits of precision of the histograms (default is 8, within 1%)
+        """
+        self.name = name
+        self.histograms = {}
+        self._sub_bits = sub_bits
+
+        _trackers.add(self)
+
+    def _channel(self, channel):
+        histograms = self.histograms[channel] = {stage: Histogram(self._sub_bits) for stage in STAGES}
+        return histograms
+
+    def record(self, channel, event, received, decoded, parsed, handled):
+        """
+        Records the stage latencies of a message.
+
+        Parameters
+        ----------
+        channel : str
+            the channel of the message
+        event : int
+            the exchange event time, in epoch nanoseconds, None if the message carries none
+        received, decoded, parsed, handled : int
+            the epoch times in nanoseconds at which the frame was received, decoded, parsed and handled
+        """
+        histograms = self.histograms.get(channel) or self._channel(channel)
+
+        histograms['decode'].record(decoded - received)
+        histograms['parse'].record(parsed - decoded)
+        histograms['publish'].record(handled - parsed)
+
+        if event is not None:
+            histograms['network'].record(received - event)
+            histograms['total'].record(handled - event)
+
+    def percentiles(self, qs=(50, 90, 99, 99.9), channel=None):
+        """
+        Returns the percentiles of the stage latencies.
+
+        Parameters
+        ----------
+        qs : tuple
+            the percentiles, between 0 and 100 (default is (50, 90, 99, 99.9))
+        channel : str
+            the channel, None for all channels merged (default is None)
+
+        Returns
+        -------
+        dict
+            the latency in nanoseconds of each percentile, in a dict keyed by percentile, keyed by stage
+        """
+        if channel is not None:
+            histograms = self.histograms.get(channel) or {stage: Histogram(self._sub_bits) for stage in STAGES}
+        else:
+            histograms = {stage: Histogram(self._sub_bits) for stage in STAGES}
+            for channel_histograms in list(self.histograms.values()):
+                for stage, histogram in channel_histograms.items():
+                    histograms[stage].merge(histogram)
+
+        return {stage: dict(zip(qs, histogram.percentiles(qs))) for stage, histogram in histograms.items()}
+
+    def report(self, qs=(50, 90, 99, 99.9)):
+        """
+        Returns a table of the percentiles of the stage latencies of each channel, in microseconds.
+
+        Parameters
+        ----------
+        qs : tuple
+            the percentiles, between 0 and 100 (default is (50, 90, 99, 99.9))
+
+        Returns
+        -------
+        str
+            the table, one line per channel and stage
+        """
+        lines = [f"{self.name:<24}{'stage':<10}{'count':>10}" + ''.join(f"{f'p{q:g}':>12}" for q in qs) + ' (us)']
+
+        for channel, histograms in sorted(self.histograms.items()):
+            for stage, histogram in histograms.items():
+                if histogram.count:
+                    values = ''.join(f'{v / 1000:>12,.1f}' for v in histogram.percentiles(qs))
+                    lines.append(f'{channel:<24}{stage:<10}{histogram.count:>10,}{values}')
+
+        return '\n'.join(lines)
+
+    def reset(self):
+        """
+        Clears the histograms.
+        """
+        self.histograms = {}
+
+
+def dump():
+    """
+    Prints the report of every latency tracker alive.
+    """
+    for tracker in list(_trackers):
+        print(tracker.report())
+
+
+def dump_on_signal(signum=getattr(signal, 'SIGUSR1', None)):
+    """
+    Makes a signal print the report of every latency tracker alive, e.g. kill -USR1 <pid>.
+    Only installed once per signal, from the main thread, and only if the signal is available on the platform.
+
+    Parameters
+    ----------
+    signum : int
+        the signal (default is SIGUSR1)
+
+    Returns
+    -------
+    bool
+        True if the handler is installed
+    """
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+
+    if signum not in _installed:
+        signal.signal(signum, lambda *_: dump())
+        _installed.add(signum)
+
+    return True
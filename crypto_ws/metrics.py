@@ -0,0 +1,196 @@
+import http.server
+import os
+import threading
+import weakref
+
+from crypto_ws.latency import Histogram
+
+
+METRICS = {
+    'crypto_ws_frames_total': ('counter', 'Frames received.'),
+    'crypto_ws_frame_bytes_total': ('counter', 'Bytes of the frames received.'),
+    'crypto_ws_messages_total': ('counter', 'Messages handled.'),
+    'crypto_ws_message_bytes_total': ('counter', 'Bytes of the frames the messages handled were parsed from.'),
+    'crypto_ws_skipped_frames_total': ('counter', 'Frames received which produced no message.'),
+    'crypto_ws_parse_failures_total': ('counter', 'Frames which failed to decode or parse.'),
+    'crypto_ws_reconnects_total': ('counter', 'Reconnections after a failure.'),
+    'crypto_ws_cache_flushes_total': ('counter', 'Pipelines of results cached in Redis.'),
+    'crypto_ws_cache_flushed_total': ('counter', 'Market results cached in Redis.'),
+    'crypto_ws_cache_pending': ('gauge', 'Market results waiting to be cached.'),
+    'crypto_ws_cache_failures_total': ('counter', 'Pipelines of results which failed to be cached.'),
+    'crypto_ws_published_total': ('counter', 'Messages published by the batch publisher.'),
+    'crypto_ws_publish_batches_total': ('counter', 'Pipelines sent by the batch publisher.'),
+    'crypto_ws_publish_failures_total': ('counter', 'Pipelines the batch publisher failed to send.'),
+    'crypto_ws_publish_queue_depth': ('gauge', 'Messages waiting for the batch publisher.'),
+    'crypto_ws_publish_dropped_total': ('counter', 'Messages dropped as the publishing queue was full.'),
+    'crypto_ws_conflated_total': ('counter', 'Messages replaced by a newer one before being published.'),
+    'crypto_ws_read_queue_depth': ('gauge', 'Frames received by the reader thread and not yet processed.'),
+    'crypto_ws_read_dropped_total': ('counter', 'Frames dropped by the reader thread as the ring was full.'),
+    'crypto_ws_read_conflated_total': ('counter', 'Frames replaced by a newer one as the ring was full.'),
+    'crypto_ws_read_blocked_total': ('counter', 'Times the reader thread waited for room in the ring.'),
+    'crypto_ws_redis_latency_seconds': ('summary', 'Latency of the Redis commands and pipelines.'),
+}
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """
+    A class used to collect the metrics of the clients and expose them in the Prometheus text format.
+
+    ...
+
+    The clients count what they do in plain integer attributes, each written by a single thread: the receiving
+    thread counts frames and messages, the scheduler thread the cache flushes, the publisher thread the batches.
+    Counting costs no lock on the hot path, and the registry reads and sums the counters when it is scraped.
+    Sources are held by weak references and yield their samples from a metrics() method, as (name, labels,
+    value) tuples, the value of a summary being a Histogram of nanoseconds, rendered in seconds. The servers
+    are not inherited by forked processes, e.g. the workers of crypto_ws.supervisor, which serve their own.
+
+    Methods
+    -------
+    register(source):
+        Adds a source of metrics.
+    collect():
+        Returns the samples of all the sources, summed by name and labels.
+    render():
+        Returns the samples in the Prometheus text format.
+    serve(port=9108, host='127.0.0.1'):
+        Serves the metrics over HTTP from a background thread.
+    """
+
+    def __init__(self):
+        """
+        Constructs all the necessary attributes for the MetricsRegistry object.
+        """
+        self._sources = weakref.WeakSet()
+        self._servers = {}
+        self._lock = threading.Lock()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._forget_servers)
+
+    def _forget_servers(self):
+        # the serving threads do not survive the fork
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def register(self, source):
+        """
+        Adds a source of metrics, until it is garbage collected.
+
+        Parameters
+        ----------
+        source : object
+            an object with a metrics() method yielding (name, labels, value) samples
+        """
+        self._sources.add(source)
+
+    def collect(self):
+        """
+        Returns the samples of all the sources, the samples of a same name and labels being summed, or merged
+        for summaries, e.g. across the shards of a client.
+
+        Returns
+        -------
+        dict
+            the value of each sample, keyed by (name, labels as a tuple of (key, value) pairs)
+        """
+        samples = {}
+
+        for source in list(self._sources):
+            for name, labels, value in source.metrics():
+                key = (name, tuple(labels.items()))
+
+                if isinstance(value, Histogram):
+                    merged = samples.get(key)
+                    if merged is None:
+                        merged = samples[key] = Histogram(value.sub_bits, value.max_value)
+                    merged.merge(value)
+                else:
+                    samples[key] = samples.get(key, 0) + value
+
+        return samples
+
+    def render(self):
+        """
+        Returns the samples of all the sources in the Prometheus text format.
+
+        Returns
+        -------
+        str
+            the exposition text
+        """
+        by_name = {}
+        for (name, labels), value in sorted(self.collect().items(), key=lambda item: item[0]):
+            by_name.setdefault(name, []).append((dict(labels), value))
+
+        lines = []
+        for name, samples in by_name.items():
+            kind, doc = METRICS.get(name, ('untyped', ''))
+            lines += [f'# HELP {name} {doc}', f'# TYPE {name} {kind}']
+
+            for labels, value in samples:
+                if isinstance(value, Histogram):
+                    for q, v in zip(QUANTILES, value.percentiles([q * 100 for q in QUANTILES])):
+                        lines.append(f'{name}{_labels(dict(labels, quantile=q))} {v / 1e9:.9f}')
+                    lines.append(f'{name}_sum{_labels(labels)} {value.total / 1e9:.9f}')
+                    lines.append(f'{name}_count{_labels(labels)} {value.count}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=9108, host='127.0.0.1'):
+        """
+        Serves the metrics over HTTP from a background thread, on any path, e.g. http://127.0.0.1:9108/metrics.
+        Only one server is started per address.
+
+        Parameters
+        ----------
+        port : int
+            the port to listen on (default is 9108), 0 to pick a free one
+        host : str
+            the interface to listen on (default is '127.0.0.1')
+
+        Returns
+        -------
+        http.server.ThreadingHTTPServer
+            the server, whose server_address holds the actual port
+        """
+        with self._lock:
+            server = self._servers.get((host, port))
+            if server is not None:
+                return server
+
+            registry = self
+
+            class Handler(http.server.BaseHTTPRequestHandler):
+
+                def do_GET(self):
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            server = self._servers[(host, port)] = http.server.ThreadingHTTPServer((host, port), Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='Metrics', daemon=True).start()
+
+            return server
+
+
+registry = MetricsRegistry()
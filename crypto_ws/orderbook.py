@@ -0,0 +1,346 @@
+import bisect
+
+import numpy as np
+
+from crypto_ws.depth import Depth
+
+
+class BookSide:
+    """
+    A class used to represent one side of a local order book, the size of each price level.
+
+    ...
+
+    The sizes are kept in a dict keyed by price and the prices in a sorted list, so that a level update is a dict
+    write plus, when a level appears or disappears, one bisection in the list. The best levels are read from the
+    list without sorting or copying.
+
+    Attributes
+    ----------
+    sizes : dict
+        the size of each price level, keyed by price
+    prices : list
+        the prices of the levels, in ascending order
+    descending : bool
+        True if the best level is the highest price, as for bids
+
+    Methods
+    -------
+    update(price, size):
+        Sets the size of a price level, removing it if the size is zero.
+    clear():
+        Removes all the levels.
+    best():
+        Returns the best price.
+    truncate(depth):
+        Removes the levels beyond the depth best ones.
+    top(n):
+        Returns the n best levels.
+    to_array(n):
+        Returns the n best levels as a (n, 2) array.
+    """
+
+    __slots__ = ('sizes', 'prices', 'descending')
+
+    def __init__(self, descending=False):
+        """
+        Constructs all the necessary attributes for the BookSide object.
+
+        Parameters
+        ----------
+            descending : bool
+                True if the best level is the highest price, as for bids (default is False)
+        """
+        self.sizes = {}
+        self.prices = []
+        self.descending = descending
+
+    def __len__(self):
+        return len(self.prices)
+
+    def update(self, price, size):
+        """
+        Sets the size of a price level, removing the level if the size is zero.
+
+        Parameters
+        ----------
+        price : float
+            the price of the level
+        size : float
+            the new size of the level, 0 to remove it
+        """
+        if size:
+            if price not in self.sizes:
+                bisect.insort(self.prices, price)
+            self.sizes[price] = size
+
+        elif self.sizes.pop(price, None) is not None:
+            del self.prices[bisect.bisect_left(self.prices, price)]
+
+    def clear(self):
+        """
+        Removes all the levels.
+        """
+        self.sizes.clear()
+        self.prices.clear()
+
+    def best(self):
+        """
+        Returns the best price.
+
+        Returns
+        -------
+        float
+            the highest price for bids, the lowest for asks, None if the side is empty
+        """
+        if not self.prices:
+            return None
+        return self.prices[-1] if self.descending else self.prices[0]
+
+    def truncate(self, depth):
+        """
+        Removes the levels beyond the depth best ones.
+
+        Parameters
+        ----------
+        depth : int
+            the number of levels to keep
+        """
+        if len(self.prices) > depth:
+            worst = self.prices[:-depth] if self.descending else self.prices[depth:]
+            for price in worst:
+                del self.sizes[price]
+            if self.descending:
+                del self.prices[:-depth]
+            else:
+                del self.prices[depth:]
+
+    def top(self, n=None):
+        """
+        Returns the n best levels, best first.
+
+        Parameters
+        ----------
+        n : int
+            the number of levels (default is None, all of them)
+
+        Returns
+        -------
+        list
+            the [price, size] levels
+        """
+        prices = self.prices
+        if n is None or n > len(prices):
+            n = len(prices)
+
+        sizes = self.sizes
+        if self.descending:
+            return [[p, sizes[p]] for p in prices[-1:-n - 1:-1]]
+        return [[p, sizes[p]] for p in prices[:n]]
+
+    def to_array(self, n=None):
+        """
+        Returns the n best levels as a (n, 2) array, best first.
+
+        Parameters
+        ----------
+        n : int
+            the number of levels (default is None, all of them)
+
+        Returns
+        -------
+        np.ndarray
+            the [price, size] levels
+        """
+        prices = self.prices
+        if n is None or n > len(prices):
+            n = len(prices)
+
+        best = prices[-1:-n - 1:-1] if self.descending else prices[:n]
+
+        arr = np.empty((n, 2))
+        arr[:, 0] = best
+        arr[:, 1] = [self.sizes[p] for p in best]
+        return arr
+
+
+class OrderBook:
+    """
+    A class used to represent a local L2 order book, maintained from the snapshots and deltas of an exchange.
+
+    ...
+
+    Attributes
+    ----------
+    bids : BookSide
+        the bid levels
+    asks : BookSide
+        the ask levels
+    update_id : int
+        the update id of the last snapshot or delta applied, None until a snapshot is applied
+    depth : int
+        the number of levels kept on each side, None to keep them all
+
+    Methods
+    -------
+    snapshot(bids, asks, update_id=0):
+        Replaces the book with a snapshot.
+    apply(bids, asks, update_id=0):
+        Applies a delta to the book.
+    reset():
+        Empties the book, until the next snapshot.
+    top(n=None):
+        Returns the n best bid and ask levels.
+    to_depth(n=None):
+        Returns the n best levels as a Depth.
+    """
+
+    def __init__(self, depth=None):
+        """
+        Constructs all the necessary attributes for the OrderBook object.
+
+        Parameters
+        ----------
+            depth : int
+                the number of levels kept on each side (default is None, all of them)
+        """
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide()
+        self.update_id = None
+        self.depth = depth
+
+    @property
+    def synced(self):
+        """
+        Checks if the book was built from a snapshot, and can be updated with deltas.
+
+        Returns
+        -------
+        bool
+            True once a snapshot was applied, until the book is reset.
+        """
+        return self.update_id is not None
+
+    def snapshot(self, bids, asks, update_id=0):
+        """
+        Replaces the book with a snapshot.
+
+        Parameters
+        ----------
+        bids : list
+            the [price, size] bid levels, as numbers or strings
+        asks : list
+            the [price, size] ask levels, as numbers or strings
+        update_id : int
+            the update id of the snapshot (default is 0)
+        """
+        self.bids.clear()
+        self.asks.clear()
+        self.apply(bids, asks, update_id)
+
+    def apply(self, bids, asks, update_id=0):
+        """
+        Applies a delta to the book, a level of size zero being removed.
+
+        Parameters
+        ----------
+        bids : list
+            the [price, size] bid levels, as numbers or strings
+        asks : list
+            the [price, size] ask levels, as numbers or strings
+        update_id : int
+            the update id of the delta (default is 0)
+        """
+        update = self.bids.update
+        for level in bids:
+            update(float(level[0]), float(level[1]))
+
+        update = self.asks.update
+        for level in asks:
+            update(float(level[0]), float(level[1]))
+
+        if self.depth is not None:
+            self.bids.truncate(self.depth)
+            self.asks.truncate(self.depth)
+
+        self.update_id = update_id
+
+    def reset(self):
+        """
+        Empties the book, deltas being ignored until the next snapshot.
+        """
+        self.bids.clear()
+        self.asks.clear()
+        self.update_id = None
+
+    @property
+    def best_bid(self):
+        """
+        Returns the best bid price, None if there are no bids.
+        """
+        return self.bids.best()
+
+    @property
+    def best_ask(self):
+        """
+        Returns the best ask price, None if there are no asks.
+        """
+        return self.asks.best()
+
+    @property
+    def mid(self):
+        """
+        Returns the mid price.
+
+        Returns
+        -------
+        float
+            the average of the best bid and ask prices, None if a side is empty
+        """
+        bid, ask = self.bids.best(), self.asks.best()
+        return None if bid is None or ask is None else (bid + ask) / 2
+
+    @property
+    def spread(self):
+        """
+        Returns the bid-ask spread.
+
+        Returns
+        -------
+        float
+            the best ask price minus the best bid price, None if a side is empty
+        """
+        bid, ask = self.bids.best(), self.asks.best()
+        return None if bid is None or ask is None else ask - bid
+
+    def top(self, n=None):
+        """
+        Returns the n best bid and ask levels.
+
+        Parameters
+        ----------
+        n : int
+            the number of levels per side (default is None, all of them)
+
+        Returns
+        -------
+        tuple
+            the [price, size] bid levels and ask levels, best first
+        """
+        return self.bids.top(n), self.asks.top(n)
+
+    def to_depth(self, n=None):
+        """
+        Returns the n best levels as a Depth, the format of the depth parsers.
+
+        Parameters
+        ----------
+        n : int
+            the number of levels per side (default is None, all of them)
+
+        Returns
+        -------
+        Depth
+            the bid and ask levels, best first
+        """
+        return Depth(self.bids.to_array(n), self.asks.to_array(n))
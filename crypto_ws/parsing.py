@@ -0,0 +1,389 @@
+import collections.abc
+import keyword
+
+
+class Plan(tuple):
+    """
+    A class used to represent a plan, the fixed (source key, output key, converter) tuples a parser extracts.
+
+    ...
+
+    Attributes
+    ----------
+    stamp : callable
+        the converter of the timestamps the parser adds outside of its map, e.g. the response time
+    lazy : bool
+        True if the plan returns LazyMessage views instead of dicts
+    record : type
+        the Record type the plan returns instead of dicts, see record_type, None for dicts
+    fields : dict
+        the (source key, converter) of each output key
+    """
+
+    stamp = None
+    lazy = False
+    record = None
+    fields = {}
+
+
+class LazyMessage(collections.abc.Mapping):
+    """
+    A class used to represent a parsed message as a read-only view on its decoded frame, which converts each
+    field of its plan on first access and keeps the converted value.
+
+    ...
+
+    Consumers reading a few fields of a wide message, e.g. the price of a ticker, only pay for those. The view
+    behaves as the dict the plan would return, and turns into one with to_dict(), which serialize() calls when
+    the message is cached or published. It keeps the decoded frame alive for as long as it is stored.
+    Fields added by the parser outside of its plan, e.g. the response time, are set as items.
+
+    Methods
+    -------
+    to_dict():
+        Returns the message as a dict, converting the fields not accessed yet.
+    """
+
+    __slots__ = ('_plan', '_source', '_values')
+
+    def __init__(self, plan, source):
+        """
+        Constructs all the necessary attributes for the LazyMessage object.
+
+        Parameters
+        ----------
+            plan : Plan
+                the plan of the parser
+            source : dict or list
+                the part of the decoded frame the plan extracts the fields from
+        """
+        self._plan = plan
+        self._source = source
+        self._values = {}
+
+    def _has(self, src):
+        return src in self._source
+
+    def _get(self, src):
+        return self._source[src]
+
+    def __getitem__(self, key):
+        values = self._values
+        if key in values:
+            return values[key]
+
+        field = self._plan.fields.get(key)
+        if field is not None:
+            try:
+                raw = self._get(field[0])
+            except (KeyError, IndexError):
+                pass
+            else:
+                value = values[key] = field[1](raw)
+                return value
+
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+
+    def _keys(self):
+        fields = self._plan.fields
+        keys = [out for src, out, conv in self._plan if self._has(src)]
+        return keys + [key for key in self._values if key not in fields or not self._has(fields[key][0])]
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __bool__(self):
+        return bool(self._values) or any(self._has(src) for src, out, conv in self._plan)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def _convert(self):
+        source = self._source
+        return {out: conv(source[src]) for src, out, conv in self._plan if src in source}
+
+    def to_dict(self):
+        """
+        Returns the message as a dict, in the order of the dict the plan would return. The fields are converted
+        in one pass, as by run_plan, rather than one by one.
+
+        Returns
+        -------
+        dict
+            the converted fields, keyed by output key
+        """
+        dct = self._convert()
+        dct.update(self._values)
+        return dct
+
+
+class LazyRow(LazyMessage):
+    """
+    A class used to represent a parsed message as a lazy view on a list, the source keys of its plan being indices.
+    """
+
+    __slots__ = ()
+
+    def _has(self, src):
+        return src < len(self._source)
+
+    def _convert(self):
+        row, n = self._source, len(self._source)
+        return {out: conv(row[idx]) for idx, out, conv in self._plan if idx < n}
+
+
+_MISSING = object()
+
+
+class Record(collections.abc.Mapping):
+    """
+    A class used to represent a parsed message compactly, as an object holding each field in a slot.
+
+    ...
+
+    Record types are generated from the plans of the parsers by record_type(), with a slot per output key of the
+    plan and per key the parser adds outside of it, e.g. the response time. A record takes a fraction of the
+    memory of the equivalent dict, the field names being held once by its type. The fields are attributes, e.g.
+    ticker.close, and the record behaves as the dict the plan would return, the fields missing from the message
+    being unset. It turns into a dict with to_dict(), which serialize() calls when it is cached or published.
+
+    Attributes
+    ----------
+    FIELDS : tuple
+        the names of the fields, in the order of the dict the plan would return
+
+    Methods
+    -------
+    build(msg):
+        Builds a record from the fields of a message, generated for each type.
+    to_dict():
+        Returns the fields set as a dict.
+    """
+
+    __slots__ = ()
+
+    FIELDS = ()
+    _names = frozenset()
+
+    def __getitem__(self, key):
+        if key in self._names:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self._names:
+            raise KeyError(f'{type(self).__name__} has no field {key!r}')
+
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._names and hasattr(self, key)
+
+    def __iter__(self):
+        return (name for name in self.FIELDS if hasattr(self, name))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        for name in self.FIELDS:
+            if hasattr(self, name):
+                return True
+
+        return False
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())})"
+
+    def to_dict(self):
+        """
+        Returns the fields set as a dict.
+
+        Returns
+        -------
+        dict
+            the fields, keyed by name
+        """
+        dct = {}
+        for name in self.FIELDS:
+            value = getattr(self, name, _MISSING)
+            if value is not _MISSING:
+                dct[name] = value
+
+        return dct
+
+
+_record_types = {}
+
+
+def _to_dict(fields):
+    """
+    Generates the to_dict method of a record type, with one statement per field, unset fields being skipped.
+    """
+    lines = ['def to_dict(self):', '    dct = {}']
+    for name in fields:
+        lines += ['    try:', f'        dct[{name!r}] = self.{name}', '    except AttributeError:', '        pass']
+    lines.append('    return dct')
+
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['to_dict']
+
+
+def _builder(cls, plan):
+    """
+    Generates the function building a record from a message, with one statement per field of the plan, as
+    collections.namedtuple generates its methods, so that no loop or intermediate dict is involved.
+    The source keys are read as dict keys, list indices, or (key, index) pairs of a dict of lists.
+    """
+    namespace = {'new': object.__new__, 'cls': cls}
+    lines = ['def build(msg):', '    record = new(cls)']
+
+    if any(isinstance(src, int) for src, out, conv in plan):
+        lines.append('    n = len(msg)')
+
+    for i, (src, out, conv) in enumerate(plan):
+        namespace[f'conv{i}'] = conv
+
+        if isinstance(src, tuple):
+            test, value = f'{src[0]!r} in msg', f'msg[{src[0]!r}][{src[1]!r}]'
+        elif isinstance(src, int):
+            test, value = f'n > {src!r}', f'msg[{src!r}]'
+        else:
+            test, value = f'{src!r} in msg', f'msg[{src!r}]'
+
+        lines.append(f'    if {test}:')
+        lines.append(f'        record.{out} = conv{i}({value})')
+
+    lines.append('    return record')
+    exec('\n'.join(lines), namespace)
+
+    return namespace['build']
+
+
+def record_type(name, plan, extras=()):
+    """
+    Returns the Record type of a plan, generating it on first use.
+
+    Parameters
+    ----------
+    name : str
+        the name of the type, e.g. 'BinanceTicker'
+    plan : Plan
+        the plan of the parser
+    extras : tuple
+        the keys the parser adds outside of its plan, e.g. ('respond_time_utc',) (default is ())
+
+    Returns
+    -------
+    type
+        the Record subclass with a slot per field, whose build(msg) extracts and converts the fields of the plan
+    """
+    key = (name, tuple(plan), tuple(extras))
+
+    cls = _record_types.get(key)
+    if cls is None:
+        fields = tuple(out for src, out, conv in plan) + tuple(k for k in extras if k not in plan.fields)
+
+        invalid = [k for k in fields if not k.isidentifier() or keyword.iskeyword(k) or hasattr(Record, k)]
+        if invalid:
+            raise ValueError(f'Fields {invalid} of {name} cannot be record attributes')
+
+        cls = type(name, (Record,), {'__slots__': fields, 'FIELDS': fields, '_names': frozenset(fields),
+                                     'to_dict': _to_dict(fields)})
+        cls.build = staticmethod(_builder(cls, plan))
+        _record_types[key] = cls
+
+    return cls
+
+
+def compile_plan(mapping, subset=None, stamps=None, lazy=False):
+    """
+    Compiles the map of a parser into a plan, the fixed list of fields to extract from a message.
+
+    Parameters
+    ----------
+    mapping : dict
+        the map of the parser: {source key: [output key, converter]}
+    subset : list
+        the output keys to keep (default is None, all of them)
+    stamps : tuple
+        the (timestamp converter used in the map, timestamp converter to use instead) pair, the latter becoming
+        the stamp of the plan (default is None, the map converters are kept)
+    lazy : bool
+        True for the plan to return LazyMessage views, converting the fields on access (default is False)
+
+    Returns
+    -------
+    Plan
+        the (source key, output key, converter) tuples of the kept fields, in the order of the map
+    """
+    old, new = stamps if stamps else (None, None)
+
+    plan = Plan((src, out, new if conv is old else conv) for src, (out, conv) in mapping.items()
+                if subset is None or out in subset)
+    plan.stamp = new
+    plan.lazy = lazy
+    plan.fields = {out: (src, conv) for src, out, conv in plan}
+
+    return plan
+
+
+def run_plan(plan, msg):
+    """
+    Extracts and converts the fields of a plan from a message, skipping the ones it does not have.
+
+    Parameters
+    ----------
+    plan : tuple
+        the plan, as returned by compile_plan
+    msg : dict
+        the message
+
+    Returns
+    -------
+    dict or LazyMessage or Record
+        the converted fields, keyed by output key, as a view converting them on access if the plan is lazy, or
+        as a record if the plan has a record type
+    """
+    if plan.record is not None:
+        return plan.record.build(msg)
+    if plan.lazy:
+        return LazyMessage(plan, msg)
+
+    return {out: conv(msg[src]) for src, out, conv in plan if src in msg}
+
+
+def run_row_plan(plan, row):
+    """
+    Extracts and converts the fields of a plan from a list, the source keys of the plan being indices.
+
+    Parameters
+    ----------
+    plan : tuple
+        the plan, as returned by compile_plan
+    row : list
+        the message
+
+    Returns
+    -------
+    dict or LazyRow or Record
+        the converted fields, keyed by output key, as a view converting them on access if the plan is lazy, or
+        as a record if the plan has a record type
+    """
+    if plan.record is not None:
+        return plan.record.build(row)
+    if plan.lazy:
+        return LazyRow(plan, row)
+
+    n = len(row)
+    return {out: conv(row[idx]) for idx, out, conv in plan if idx < n}
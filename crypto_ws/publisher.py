@@ -0,0 +1,210 @@
+import atexit
+import queue
+import threading
+import time
+
+from crypto_ws.latency import Histogram
+from crypto_ws.utils import serialize
+
+
+_STOP = object()
+_LATEST = object()
+
+
+class BatchPublisher:
+    """
+    A class used to publish messages on Redis in batches, from a background thread.
+
+    ...
+
+    Messages are put in a bounded queue and published by a background thread, which collects them for up to
+    `window` seconds or `max_batch` messages and sends each batch as a single pipeline. When the queue is full,
+    publish() blocks until there is room, so that no message is lost. The pending messages are flushed on close(),
+    which is also called at interpreter exit.
+
+    Messages published with a conflation key, e.g. the (channel, market) of a ticker, are conflated: only the
+    latest message of a key waits to be published, the queue holding a single marker per key, which the thread
+    replaces with the message current when it sends the batch. Messages without a key, e.g. trades, are all
+    published, in order.
+
+    Attributes
+    ----------
+    n_published : int
+        the number of messages published so far
+    n_batches : int
+        the number of pipelines sent so far
+    n_failures : int
+        the number of pipelines which failed to be sent
+    latency : Histogram
+        the latencies in nanoseconds of the pipelines sent
+
+    Methods
+    -------
+    publish(channel, msg, key=None):
+        Queues a message to be published, conflated with the pending one of its key if any.
+    close(timeout=None):
+        Publishes the pending messages and stops the background thread.
+    metrics(labels):
+        Yields the metrics of the publisher, see crypto_ws.metrics.
+    """
+
+    def __init__(self, client, window=0.005, max_batch=500, max_queue=100000):
+        """
+        Constructs all the necessary attributes for the BatchPublisher object and starts its thread.
+
+        Parameters
+        ----------
+        client : redis.Redis
+            the Redis client to publish with
+        window : float
+            the maximum time in seconds a message waits for others before its batch is sent (default is 0.005)
+        max_batch : int
+            the maximum number of messages per batch (default is 500)
+        max_queue : int
+            the maximum number of messages waiting to be published (default is 100000)
+        """
+        self._client = client
+        self._window = window
+        self._max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+
+        self._latest = {}
+        self._lock = threading.Lock()
+
+        self.n_published = 0
+        self.n_batches = 0
+        self.n_failures = 0
+        self.latency = Histogram()
+
+        self._thread = threading.Thread(target=self._run, name='BatchPublisher', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def publish(self, channel, msg, key=None):
+        """
+        Queues a message to be published, waiting for room if the queue is full, or replaces the pending message
+        of its conflation key.
+
+        Parameters
+        ----------
+        channel : str
+            the Redis channel to publish the message to
+        msg : dict or str
+            the message to publish, serialized to JSON unless it is a str or bytes
+        key : tuple
+            the conflation key of the message, e.g. its (channel, market) (default is None, not conflated)
+
+        Returns
+        -------
+        bool
+            True if the message replaced a pending message of its key
+        """
+        if key is None:
+            self._queue.put((channel, msg))
+            return False
+
+        with self._lock:
+            conflated = key in self._latest
+            self._latest[key] = (channel, msg)
+
+        if not conflated:
+            self._queue.put((_LATEST, key))
+
+        return conflated
+
+    def close(self, timeout=None):
+        """
+        Publishes the pending messages and stops the background thread.
+
+        Parameters
+        ----------
+        timeout : float
+            the maximum time in seconds to wait for the pending messages to be published (default is None)
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+
+        self._thread.join(timeout)
+
+    def _run(self):
+        stop = False
+
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self._window
+
+            while len(batch) < self._max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        self._flush([item for item in batch if item is not _STOP])
+
+    def _flush(self, batch):
+        if not batch:
+            return
+
+        # the markers are all resolved before anything can fail, so that no key is left without one
+        with self._lock:
+            batch = [self._latest.pop(msg) if channel is _LATEST else (channel, msg) for channel, msg in batch]
+
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for channel, msg in batch:
+                try:
+                    data = serialize(msg)
+                except Exception as e:
+                    print(f"Error: serializing a message to {channel} failed: {e}")
+                    continue
+
+                pipe.publish(channel, data)
+
+            start = time.perf_counter_ns()
+            pipe.execute()
+            self.latency.record(time.perf_counter_ns() - start)
+
+            self.n_published += len(batch)
+            self.n_batches += 1
+        except Exception as e:
+            self.n_failures += 1
+            print(f"Error: publishing {len(batch)} messages failed: {e}")
+
+    def metrics(self, labels):
+        """
+        Yields the metrics of the publisher, see crypto_ws.metrics.
+
+        Parameters
+        ----------
+        labels : dict
+            the labels of the samples, e.g. the exchange of the client
+
+        Yields
+        ------
+        tuple
+            the name, labels and value of each sample
+        """
+        yield 'crypto_ws_published_total', labels, self.n_published
+        yield 'crypto_ws_publish_batches_total', labels, self.n_batches
+        yield 'crypto_ws_publish_failures_total', labels, self.n_failures
+        yield 'crypto_ws_publish_queue_depth', labels, self._queue.qsize()
+
+        if self.latency.count:
+            yield 'crypto_ws_redis_latency_seconds', dict(labels, op='publish_batch'), self.latency
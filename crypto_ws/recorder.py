@@ -0,0 +1,200 @@
+import atexit
+import datetime as dt
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+
+MAGIC = b'CWSREC1\n'
+
+_BLOCK = struct.Struct('<I')
+_RECORD = struct.Struct('<qBI')
+
+_STOP = object()
+
+
+class Recorder:
+    """
+    A class used to record the raw frames received by clients to files, from a background thread.
+
+    ...
+
+    record() only timestamps a frame and puts it in a queue. The background thread packs the frames in blocks of
+    records, each record being the local receive time in nanoseconds, the WebSocket opcode and the length of the
+    frame followed by the frame, and writes each block zlib-compressed and prefixed by its compressed length.
+    Files start with MAGIC and are rotated when they reach max_bytes or are older than max_seconds. The pending
+    frames are written on close(), which is also called at interpreter exit. Recorded files are read back with
+    read_frames.
+
+    Attributes
+    ----------
+    directory : str
+        the directory of the files
+    prefix : str
+        the prefix of the file names, followed by the opening time of the file
+    n_frames : int
+        the number of frames written so far
+    paths : list
+        the paths of the files written so far
+
+    Methods
+    -------
+    record(opcode, frame):
+        Queues a frame to be recorded.
+    close(timeout=None):
+        Writes the pending frames and stops the background thread.
+    """
+
+    def __init__(self, directory='.', prefix='frames', max_bytes=256 * 2**20, max_seconds=3600, block_size=2**20,
+                 level=1):
+        """
+        Constructs all the necessary attributes for the Recorder object and starts its thread.
+
+        Parameters
+        ----------
+            directory : str
+                the directory of the files, created if needed (default is the current directory)
+            prefix : str
+                the prefix of the file names (default is 'frames')
+            max_bytes : int
+                the size in bytes beyond which a new file is started (default is 256 MiB)
+            max_seconds : float
+                the age in seconds beyond which a new file is started (default is 3600)
+            block_size : int
+                the size in bytes of the uncompressed blocks (default is 1 MiB)
+            level : int
+                the zlib compression level (default is 1, the fastest)
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self._max_bytes = max_bytes
+        self._max_seconds = max_seconds
+        self._block_size = block_size
+        self._level = level
+
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._file = None
+        self._opened = 0.
+
+        self.n_frames = 0
+        self.paths = []
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._run, name='Recorder', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, opcode, frame):
+        """
+        Queues a frame to be recorded, with the current time.
+
+        Parameters
+        ----------
+        opcode : int
+            the WebSocket opcode of the frame, e.g. 1 for text and 2 for binary
+        frame : bytes or str
+            the raw frame
+        """
+        self._queue.put((time.time_ns(), opcode, frame))
+
+    def close(self, timeout=None):
+        """
+        Writes the pending frames and stops the background thread.
+
+        Parameters
+        ----------
+        timeout : float
+            the maximum time in seconds to wait for the pending frames to be written (default is None)
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+
+        self._thread.join(timeout)
+
+    def _run(self):
+        block = bytearray()
+
+        while True:
+            try:
+                item = self._queue.get(timeout=1)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                break
+
+            if item is not None:
+                ts, opcode, frame = item
+                if isinstance(frame, str):
+                    frame = frame.encode()
+
+                block += _RECORD.pack(ts, opcode, len(frame))
+                block += frame
+                self.n_frames += 1
+
+            # a block is written once full, or when the frames stop coming for a second
+            if len(block) >= self._block_size or (item is None and block):
+                self._write(block)
+                block = bytearray()
+
+        if block:
+            self._write(block)
+        if self._file is not None:
+            self._file.close()
+
+    def _write(self, block):
+        if self._file is None or self._file.tell() >= self._max_bytes or \
+                time.monotonic() - self._opened >= self._max_seconds:
+            self._rotate()
+
+        data = zlib.compress(bytes(block), self._level)
+        self._file.write(_BLOCK.pack(len(data)))
+        self._file.write(data)
+        self._file.flush()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+
+        stamp = dt.datetime.now(dt.timezone.utc).strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(self.directory, f'{self.prefix}-{stamp}-{len(self.paths):04d}.rec')
+
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._opened = time.monotonic()
+        self.paths.append(path)
+
+
+def read_frames(path):
+    """
+    Reads the frames of a file written by a Recorder.
+
+    Parameters
+    ----------
+    path : str
+        the path of the file
+
+    Yields
+    ------
+    tuple
+        the receive time in nanoseconds, the opcode and the raw bytes of each frame, in the order received
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a recorded frames file')
+
+        while header := f.read(_BLOCK.size):
+            block = zlib.decompress(f.read(_BLOCK.unpack(header)[0]))
+
+            pos = 0
+            while pos < len(block):
+                ts, opcode, size = _RECORD.unpack_from(block, pos)
+                pos += _RECORD.size
+                yield ts, opcode, block[pos:pos + size]
+                pos += size
@@ -0,0 +1,175 @@
+import argparse
+import glob
+import importlib
+import os
+import time
+
+from crypto_ws.recorder import read_frames
+
+
+class ReplayEnd(Exception):
+    """
+    Raised by a ReplaySocket once all its frames were received.
+    """
+
+
+class ReplaySocket:
+    """
+    A class standing in for the socket returned by websocket.create_connection, which receives recorded frames.
+
+    ...
+
+    The frames are returned by recv_data() as fast as possible, or paced by their receive times divided by a
+    speed multiplier. The frames sent, e.g. subscriptions and keep-alive signals, are dropped.
+
+    Attributes
+    ----------
+    paths : list
+        the paths of the files written by a Recorder, replayed in order
+    speed : float
+        the speed multiplier of the pacing, None to replay as fast as possible
+    n_frames : int
+        the number of frames received so far
+
+    Methods
+    -------
+    recv_data():
+        Returns the next recorded frame, raising ReplayEnd at the end of the files.
+    send(msg):
+        Drops a frame sent.
+    ping(payload=''):
+        Drops a ping.
+    close():
+        Stops the replay.
+    """
+
+    def __init__(self, paths, speed=None):
+        """
+        Constructs all the necessary attributes for the ReplaySocket object.
+
+        Parameters
+        ----------
+            paths : str or list
+                a file or directory written by a Recorder, or a list of files
+            speed : float
+                the speed multiplier of the pacing, e.g. 1 for real time or 10 for ten times faster (default is
+                None, the frames are replayed as fast as possible)
+        """
+        if isinstance(paths, str):
+            paths = sorted(glob.glob(os.path.join(paths, '*.rec'))) if os.path.isdir(paths) else [paths]
+
+        self.paths = paths
+        self.speed = speed
+        self.n_frames = 0
+
+        self._frames = (frame for path in paths for frame in read_frames(path))
+        self._start = None
+
+    def recv_data(self):
+        """
+        Returns the next recorded frame, waiting for its time when paced.
+
+        Returns
+        -------
+        tuple
+            the opcode and the raw bytes of the frame
+        """
+        try:
+            ts, opcode, frame = next(self._frames)
+        except StopIteration:
+            raise ReplayEnd(f'{self.n_frames} frames replayed') from None
+
+        if self.speed:
+            if self._start is None:
+                self._start = (time.monotonic(), ts)
+
+            delay = self._start[0] + (ts - self._start[1]) / self.speed / 1e9 - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        self.n_frames += 1
+        return opcode, frame
+
+    def send(self, msg):
+        pass
+
+    def ping(self, payload=''):
+        pass
+
+    def close(self):
+        self._frames.close()
+
+
+def replay(client, paths, speed=None):
+    """
+    Replays recorded frames through the receiving loop and parsers of a client, without a network connection.
+
+    The client caches on the scheduler as when it runs, and is closed at the end of the frames, so that its
+    pending messages are published and its results cached.
+
+    Parameters
+    ----------
+    client : CoreWS
+        the client, subscribed to the channels of the recorded frames
+    paths : str or list
+        a file or directory written by a Recorder, or a list of files
+    speed : float
+        the speed multiplier of the pacing (default is None, as fast as possible)
+
+    Returns
+    -------
+    ReplaySocket
+        the socket the frames were replayed from
+    """
+    client._socket = socket = ReplaySocket(paths, speed)
+    jobs = client._schedule()
+
+    try:
+        client._subscribe()
+        client._loop()
+    except ReplayEnd:
+        pass
+    finally:
+        for job in jobs:
+            job.cancel()
+        client.close()
+
+    return socket
+
+
+def main(argv=None):
+    """
+    Entry point replaying recorded frames through an exchange client and reporting its throughput.
+
+        python -m crypto_ws.replay binance frames/ --markets btcusdt --channels trade [--speed 10]
+
+    Parameters
+    ----------
+    argv : list
+        the command line arguments (default is None, sys.argv is used)
+    """
+    parser = argparse.ArgumentParser(prog='crypto_ws.replay', description='Replays recorded frames through a client.')
+    parser.add_argument('exchange', choices=['binance', 'huobi', 'kraken', 'bybit'])
+    parser.add_argument('paths', nargs='+', help='recorded files, or a directory of them')
+    parser.add_argument('--markets', nargs='+', required=True)
+    parser.add_argument('--channels', nargs='+', required=True)
+    parser.add_argument('--speed', type=float, default=None, help='pacing speed multiplier, default is no pacing')
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(f'crypto_ws.{args.exchange}_ws')
+    cls = getattr(module, f'{args.exchange.capitalize()}WS')
+    client = cls(markets=args.markets, channels=args.channels)
+
+    paths = args.paths[0] if len(args.paths) == 1 else args.paths
+
+    start = time.perf_counter()
+    socket = replay(client, paths, args.speed)
+    elapsed = time.perf_counter() - start
+
+    print(f'{socket.n_frames} frames, {client.n_messages} messages in {elapsed:.3f}s: '
+          f'{socket.n_frames / elapsed:,.0f} frames/s')
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,169 @@
+import threading
+
+
+POLICIES = ('block', 'drop_oldest', 'conflate')
+
+
+class RingQueue:
+    """
+    A class used to hand the frames received by a reader thread over to the processing thread, in a bounded ring.
+
+    ...
+
+    The reader puts the entries one by one and the processing thread takes all the pending ones at once, so that
+    the lock is taken once per batch on the processing side. When the ring is full, the overflow policy decides
+    what the reader does with a new entry:
+
+        block: waits for the processing thread to take the pending entries, nothing is lost
+        drop_oldest: drops the oldest pending entry, so that the reader never waits
+        conflate: replaces the pending entry of the same conflation key, e.g. the previous ticker of a market,
+            or waits as with block when the entry has no key or no entry of its key is pending
+
+    Dropping entries breaks the sequence of order book updates, which the clients detect and resubscribe on.
+
+    Attributes
+    ----------
+    capacity : int
+        the maximum number of pending entries
+    overflow : str
+        the overflow policy, 'block', 'drop_oldest' or 'conflate'
+    n_dropped : int
+        the number of entries dropped by the drop_oldest policy
+    n_conflated : int
+        the number of entries replaced by a newer one of their key by the conflate policy
+    n_blocked : int
+        the number of times the reader waited for room
+
+    Methods
+    -------
+    put(entry, key=None):
+        Adds an entry, following the overflow policy when the ring is full.
+    get():
+        Takes all the pending entries, waiting for one if there is none.
+    close():
+        Wakes up the reader and makes put() return immediately.
+    clear():
+        Drops the pending entries and reopens the queue.
+    """
+
+    def __init__(self, capacity=10000, overflow='block'):
+        """
+        Constructs all the necessary attributes for the RingQueue object.
+
+        Parameters
+        ----------
+            capacity : int
+                the maximum number of pending entries (default is 10000)
+            overflow : str
+                the overflow policy: 'block', 'drop_oldest' or 'conflate' (default is 'block')
+        """
+        if overflow not in POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow!r}, expected one of {list(POLICIES)}')
+
+        self.capacity = capacity
+        self.overflow = overflow
+        self.n_dropped = 0
+        self.n_conflated = 0
+        self.n_blocked = 0
+
+        # _head and _tail are absolute positions, the slot of a position being position % capacity
+        self._ring = [None] * capacity
+        self._head = 0
+        self._tail = 0
+        self._keys = {}
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def put(self, entry, key=None):
+        """
+        Adds an entry, following the overflow policy when the ring is full.
+
+        Parameters
+        ----------
+        entry : object
+            the entry, e.g. a (frame, receive time, decoded frame) tuple
+        key : tuple
+            the conflation key of the entry, e.g. its (channel, market), only used by the conflate policy
+            (default is None, the entry is never replaced)
+        """
+        capacity = self.capacity
+
+        with self._cond:
+            if self._tail - self._head >= capacity:
+
+                if self.overflow == 'drop_oldest':
+                    self._ring[self._head % capacity] = None
+                    self._head += 1
+                    self.n_dropped += 1
+
+                else:
+                    if key is not None:
+                        position = self._keys.get(key)
+                        if position is not None and position >= self._head:
+                            self._ring[position % capacity] = entry
+                            self.n_conflated += 1
+                            return
+
+                    self.n_blocked += 1
+                    while self._tail - self._head >= capacity and not self._closed:
+                        self._cond.wait()
+
+            if self._closed:
+                return
+
+            if key is not None and self.overflow == 'conflate':
+                self._keys[key] = self._tail
+
+            self._ring[self._tail % capacity] = entry
+            self._tail += 1
+            self._cond.notify()
+
+    def get(self):
+        """
+        Takes all the pending entries, waiting for one if there is none.
+
+        Returns
+        -------
+        list
+            the entries, oldest first
+        """
+        capacity = self.capacity
+
+        with self._cond:
+            while self._tail == self._head:
+                self._cond.wait()
+
+            ring, head, tail = self._ring, self._head % capacity, self._tail % capacity
+            if head < tail:
+                entries = ring[head:tail]
+                ring[head:tail] = [None] * (tail - head)
+            else:
+                entries = ring[head:] + ring[:tail]
+                ring[head:] = [None] * (capacity - head)
+                ring[:tail] = [None] * tail
+
+            self._head = self._tail
+            self._cond.notify()
+
+            return entries
+
+    def close(self):
+        """
+        Wakes up the reader if it waits for room, and makes put() return immediately from then on.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def clear(self):
+        """
+        Drops the pending entries and reopens the queue, e.g. before a new connection.
+        """
+        with self._cond:
+            self._ring = [None] * self.capacity
+            self._head = self._tail = 0
+            self._keys = {}
+            self._closed = False
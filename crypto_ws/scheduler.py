@@ -0,0 +1,117 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Job:
+    """
+    A class used to represent a periodic job of a Scheduler.
+
+    ...
+
+    Attributes
+    ----------
+    interval : float
+        the time in seconds between two runs of the job
+    fn : callable
+        the function run, without arguments
+    due : float
+        the monotonic time of the next run
+    cancelled : bool
+        True once the job was cancelled
+
+    Methods
+    -------
+    cancel():
+        Stops running the job.
+    """
+
+    def __init__(self, interval, fn, due):
+        self.interval = interval
+        self.fn = fn
+        self.due = due
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stops running the job. A run in progress is not interrupted.
+        """
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    A class used to run periodic jobs, such as keep-alive signals and cache flushes, on a background thread.
+
+    ...
+
+    Jobs are kept in a heap ordered by due time on the monotonic clock, and the thread sleeps until the earliest
+    one is due, so that the timing of the jobs does not depend on the traffic and the clients receiving loops do
+    no timer work at all. A job which raises is reported and kept running. A job running late is not run several
+    times to catch up.
+
+    Methods
+    -------
+    every(interval, fn):
+        Runs a function every interval seconds.
+    """
+
+    def __init__(self):
+        self._jobs = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def every(self, interval, fn):
+        """
+        Runs a function every interval seconds, the first time interval seconds from now.
+
+        Parameters
+        ----------
+        interval : float
+            the time in seconds between two runs
+        fn : callable
+            the function to run, without arguments
+
+        Returns
+        -------
+        Job
+            the job, to be cancelled when no longer needed
+        """
+        job = Job(interval, fn, time.monotonic() + interval)
+
+        with self._cond:
+            heapq.heappush(self._jobs, (job.due, next(self._seq), job))
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='Scheduler', daemon=True)
+                self._thread.start()
+
+            self._cond.notify()
+
+        return job
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs or self._jobs[0][0] > time.monotonic():
+                    self._cond.wait(self._jobs[0][0] - time.monotonic() if self._jobs else None)
+
+                _, _, job = heapq.heappop(self._jobs)
+
+            if job.cancelled:
+                continue
+
+            try:
+                job.fn()
+            except Exception as e:
+                print(f"Error: scheduled job {getattr(job.fn, '__qualname__', job.fn)} failed: {e}")
+
+            job.due = max(job.due + job.interval, time.monotonic())
+
+            with self._cond:
+                heapq.heappush(self._jobs, (job.due, next(self._seq), job))
+
+
+scheduler = Scheduler()
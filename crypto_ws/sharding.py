@@ -0,0 +1,41 @@
+import math
+
+
+def plan_shards(subscriptions, shards=1, weights=None, cap=None):
+    """
+    Spreads subscriptions over connections, balancing their expected message rate.
+
+    Subscriptions are assigned heaviest first to the least loaded connection that has room left, so that busy
+    markets end up on different connections. If the subscriptions do not fit in the requested number of
+    connections given the per-connection cap, more connections are used.
+
+    Parameters
+    ----------
+    subscriptions : list
+        the (market, channel) pairs to subscribe to
+    shards : int
+        the number of connections to spread the subscriptions over (default is 1)
+    weights : dict
+        the expected message rate of each (market, channel) pair, missing pairs weigh 1 (default is None)
+    cap : int
+        the maximum number of subscriptions per connection (default is None, no limit)
+
+    Returns
+    -------
+    list
+        a list of (market, channel) pair lists, one per connection, without empty ones
+    """
+    weights = weights if weights else {}
+
+    if cap:
+        shards = max(shards, math.ceil(len(subscriptions) / cap))
+
+    plan = [[] for _ in range(shards)]
+    loads = [0.] * shards
+
+    for sub in sorted(subscriptions, key=lambda x: weights.get(x, 1), reverse=True):
+        idx = min((i for i in range(shards) if not cap or len(plan[i]) < cap), key=loads.__getitem__)
+        plan[idx].append(sub)
+        loads[idx] += weights.get(sub, 1)
+
+    return [subs for subs in plan if subs]
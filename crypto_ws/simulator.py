@@ -0,0 +1,697 @@
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import random
+import threading
+import time
+
+import websockets
+
+from crypto_ws.kraken_ws import KrakenBook
+
+
+class Feed:
+    """
+    A class used to answer the requests of one client connection and generate its synthetic market data.
+
+    ...
+
+    Subclasses speak the protocol of an exchange: request() handles the subscriptions and keep-alive signals of
+    the client, message() builds a message in the schema of the exchange. Prices follow a random walk per market
+    and the subscriptions are served in turn.
+
+    Attributes
+    ----------
+    subscriptions : list
+        the (market, channel) pairs subscribed to, in the names of the exchange client
+    levels : int
+        the number of levels per side of the order book messages
+
+    Methods
+    -------
+    welcome():
+        Returns the messages sent when the connection opens.
+    request(msg):
+        Handles a message of the client, returning the replies.
+    heartbeat():
+        Returns the keep-alive message sent by the server, None if the exchange sends none.
+    message(market, channel):
+        Returns the next message of a subscription, to be overridden in subclasses.
+    next():
+        Returns the next raw frame of market data.
+    """
+
+    HEARTBEAT = None
+    OPCODE = 1
+
+    def __init__(self, levels=20, seed=None):
+        """
+        Constructs all the necessary attributes for the Feed object.
+
+        Parameters
+        ----------
+            levels : int
+                the number of levels per side of the order book messages (default is 20)
+            seed : int
+                the seed of the random generator (default is None)
+        """
+        self.subscriptions = []
+        self.levels = levels
+
+        self._random = random.Random(seed)
+        self._prices = {}
+        self._ids = itertools.count(1)
+        self._cursor = 0
+
+    def welcome(self):
+        return []
+
+    def request(self, msg):
+        return []
+
+    def heartbeat(self):
+        return None
+
+    def supports(self, channel):
+        return False
+
+    def message(self, market, channel):
+        """
+        Placeholder method to be overridden in subclasses.
+        This should return the next message of a subscription, in the format of the exchange.
+        """
+        return None
+
+    def encode(self, msg):
+        return json.dumps(msg, separators=(',', ':')).encode()
+
+    def next(self):
+        """
+        Returns the next raw frame of market data, the subscriptions being served in turn.
+
+        Returns
+        -------
+        bytes
+            the frame, None if nothing is subscribed to or the subscription has no message
+        """
+        if not self.subscriptions:
+            return None
+
+        self._cursor = (self._cursor + 1) % len(self.subscriptions)
+        msg = self.message(*self.subscriptions[self._cursor])
+        return None if msg is None else self.encode(msg)
+
+    def _subscribe(self, market, channel):
+        if self.supports(channel) and (market, channel) not in self.subscriptions:
+            self.subscriptions.append((market, channel))
+
+    def _unsubscribe(self, market, channel):
+        if (market, channel) in self.subscriptions:
+            self.subscriptions.remove((market, channel))
+
+    def price(self, market):
+        """
+        Moves the price of a market by a random step and returns it.
+        """
+        price = self._prices.get(market, 20000.) * (1 + self._random.gauss(0, 1e-4))
+        self._prices[market] = price
+        return price
+
+    def size(self):
+        return self._random.expovariate(2.)
+
+    def side(self):
+        return self._random.random() < .5
+
+    def levels_around(self, price, step, n):
+        """
+        Returns n bid and n ask [price, size] levels around a price, as floats.
+        """
+        bids = [[round(price - (i + 1) * step, 2), round(self.size(), 4)] for i in range(n)]
+        asks = [[round(price + (i + 1) * step, 2), round(self.size(), 4)] for i in range(n)]
+        return bids, asks
+
+
+class BinanceFeed(Feed):
+    """
+    A class used to simulate the Binance streams: SUBSCRIBE and UNSUBSCRIBE requests of 'market@channel' streams,
+    and trade, ticker, index and kline_<interval> events.
+    """
+
+    def supports(self, channel):
+        return channel in ('trade', 'ticker', 'index') or channel.startswith('kline_')
+
+    def request(self, msg):
+        method = msg.get('method')
+
+        for stream in msg.get('params', ()):
+            market, _, channel = stream.partition('@')
+            if method == 'SUBSCRIBE':
+                self._subscribe(market, channel)
+            elif method == 'UNSUBSCRIBE':
+                self._unsubscribe(market, channel)
+
+        return [{'result': None, 'id': msg.get('id')}]
+
+    def message(self, market, channel):
+        ms, p, symbol = time.time_ns() // 10**6, self.price(market), market.upper()
+
+        if channel == 'trade':
+            tid = next(self._ids)
+            return {'e': 'trade', 'E': ms, 's': symbol, 't': tid, 'p': f'{p:.8f}', 'q': f'{self.size():.8f}',
+                    'b': 2 * tid, 'a': 2 * tid + 1, 'T': ms, 'm': self.side(), 'M': True}
+
+        if channel == 'ticker':
+            return {'e': '24hrTicker', 'E': ms, 's': symbol, 'p': f'{p * .01:.8f}', 'P': '1.000',
+                    'w': f'{p:.8f}', 'x': f'{p:.8f}', 'c': f'{p:.8f}', 'Q': f'{self.size():.8f}',
+                    'b': f'{p - .01:.8f}', 'B': f'{self.size():.8f}', 'a': f'{p + .01:.8f}',
+                    'A': f'{self.size():.8f}', 'o': f'{p * .99:.8f}', 'h': f'{p * 1.01:.8f}',
+                    'l': f'{p * .98:.8f}', 'v': '183242.12345000', 'q': '3041245123.12300000',
+                    'O': ms - 86400000, 'C': ms, 'F': 1, 'L': next(self._ids), 'n': 1000000}
+
+        if channel == 'index':
+            return {'e': 'index', 'E': ms, 's': symbol, 'p': f'{p:.8f}'}
+
+        start = ms - ms % 60000
+        return {'e': 'kline', 'E': ms, 's': symbol,
+                'k': {'t': start, 'T': start + 59999, 's': symbol, 'i': channel[6:], 'f': 1, 'L': next(self._ids),
+                      'o': f'{p * .999:.8f}', 'c': f'{p:.8f}', 'h': f'{p * 1.001:.8f}', 'l': f'{p * .998:.8f}',
+                      'v': '12.31200000', 'n': 102, 'x': True, 'q': '203712.12300000', 'V': '6.50000000',
+                      'Q': '107551.12300000', 'B': '0'}}
+
+
+class HuobiFeed(Feed):
+    """
+    A class used to simulate the Huobi streams: gzip-compressed binary frames, 'sub' and 'unsub' requests of
+    'market.<market>.<channel>' topics, and a 'ping' sent every 5 seconds, to be answered with a 'pong'.
+    """
+
+    HEARTBEAT = 5
+    OPCODE = 2
+
+    CHANNELS = ('ticker', 'bbo', 'trade.detail', 'detail', 'kline.', 'depth.step', 'mbp.refresh.')
+
+    def supports(self, channel):
+        return channel.startswith(self.CHANNELS)
+
+    def request(self, msg):
+        ms = time.time_ns() // 10**6
+
+        for key in ('sub', 'unsub'):
+            if key in msg:
+                _, market, channel = msg[key].split('.', 2)
+                self._subscribe(market, channel) if key == 'sub' else self._unsubscribe(market, channel)
+                return [{'id': msg.get('id'), 'status': 'ok', f'{key}bed': msg[key], 'ts': ms}]
+
+        return []
+
+    def heartbeat(self):
+        return {'ping': time.time_ns() // 10**6}
+
+    def encode(self, msg):
+        return gzip.compress(super().encode(msg), compresslevel=1)
+
+    def message(self, market, channel):
+        ms, p = time.time_ns() // 10**6, self.price(market)
+        msg = {'ch': f'market.{market}.{channel}', 'ts': ms}
+
+        if channel == 'ticker':
+            msg['tick'] = {'open': p * .99, 'high': p * 1.01, 'low': p * .98, 'close': p, 'amount': 12345.6789,
+                           'vol': 204512345.12, 'count': 523412, 'bid': p - .01, 'bidSize': self.size(),
+                           'ask': p + .01, 'askSize': self.size(), 'lastPrice': p, 'lastSize': self.size()}
+
+        elif channel == 'bbo':
+            msg['tick'] = {'seqId': next(self._ids), 'ask': p + .01, 'askSize': self.size(), 'bid': p - .01,
+                           'bidSize': self.size(), 'quoteTime': ms, 'symbol': market}
+
+        elif channel == 'trade.detail':
+            tid = next(self._ids)
+            msg['tick'] = {'id': tid, 'ts': ms,
+                           'data': [{'id': tid, 'ts': ms, 'tradeId': tid, 'amount': self.size(), 'price': p,
+                                     'direction': 'buy' if self.side() else 'sell'}]}
+
+        elif channel == 'detail':
+            msg['tick'] = {'id': next(self._ids), 'open': p * .99, 'close': p, 'low': p * .98, 'high': p * 1.01,
+                           'amount': 12345.6789, 'vol': 204512345.12, 'count': 523412, 'version': ms}
+
+        elif channel.startswith('kline.'):
+            msg['tick'] = {'id': ms // 60000 * 60, 'open': p * .999, 'close': p, 'low': p * .998,
+                           'high': p * 1.001, 'amount': 12.312, 'vol': 203712.123, 'count': 102}
+
+        elif channel.startswith('depth.step'):
+            bids, asks = self.levels_around(p, .01, self.levels)
+            msg['tick'] = {'bids': bids, 'asks': asks, 'version': next(self._ids), 'ts': ms}
+
+        else:
+            bids, asks = self.levels_around(p, .01, int(channel.rsplit('.', 1)[1]))
+            msg['tick'] = {'seqNum': next(self._ids), 'bids': bids, 'asks': asks}
+
+        return msg
+
+
+class KrakenFeed(Feed):
+    """
+    A class used to simulate the Kraken streams: subscribe and unsubscribe events answered with a
+    subscriptionStatus, ping events answered with a pong, and ticker, trade, spread, ohlc and book messages.
+
+    The book channels start with a snapshot, followed by updates of one level carrying the checksum of the book.
+    """
+
+    def __init__(self, levels=20, seed=None):
+        super().__init__(levels, seed)
+        self._books = {}
+        self._channel_ids = {}
+
+    def supports(self, channel):
+        return channel in ('ticker', 'trade', 'spread') or channel.startswith(('ohlc', 'book-'))
+
+    def welcome(self):
+        return [{'event': 'systemStatus', 'status': 'online', 'version': '1.9.0', 'connectionID': 1}]
+
+    def request(self, msg):
+        event = msg.get('event')
+
+        if event == 'ping':
+            return [{'event': 'pong', 'reqid': msg.get('reqid')}]
+
+        if event not in ('subscribe', 'unsubscribe'):
+            return []
+
+        subscription = msg.get('subscription', {})
+        channel = subscription.get('name')
+        if channel == 'book':
+            channel = f"book-{subscription.get('depth', 10)}"
+        elif channel == 'ohlc':
+            channel = f"ohlc-{subscription.get('interval', 1)}"
+
+        replies = []
+        for pair in msg.get('pair', ()):
+            if event == 'subscribe':
+                self._subscribe(pair, channel)
+            else:
+                self._unsubscribe(pair, channel)
+                self._books.pop((channel, pair), None)
+
+            channel_id = self._channel_ids.setdefault((channel, pair), len(self._channel_ids) + 1)
+            replies.append({'channelID': channel_id, 'channelName': channel, 'event': 'subscriptionStatus',
+                            'pair': pair, 'status': f'{event}d', 'subscription': subscription})
+
+        return replies
+
+    def message(self, pair, channel):
+        ts, p = f'{time.time():.6f}', self.price(pair)
+        channel_id = self._channel_ids.get((channel, pair), 0)
+
+        if channel == 'ticker':
+            data = {'a': [f'{p + .1:.5f}', 0, f'{self.size():.8f}'], 'b': [f'{p - .1:.5f}', 1, f'{self.size():.8f}'],
+                    'c': [f'{p:.5f}', f'{self.size():.8f}'], 'v': ['1234.12345678', '5678.12345678'],
+                    'p': [f'{p:.5f}', f'{p:.5f}'], 't': [12345, 54321], 'l': [f'{p * .98:.5f}', f'{p * .97:.5f}'],
+                    'h': [f'{p * 1.01:.5f}', f'{p * 1.02:.5f}'], 'o': [f'{p * .99:.5f}', f'{p * .99:.5f}']}
+
+        elif channel == 'trade':
+            data = [[f'{p:.5f}', f'{self.size():.8f}', ts, 'b' if self.side() else 's', 'l', '']]
+
+        elif channel == 'spread':
+            data = [f'{p - .1:.5f}', f'{p + .1:.5f}', ts, f'{self.size():.8f}', f'{self.size():.8f}']
+
+        elif channel.startswith('ohlc'):
+            data = [ts, f'{float(ts) + 60:.6f}', f'{p * .999:.5f}', f'{p * 1.001:.5f}', f'{p * .998:.5f}',
+                    f'{p:.5f}', f'{p:.5f}', '12.31200000', 102]
+
+        else:
+            data = self._book(pair, channel, p, ts)
+
+        return [channel_id, data, channel, pair]
+
+    def _book(self, pair, channel, price, ts):
+        book = self._books.get((channel, pair))
+
+        if book is None:
+            depth = int(channel[5:])
+            bids = [[f'{price - (i + 1) * .1:.5f}', f'{self.size():.8f}', ts] for i in range(depth)]
+            asks = [[f'{price + (i + 1) * .1:.5f}', f'{self.size():.8f}', ts] for i in range(depth)]
+
+            book = self._books[(channel, pair)] = KrakenBook(depth)
+            book.snapshot(bids, asks)
+            return {'as': asks, 'bs': bids}
+
+        side = 'b' if self.side() else 'a'
+        bids, asks = book.top()
+        level = [f'{self._random.choice(bids if side == "b" else asks)[0]:.5f}', f'{self.size():.8f}', ts]
+
+        book.apply([level] if side == 'b' else (), [level] if side == 'a' else ())
+        return {side: [level], 'c': str(book.checksum())}
+
+
+class BybitFeed(Feed):
+    """
+    A class used to simulate the Bybit v5 public streams: subscribe, unsubscribe and ping 'op' requests, and
+    tickers, publicTrade, orderbook and kline topics.
+
+    The order book topics start with a snapshot, followed by deltas of one level with consecutive update ids.
+    """
+
+    def __init__(self, levels=20, seed=None):
+        super().__init__(levels, seed)
+        self._books = {}
+
+    def supports(self, channel):
+        return channel in ('tickers', 'publicTrade') or channel.startswith(('orderbook.', 'kline.'))
+
+    def request(self, msg):
+        op = msg.get('op')
+
+        for topic in msg.get('args', ()):
+            channel, _, market = topic.rpartition('.')
+            if op == 'subscribe':
+                self._subscribe(market, channel)
+            elif op == 'unsubscribe':
+                self._unsubscribe(market, channel)
+                self._books.pop(topic, None)
+
+        ret_msg = 'pong' if op == 'ping' else ''
+        return [{'success': True, 'ret_msg': ret_msg, 'conn_id': 'simulator', 'req_id': msg.get('req_id', ''),
+                 'op': op}]
+
+    def message(self, market, channel):
+        ms, p, topic = time.time_ns() // 10**6, self.price(market), f'{channel}.{market}'
+
+        if channel == 'tickers':
+            return {'topic': topic, 'ts': ms, 'type': 'snapshot', 'cs': next(self._ids),
+                    'data': {'symbol': market, 'lastPrice': f'{p:.2f}', 'highPrice24h': f'{p * 1.01:.2f}',
+                             'lowPrice24h': f'{p * .98:.2f}', 'prevPrice24h': f'{p * .99:.2f}',
+                             'volume24h': '12345.6789', 'turnover24h': '204512345.12', 'price24hPcnt': '0.0101',
+                             'usdIndexPrice': f'{p:.2f}'}}
+
+        if channel == 'publicTrade':
+            return {'topic': topic, 'ts': ms, 'type': 'snapshot',
+                    'data': [{'i': str(next(self._ids)), 'T': ms, 'p': f'{p:.2f}', 'v': f'{self.size():.6f}',
+                              'S': 'Buy' if self.side() else 'Sell', 's': market, 'BT': False}]}
+
+        if channel.startswith('kline.'):
+            start = ms - ms % 60000
+            return {'topic': topic, 'ts': ms, 'type': 'snapshot',
+                    'data': [{'start': start, 'end': start + 59999, 'interval': channel[6:],
+                              'open': f'{p * .999:.2f}', 'close': f'{p:.2f}', 'high': f'{p * 1.001:.2f}',
+                              'low': f'{p * .998:.2f}', 'volume': '12.312', 'turnover': '203712.123',
+                              'confirm': False, 'timestamp': ms}]}
+
+        book = self._books.get(topic)
+
+        if book is None:
+            bids, asks = self.levels_around(p, .01, min(self.levels, int(channel.split('.')[1])))
+            book = self._books[topic] = {'u': 1, 'b': [b[0] for b in bids], 'a': [a[0] for a in asks]}
+            msg_type = 'snapshot'
+        else:
+            book['u'] += 1
+            side = 'b' if self.side() else 'a'
+            bids, asks = [], []
+            (bids if side == 'b' else asks).append([self._random.choice(book[side]), round(self.size(), 4)])
+            msg_type = 'delta'
+
+        data = {'s': market, 'b': [[f'{x:.2f}', f'{y:.4f}'] for x, y in bids],
+                'a': [[f'{x:.2f}', f'{y:.4f}'] for x, y in asks], 'u': book['u'], 'seq': next(self._ids)}
+        return {'topic': topic, 'ts': ms, 'type': msg_type, 'data': data, 'cts': ms}
+
+
+FEEDS = {
+    'binance': BinanceFeed,
+    'huobi': HuobiFeed,
+    'kraken': KrakenFeed,
+    'bybit': BybitFeed,
+}
+
+
+class ExchangeSimulator:
+    """
+    A class used to run a local WebSocket server speaking enough of the protocol of an exchange to run its
+    client against, from a background thread.
+
+    ...
+
+    Clients connect by setting their url to the url of the simulator. Each connection gets its own Feed, which
+    answers the subscriptions and keep-alive signals of the client and pushes synthetic market data for every
+    subscription in turn, at rate messages per second in bursts of burst messages sent back-to-back. Disconnects
+    are injected by dropping each connection after disconnect_every messages, or all of them on disconnect(),
+    without a closing handshake, as a network failure would. For load tests at tens of thousands of messages per
+    second, the simulator is best run in its own process, see main(), so that it does not share the GIL with the
+    clients.
+
+    Attributes
+    ----------
+    exchange : str
+        the name of the exchange, a key of FEEDS
+    url : str
+        the URL to connect the clients to
+    rate : float
+        the messages per second pushed on each connection, None for as fast as possible
+    burst : int
+        the number of messages sent back-to-back
+    disconnect_every : int
+        the number of messages after which each connection is dropped, None to never drop it
+    n_connections : int
+        the number of connections accepted so far
+    n_sent : int
+        the number of market data messages sent so far
+
+    Methods
+    -------
+    start():
+        Starts the server thread.
+    stop():
+        Closes the connections and stops the server thread.
+    disconnect():
+        Drops all the open connections.
+    """
+
+    def __init__(self, exchange, host='127.0.0.1', port=0, rate=1000, burst=1, disconnect_every=None, levels=20,
+                 seed=None):
+        """
+        Constructs all the necessary attributes for the ExchangeSimulator object.
+
+        Parameters
+        ----------
+            exchange : str
+                the name of the exchange, a key of FEEDS
+            host : str
+                the interface to listen on (default is '127.0.0.1')
+            port : int
+                the port to listen on (default is 0, a free port is picked)
+            rate : float
+                the messages per second pushed on each connection (default is 1000), None for as fast as possible
+            burst : int
+                the number of messages sent back-to-back at each wake-up (default is 1)
+            disconnect_every : int
+                the number of messages after which each connection is dropped (default is None, never)
+            levels : int
+                the number of levels per side of the order book messages (default is 20)
+            seed : int
+                the seed of the random generators of the feeds (default is None)
+        """
+        if exchange not in FEEDS:
+            raise ValueError(f'Unknown exchange {exchange!r}, expected one of {list(FEEDS)}')
+
+        self.exchange = exchange
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.burst = burst
+        self.disconnect_every = disconnect_every
+        self.levels = levels
+        self.seed = seed
+
+        self.n_connections = 0
+        self.n_sent = 0
+
+        self._loop = None
+        self._thread = None
+        self._connections = set()
+
+    @property
+    def url(self):
+        return f'ws://{self.host}:{self.port}'
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """
+        Starts the server in a background thread, returning once it listens.
+
+        Returns
+        -------
+        ExchangeSimulator
+            the simulator itself
+        """
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name='Simulator', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """
+        Closes the connections and stops the server thread.
+        """
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def disconnect(self):
+        """
+        Drops all the open connections, without a closing handshake.
+        """
+        def abort():
+            for ws in list(self._connections):
+                ws.transport.abort()
+
+        self._loop.call_soon_threadsafe(abort)
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+
+        server = self._loop.run_until_complete(self._listen())
+        self.port = server.sockets[0].getsockname()[1]
+        ready.set()
+
+        try:
+            self._loop.run_forever()
+        finally:
+            server.close()
+            self._loop.run_until_complete(server.wait_closed())
+            self._loop.close()
+
+    async def _listen(self):
+        return await websockets.serve(self._serve, self.host, self.port, max_size=None)
+
+    async def _serve(self, ws):
+        feed = FEEDS[self.exchange](self.levels, None if self.seed is None else self.seed + self.n_connections)
+        self.n_connections += 1
+        self._connections.add(ws)
+
+        tasks = [asyncio.create_task(self._push(ws, feed))]
+        if feed.HEARTBEAT:
+            tasks.append(asyncio.create_task(self._heartbeat(ws, feed)))
+
+        try:
+            await self._write(ws, feed, feed.welcome())
+
+            async for frame in ws:
+                await self._write(ws, feed, feed.request(json.loads(frame)))
+
+        except websockets.ConnectionClosed:
+            pass
+
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._connections.discard(ws)
+
+    async def _heartbeat(self, ws, feed):
+        while True:
+            await asyncio.sleep(feed.HEARTBEAT)
+            await self._write(ws, feed, [feed.heartbeat()])
+
+    @staticmethod
+    async def _write(ws, feed, msgs):
+        if not ws.open:
+            return
+
+        for msg in msgs:
+            ws.write_frame_sync(True, feed.OPCODE, feed.encode(msg))
+        await ws.drain()
+
+    async def _push(self, ws, feed):
+        loop = asyncio.get_running_loop()
+        start, due, sent = loop.time(), 0, 0
+
+        while True:
+            if not feed.subscriptions:
+                await asyncio.sleep(.01)
+                start, due = loop.time(), 0
+                continue
+
+            if self.rate:
+                # the messages owed since the start, sent once a burst is due, so that bursts keep the mean rate
+                behind = int((loop.time() - start) * self.rate) - due
+                if behind < self.burst:
+                    await asyncio.sleep((self.burst - behind) / self.rate)
+                    continue
+            else:
+                behind = self.burst
+
+            if not ws.open:
+                return
+
+            # the frames of a burst are written back-to-back and flushed once
+            for _ in range(behind):
+                frame = feed.next()
+                if frame is None:
+                    break
+
+                ws.write_frame_sync(True, feed.OPCODE, frame)
+                due += 1
+                sent += 1
+                self.n_sent += 1
+
+                if self.disconnect_every and sent >= self.disconnect_every:
+                    ws.transport.abort()
+                    return
+
+            await ws.drain()
+
+            if not self.rate:
+                # drain() does not yield while the socket accepts data, the requests must still be answered
+                await asyncio.sleep(0)
+
+
+def main(argv=None):
+    """
+    Entry point running an exchange simulator until interrupted, reporting the rate of messages sent.
+
+        python -m crypto_ws.simulator binance --port 8765 --rate 50000 --burst 100
+
+    Parameters
+    ----------
+    argv : list
+        the command line arguments (default is None, sys.argv is used)
+    """
+    parser = argparse.ArgumentParser(prog='crypto_ws.simulator', description='Runs a local exchange simulator.')
+    parser.add_argument('exchange', choices=list(FEEDS))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=1000, help='messages per second per connection, 0 for no limit')
+    parser.add_argument('--burst', type=int, default=1, help='messages sent back-to-back')
+    parser.add_argument('--disconnect-every', type=int, default=None, help='messages before dropping a connection')
+    parser.add_argument('--levels', type=int, default=20, help='levels per side of the order book messages')
+    parser.add_argument('--report-freq', type=float, default=10, help='seconds between rate reports')
+    args = parser.parse_args(argv)
+
+    simulator = ExchangeSimulator(args.exchange, args.host, args.port, args.rate or None, args.burst,
+                                  args.disconnect_every, args.levels)
+
+    with simulator:
+        print(f'INFO: {args.exchange} simulator listening on {simulator.url}')
+        last = (time.monotonic(), 0)
+
+        try:
+            while True:
+                time.sleep(args.report_freq)
+                now, sent = time.monotonic(), simulator.n_sent
+                print(f'INFO: {simulator.n_connections} connections, {(sent - last[1]) / (now - last[0]):,.0f} msg/s')
+                last = (now, sent)
+
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,300 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+
+from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.bybit_ws import BybitWS
+from crypto_ws.huobi_ws import HuobiWS
+from crypto_ws.kraken_ws import KrakenWS
+
+
+EXCHANGES = {
+    'binance': BinanceWS,
+    'bybit': BybitWS,
+    'huobi': HuobiWS,
+    'kraken': KrakenWS,
+}
+
+# the keyword arguments which start threads, servers or files when a client is built, left out of the client
+# built to plan the shards
+RUNTIME_KWARGS = ('metrics_port', 'record', 'latency', 'decode_workers', 'read_queue')
+
+
+def expand(exchange, kwargs):
+    """
+    Splits a client definition into one definition per shard. The shards are planned by a client built without
+    sinks nor the keyword arguments of RUNTIME_KWARGS, so that planning starts no thread, server or file.
+
+    Parameters
+    ----------
+    exchange : str
+        the name of the exchange, a key of EXCHANGES
+    kwargs : dict
+        the keyword arguments of the exchange client
+
+    Returns
+    -------
+    list
+        a list of (exchange, kwargs) tuples, one per worker
+    """
+    planning = {k: v for k, v in kwargs.items() if k not in RUNTIME_KWARGS}
+    client = EXCHANGES[exchange](**dict(planning, do_cache=False, do_publish=False))
+
+    if not client._sharded:
+        return [(exchange, kwargs)]
+
+    return [(exchange, dict(kwargs, markets=shard.markets, subscriptions=shard.subscriptions, shards=1))
+            for shard in client.shard()]
+
+
+def work(exchange, kwargs, cpu, counter):
+    """
+    Runs an exchange client in a worker process, reporting its message count to the supervisor.
+
+    Parameters
+    ----------
+    exchange : str
+        the name of the exchange, a key of EXCHANGES
+    kwargs : dict
+        the keyword arguments of the exchange client
+    cpu : int
+        the CPU to pin the worker on, None to leave it floating
+    counter : multiprocessing.Value
+        the shared value the message count of the client is copied to
+    """
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+    client = EXCHANGES[exchange](**kwargs)
+
+    def report():
+        while True:
+            counter.value = client.n_messages
+            time.sleep(1)
+
+    threading.Thread(target=report, daemon=True).start()
+    client.run()
+
+
+class Worker:
+    """
+    A class used to represent a worker process running one exchange client.
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        a string identifying the worker in the reports
+    exchange : str
+        the name of the exchange, a key of EXCHANGES
+    kwargs : dict
+        the keyword arguments of the exchange client
+    cpu : int
+        the CPU the worker is pinned on, None if floating
+    restarts : int
+        the number of times the worker was restarted
+
+    Methods
+    -------
+    start():
+        Starts the worker process.
+    throughput():
+        Returns the number of messages per second handled since the last call.
+    """
+
+    def __init__(self, name, exchange, kwargs, cpu=None):
+        """
+        Constructs all the necessary attributes for the Worker object.
+
+        Parameters
+        ----------
+        name : str
+            a string identifying the worker in the reports
+        exchange : str
+            the name of the exchange, a key of EXCHANGES
+        kwargs : dict
+            the keyword arguments of the exchange client
+        cpu : int
+            the CPU to pin the worker on (default is None, floating)
+        """
+        self.name = name
+        self.exchange = exchange
+        self.kwargs = kwargs
+        self.cpu = cpu
+        self.restarts = 0
+        self.process = None
+
+        self._counter = mp.Value('Q', 0, lock=False)
+        self._last = (time.monotonic(), 0)
+
+    def start(self):
+        """
+        Starts the worker process, resetting its message count.
+        """
+        self._counter.value = 0
+        self._last = (time.monotonic(), 0)
+
+        self.process = mp.Process(target=work, name=self.name, daemon=True,
+                                  args=(self.exchange, self.kwargs, self.cpu, self._counter))
+        self.process.start()
+
+    def throughput(self):
+        """
+        Returns the number of messages per second handled since the last call.
+
+        Returns
+        -------
+        float
+            the message rate of the worker
+        """
+        now, count = time.monotonic(), self._counter.value
+        then, last = self._last
+        self._last = (now, count)
+
+        return (count - last) / (now - then) if now > then else 0.
+
+
+class Supervisor:
+    """
+    A class used to run exchange clients in worker processes, restarting the ones that crash.
+
+    ...
+
+    Attributes
+    ----------
+    workers : list
+        the Worker objects supervised
+
+    Methods
+    -------
+    from_config(config):
+        Creates a Supervisor from a configuration dictionary.
+    run():
+        Starts all workers, restarts the crashed ones and reports their throughput until interrupted.
+    stop():
+        Terminates all workers, and makes run() return.
+    """
+
+    def __init__(self, workers, report_freq=10, restart_delay=5):
+        """
+        Constructs all the necessary attributes for the Supervisor object.
+
+        Parameters
+        ----------
+        workers : list
+            the Worker objects to supervise
+        report_freq : float
+            the frequency in seconds to report the throughput of the workers (default is 10)
+        restart_delay : float
+            the time in seconds to wait before restarting a crashed worker (default is 5)
+        """
+        self.workers = workers
+        self._report_freq = report_freq
+        self._restart_delay = restart_delay
+        self._stopping = threading.Event()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates a Supervisor from a configuration dictionary.
+
+        The configuration lists the clients to run under "clients", each with an "exchange" name and the keyword
+        arguments of the exchange client (markets, channels, shards, ...). Sinks are defined under "sinks", either
+        at the top level for all clients or per client: "redis" holds the Redis connection keyword arguments, the
+        other keys (do_cache, do_publish, caching_key, publish_channel, caching_freq) are passed to the clients.
+        Each client, or each shard of a sharded client, runs in its own worker process. A metrics_port is taken
+        as the first port of the workers of the client, each worker serving its own metrics on the next free one.
+
+        Parameters
+        ----------
+        config : dict
+            the configuration
+
+        Returns
+        -------
+        Supervisor
+            the supervisor of the configured workers
+        """
+        sinks = config.get('sinks', {})
+        cpus = os.cpu_count() or 1
+        pin = config.get('pin', True)
+
+        workers = []
+        ports = set()
+        for definition in config['clients']:
+            definition = dict(definition)
+            exchange = definition.pop('exchange')
+
+            kwargs = dict(sinks, **definition.pop('sinks', {}))
+            kwargs['redis_kwargs'] = kwargs.pop('redis', None)
+            kwargs.update(definition)
+
+            for exchange, kw in expand(exchange, kwargs):
+                if kw.get('metrics_port') is not None:
+                    port = kw['metrics_port']
+                    while port in ports:
+                        port += 1
+                    ports.add(port)
+                    kw = dict(kw, metrics_port=port)
+
+                cpu = len(workers) % cpus if pin else None
+                workers.append(Worker(f'{exchange}-{len(workers)}', exchange, kw, cpu))
+
+        return cls(workers, report_freq=config.get('report_freq', 10),
+                   restart_delay=config.get('restart_delay', 5))
+
+    def run(self):
+        """
+        Starts all workers, then restarts the crashed ones and reports their throughput until interrupted or
+        stopped.
+        """
+        self._stopping.clear()
+
+        for worker in self.workers:
+            worker.start()
+            print(f'INFO: Started {worker.name} (pid {worker.process.pid}, cpu {worker.cpu})')
+
+        last_report = time.monotonic()
+        crashed = {}
+
+        try:
+            while not self._stopping.wait(1):
+                now = time.monotonic()
+
+                for worker in self.workers:
+                    if worker.process.is_alive():
+                        continue
+
+                    crashed.setdefault(worker.name, now)
+                    if now - crashed[worker.name] >= self._restart_delay:
+                        crashed.pop(worker.name)
+                        worker.restarts += 1
+                        print(f'INFO: Restarting {worker.name} (exit code {worker.process.exitcode}, '
+                              f'restart #{worker.restarts})')
+                        worker.start()
+
+                if now - last_report >= self._report_freq:
+                    last_report = now
+                    for worker in self.workers:
+                        print(f'INFO: {worker.name}: {worker.throughput():.1f} msg/s')
+
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        """
+        Terminates all workers, and makes run() return.
+        """
+        self._stopping.set()
+
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join()
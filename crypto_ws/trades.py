@@ -0,0 +1,137 @@
+import collections
+
+import numpy as np
+
+
+Trades = collections.namedtuple('Trades', ['ts', 'price', 'size', 'side', 'trade_id'])
+Trades.__doc__ = """
+Columns of trades, oldest first: epoch timestamps in nanoseconds, prices, sizes, sides (1 for a buy, -1 for a
+sell, from the taker point of view) and trade ids (-1 if the exchange sends none).
+"""
+
+
+class TradeBuffer:
+    """
+    A class used to keep the last trades of a market in fixed-size NumPy columns.
+
+    ...
+
+    The columns are preallocated with twice the capacity and each trade is written at its position in the ring
+    and at the same position plus the capacity, so that the last trades always form a contiguous slice: appending
+    is O(1), reading the last n trades or the trades since a time returns views without copying, and memory does
+    not grow once the buffer is allocated. The views are only valid until as many trades as the capacity have
+    been appended since they were taken.
+
+    Attributes
+    ----------
+    capacity : int
+        the maximum number of trades kept
+    n_trades : int
+        the number of trades appended since the buffer was created
+
+    Methods
+    -------
+    append(ts, price, size, side, trade_id=-1):
+        Appends a trade.
+    extend(rows):
+        Appends trades.
+    last(n=None):
+        Returns the last n trades.
+    since(ts):
+        Returns the trades at or after a time.
+    """
+
+    DTYPES = (np.int64, np.float64, np.float64, np.int8, np.int64)
+
+    def __init__(self, capacity=100000):
+        """
+        Constructs all the necessary attributes for the TradeBuffer object and allocates its columns.
+
+        Parameters
+        ----------
+            capacity : int
+                the maximum number of trades kept (default is 100000)
+        """
+        self.capacity = capacity
+        self.n_trades = 0
+        self._columns = tuple(np.zeros(2 * capacity, dtype=dtype) for dtype in self.DTYPES)
+
+    def __len__(self):
+        return min(self.n_trades, self.capacity)
+
+    def append(self, ts, price, size, side, trade_id=-1):
+        """
+        Appends a trade, overwriting the oldest one when the buffer is full.
+
+        Parameters
+        ----------
+        ts : int
+            the epoch timestamp of the trade, in nanoseconds
+        price : float
+            the price of the trade
+        size : float
+            the size of the trade
+        side : int
+            1 for a buy, -1 for a sell
+        trade_id : int
+            the id of the trade (default is -1, none)
+        """
+        idx = self.n_trades % self.capacity
+        high = idx + self.capacity
+
+        for column, value in zip(self._columns, (ts, price, size, side, trade_id)):
+            column[idx] = column[high] = value
+
+        self.n_trades += 1
+
+    def extend(self, rows):
+        """
+        Appends trades, oldest first.
+
+        Parameters
+        ----------
+        rows : iterable
+            the (ts, price, size, side, trade_id) tuples of the trades
+        """
+        append = self.append
+        for row in rows:
+            append(*row)
+
+    def last(self, n=None):
+        """
+        Returns the last n trades, as views on the buffer.
+
+        Parameters
+        ----------
+        n : int
+            the number of trades (default is None, all the trades kept)
+
+        Returns
+        -------
+        Trades
+            the columns of the trades, oldest first
+        """
+        size = len(self)
+        n = size if n is None else min(n, size)
+
+        # the last trade is at end - 1 in the upper copy, the older ones right before it in either copy
+        end = (self.n_trades - 1) % self.capacity + self.capacity + 1 if size else 0
+        return Trades(*(column[end - n:end] for column in self._columns))
+
+    def since(self, ts):
+        """
+        Returns the trades at or after a time, as views on the buffer. The timestamps are assumed to increase.
+
+        Parameters
+        ----------
+        ts : int
+            the epoch timestamp, in nanoseconds
+
+        Returns
+        -------
+        Trades
+            the columns of the trades, oldest first
+        """
+        trades = self.last()
+        start = np.searchsorted(trades.ts, ts, side='left')
+        return Trades(*(column[start:] for column in trades))
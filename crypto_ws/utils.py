@@ -1,4 +1,5 @@
 import datetime as dt
+import json
 import time
 
 
@@ -6,12 +7,113 @@ def obj_to_list(value):
 
     if isinstance(value, list):
         return value
+    if isinstance(value, tuple):
+        return list(value)
     if isinstance(value, dict):
         return list(value.keys())
     else:
         return [value]
 
 
+def to_json(obj):
+    """
+    Converts the objects of a message the json module cannot serialize, such as a Depth, through their to_dict().
+
+    Parameters
+    ----------
+    obj : object
+        the object to convert
+
+    Returns
+    -------
+    dict
+        the JSON-compatible form of the object
+    """
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def serialize(msg):
+    """
+    Serializes a message to JSON for Redis, unless it already is a str or bytes.
+
+    Parameters
+    ----------
+    msg : dict or str or bytes
+        the message to serialize
+
+    Returns
+    -------
+    str or bytes
+        the serialized message
+    """
+    return msg if isinstance(msg, (str, bytes)) else json.dumps(msg, default=to_json)
+
+
+class TimestampFormatter:
+    """
+    A class used to format epoch timestamps as UTC strings with milliseconds, e.g. '2023-01-01 19:43:02.136'.
+
+    ...
+
+    The '%Y-%m-%d %H:%M:%S' prefix is formatted once per second and cached, only the milliseconds are formatted
+    for each timestamp.
+
+    Attributes
+    ----------
+    unit : int
+        the number of timestamp units per second, e.g. 1000 for milliseconds
+
+    Methods
+    -------
+    __call__(x):
+        Formats a timestamp.
+    """
+
+    MAX_CACHED = 4096
+
+    def __init__(self, unit=1000):
+        """
+        Constructs all the necessary attributes for the TimestampFormatter object.
+
+        Parameters
+        ----------
+            unit : int
+                the number of timestamp units per second (default is 1000, milliseconds)
+        """
+        self.unit = unit
+        self._prefixes = {}
+
+    def __call__(self, x):
+        """
+        Formats a timestamp.
+
+        Parameters
+        ----------
+        x : int
+            the epoch timestamp, in units of self.unit
+
+        Returns
+        -------
+        str
+            the UTC date and time, with milliseconds
+        """
+        sec, frac = divmod(int(x), self.unit)
+
+        prefix = self._prefixes.get(sec)
+        if prefix is None:
+            if len(self._prefixes) >= self.MAX_CACHED:
+                self._prefixes.clear()
+            prefix = self._prefixes[sec] = dt.datetime.fromtimestamp(sec, dt.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+        return f'{prefix}.{frac * 1000 // self.unit:03d}'
+
+
+format_ms = TimestampFormatter(1000)
+format_ns = TimestampFormatter(10**9)
+
+
 class Timer:
     """
     A class used to represent a Timer.
@@ -24,8 +126,8 @@ class Timer:
         a limit in seconds that the timer checks against
     _wait : int
         a time in seconds that the timer will wait
-    now : datetime
-        the current datetime when the Timer object is initialized
+    now : float
+        the monotonic time in seconds when the Timer object was last reset
 
     Methods
     ----------
@@ -55,7 +157,7 @@ class Timer:
         """
         self.limit = limit
         self._wait = wait
-        self.now = dt.datetime.now()
+        self.now = time.monotonic()
 
     @property
     def time_taken(self):
@@ -67,7 +169,7 @@ class Timer:
         float
             The time taken in seconds.
         """
-        return (dt.datetime.now() - self.now).total_seconds()
+        return time.monotonic() - self.now
 
     @property
     def reached_limit(self):
@@ -91,4 +193,4 @@ class Timer:
         """
         Resets the timer's start time to the current time.
         """
-        self.now = dt.datetime.now()
+        self.now = time.monotonic()
@@ -1,13 +1,12 @@
 from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.core_ws import read_cache
 import redis
-import json
 
 
-def get_cached_data():
+def get_cached_data(market=None):
     r = redis.Redis(host='localhost', password=None)
-    foo = r.get(name='redis_cache_key:ticker').decode()
 
-    return json.loads(foo)
+    return read_cache(r, 'redis_cache_key', 'ticker', market)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,174 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import websockets
+
+from crypto_ws.binance_ws import AsyncBinanceWS
+
+
+TRADE = {'e': 'trade', 'E': 1672515782136, 's': 'BNBBTC', 't': 12345, 'p': '0.001', 'q': '100', 'b': 88,
+         'a': 50, 'T': 1672515782136, 'm': True, 'M': True}
+
+
+def test_async_clients_share_one_loop():
+
+    async def handler(connection):
+        await connection.recv()
+        await connection.send(json.dumps(TRADE))
+        await connection.wait_closed()
+
+    async def main():
+        async with websockets.serve(handler, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            clients = [AsyncBinanceWS(url=f'ws://127.0.0.1:{port}', markets=['bnbbtc'], channels=['trade'])
+                       for _ in range(3)]
+
+            tasks = [asyncio.create_task(client.run()) for client in clients]
+            while not all(client.results['trade'] for client in clients):
+                await asyncio.sleep(0.01)
+
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            return clients
+
+    clients = asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    for client in clients:
+        assert client.results['trade']['bnbbtc']['price'] == 0.001
+
+
+def test_async_publish_conflates_the_pending_messages():
+    client = AsyncBinanceWS(markets=['bnbbtc'], channels=['ticker', 'trade'], do_publish=True, conflate=True)
+
+    for idx in range(3):
+        client._handle('ticker', 'bnbbtc', {'price': idx})
+        client._handle('trade', 'bnbbtc', {'price': idx})
+
+    assert client._outgoing.qsize() == 4
+    assert client._latest == {('ticker', 'bnbbtc'): ('ticker', {'bnbbtc': {'price': 2}})}
+    assert client.conflated == {'ticker': 2}
+
+
+class FlakyRedis:
+    """
+    Stands in for redis.asyncio.Redis, failing the first pipeline it executes.
+    """
+
+    def __init__(self):
+        self.published = []
+        self.n_executed = 0
+
+    def pipeline(self, transaction=True):
+        return self
+
+    async def __aenter__(self):
+        self._pending = []
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def publish(self, channel, message):
+        self._pending.append(message)
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        self._pending.append(mapping)
+
+    def expire(self, name, time):
+        pass
+
+    async def execute(self):
+        self.n_executed += 1
+        if self.n_executed == 1:
+            raise ConnectionError('Connection reset by peer')
+        self.published += self._pending
+
+
+def test_async_publish_task_survives_a_redis_failure():
+    client = AsyncBinanceWS(markets=['bnbbtc'], channels=['trade'], do_publish=True)
+    client._redis = FlakyRedis()
+
+    async def main():
+        task = asyncio.create_task(client._publish_task())
+
+        client._handle('trade', 'bnbbtc', {'price': 1})
+        while not client.n_publish_failures:
+            await asyncio.sleep(0.01)
+
+        client._handle('trade', 'bnbbtc', {'price': 2})
+        while not client._redis.published:
+            await asyncio.sleep(0.01)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    assert client.n_publish_failures == 1
+    assert client._redis.published == ['{"bnbbtc": {"price": 2}}']
+
+
+def test_async_publish_drops_beyond_the_queue():
+    client = AsyncBinanceWS(markets=['bnbbtc'], channels=['trade'], do_publish=True, publish_queue=2)
+
+    for idx in range(5):
+        client._handle('trade', 'bnbbtc', {'price': idx})
+
+    assert client._outgoing.qsize() == 2
+    assert client.n_publish_dropped == 3
+
+
+def test_async_publish_survives_a_message_failing_to_serialize():
+    client = AsyncBinanceWS(markets=['bnbbtc', 'ethbtc'], channels=['ticker'], do_publish=True, conflate=True)
+    client._redis = FlakyRedis()
+    client._redis.n_executed = 1
+
+    async def main():
+        client._handle('ticker', 'bnbbtc', {'price': 1})
+        client._handle('ticker', 'ethbtc', {'price': 1})
+
+        task = asyncio.create_task(client._publish_task())
+        with patch('crypto_ws.async_core_ws.serialize', side_effect=[TypeError('not serializable'), '2']):
+            while not client._redis.published:
+                await asyncio.sleep(0.01)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    assert client._redis.published == ['2']
+    assert not client._latest
+
+
+def test_async_run_flushes_on_cancellation():
+    client = AsyncBinanceWS(markets=['bnbbtc'], channels=['trade'], do_cache=True, do_publish=True, caching_freq=60)
+    client._redis = FlakyRedis()
+    client._redis.n_executed = 1
+
+    async def connect():
+        pass
+
+    async def loop():
+        client._on_message(TRADE)
+        await asyncio.sleep(60)
+
+    client._connect, client._loop = connect, loop
+    client._keep_alive = client._subscribe = lambda: None
+
+    async def main():
+        task = asyncio.create_task(client.run())
+        while not client._dirty:
+            await asyncio.sleep(0.01)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    assert len(client._redis.published) == 2
+    assert client._redis.published[0].keys() == {'bnbbtc'}
+    assert client._outgoing.empty() and not client._dirty
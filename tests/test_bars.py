@@ -0,0 +1,39 @@
+from benchmarks.fixtures import MESSAGES
+from crypto_ws import binance_ws
+from crypto_ws.bars import BarAggregator
+
+
+def trade(ts_ms, price, size=1., t=0):
+    return {'e': 'trade', 'E': ts_ms, 's': 'BTCUSDT', 't': t, 'p': str(price), 'q': str(size), 'T': ts_ms, 'm': False}
+
+
+def test_aggregator_closes_bars():
+    aggregator = BarAggregator(['1s', '1m'])
+
+    bars = aggregator.update([(1_000_000_000, 10., 1.), (1_500_000_000, 12., 1.), (1_600_000_000, 9., 2.)])
+    assert [(b.interval, b.open, b.high, b.low, b.close, b.volume, b.closed) for b in bars] == [
+        ('1s', 10., 12., 9., 9., 4., False), ('1m', 10., 12., 9., 9., 4., False)]
+
+    bars = aggregator.update([(2_100_000_000, 11., 1.)])
+    assert [(b.interval, b.start, b.closed) for b in bars] == [
+        ('1s', 1_000_000_000, True), ('1s', 2_000_000_000, False), ('1m', 0, False)]
+    assert bars[-1].count == 4
+
+
+def test_bars_from_trades_in_bar_schema():
+    client = binance_ws.BinanceWS(markets=['btcusdt'], channels=['trade'], bars=['1m'])
+
+    client._on_message(trade(1672515782136, 100.))
+    client._on_message(trade(1672515790000, 101., 2.))
+
+    bar = client.results['bar_1m']['btcusdt']
+    assert bar['start_time_utc'] == '2022-12-31 19:43:00.000'
+    assert bar['end_time_utc'] == '2022-12-31 19:43:59.999'
+    assert (bar['open'], bar['high'], bar['close'], bar['number_trades']) == (100., 101., 101., 2)
+    assert not bar['current_candle_completed']
+    kline = MESSAGES['binance']['kline']
+    assert set(bar) == set(binance_ws.BarParser.parse(dict(kline, k=dict(kline['k'], x=True))))
+    assert bar['symbol'] == 'BTCUSDT'
+
+    client._on_message(trade(1672515842000, 99.))
+    assert client.results['bar_1m']['btcusdt']['open'] == 99.
@@ -1,5 +1,7 @@
-from unittest.mock import patch
+import json
+from unittest.mock import MagicMock, patch
 
+import pytest
 import redis
 
 from crypto_ws.core_ws import CoreWS
@@ -46,3 +48,98 @@ def test_publish(mock_redis_publish):
         channel=f'{core_ws._publish_channel}:{channel}',
         message=msg
     )
+
+
+def test_cache_writes_updated_markets_only():
+    core_ws = CoreWS('wss://example.com', markets=['ETH/BTC', 'BTC/USD'], caching_freq=0, do_cache=True,
+                     caching_key='key')
+    core_ws._redis = MagicMock()
+    pipe = core_ws._redis.pipeline.return_value
+
+    core_ws._handle('ticker', 'ETH/BTC', {'price': 1.})
+    pipe.hset.assert_not_called()
+
+    core_ws._cache()
+    pipe.hset.assert_called_once_with('key:ticker', mapping={'ETH/BTC': '{"price": 1.0}'})
+    pipe.execute.assert_called_once()
+
+    pipe.reset_mock()
+    core_ws._cache()
+
+    pipe.hset.assert_not_called()
+    pipe.execute.assert_not_called()
+
+
+def test_cache_tracks_each_updated_market_once():
+    core_ws = CoreWS('wss://example.com', markets=['ETH/BTC', 'BTC/USD'], do_cache=True)
+    core_ws._redis = MagicMock()
+
+    for i in range(100):
+        core_ws._handle('ticker', 'ETH/BTC', {'price': i})
+        core_ws._handle('ticker', 'BTC/USD', {'price': i})
+
+    assert len(core_ws._dirty) == 2
+    assert core_ws._queue_cache(core_ws._redis.pipeline()) == 2
+    assert not core_ws._dirty and not core_ws._pending
+
+    uncached = CoreWS('wss://example.com', markets=['ETH/BTC'])
+    for i in range(100):
+        uncached._handle('ticker', 'ETH/BTC', {'price': i})
+
+    assert not uncached._dirty
+
+
+def test_batch_publish_flushes_on_close():
+    core_ws = CoreWS('wss://example.com', do_publish=True, publish_window=60, publish_batch=2)
+    core_ws._publisher._client = MagicMock()
+    pipe = core_ws._publisher._client.pipeline.return_value
+
+    for idx in range(3):
+        core_ws._publish('ticker', {'BTC/USD': {'price': idx}})
+    core_ws.close()
+
+    assert pipe.publish.call_count == 3
+    assert pipe.execute.call_count == 2
+    pipe.publish.assert_called_with(f'{core_ws._publish_channel}:ticker', '{"BTC/USD": {"price": 2}}')
+
+
+def test_batch_publish_conflates_the_pending_messages():
+    core_ws = CoreWS('wss://example.com', channels=['ticker', 'trade'], do_publish=True, publish_window=60,
+                     conflate=['ticker'])
+    core_ws._publisher._client = MagicMock()
+    pipe = core_ws._publisher._client.pipeline.return_value
+
+    for idx in range(5):
+        core_ws._handle('ticker', 'BTC/USD', {'price': idx})
+        core_ws._handle('trade', 'BTC/USD', {'price': idx})
+    core_ws.close()
+
+    published = [(call.args[0].split(':')[-1], json.loads(call.args[1])) for call in pipe.publish.call_args_list]
+    assert [msg for channel, msg in published if channel == 'ticker'] == [{'BTC/USD': {'price': 4}}]
+    assert len([msg for channel, msg in published if channel == 'trade']) == 5
+    assert core_ws.conflated == {'ticker': 4}
+
+
+def test_batch_publish_survives_a_message_failing_to_serialize():
+    core_ws = CoreWS('wss://example.com', channels=['ticker'], do_publish=True, publish_window=60,
+                     conflate=['ticker'])
+    publisher = core_ws._publisher
+    publisher._client = MagicMock()
+    pipe = publisher._client.pipeline.return_value
+
+    for market in ('ETH/BTC', 'BTC/USD', 'XRP/USD'):
+        core_ws._handle('ticker', market, {'price': 1.})
+
+    batch = [publisher._queue.get_nowait() for _ in range(3)]
+    with patch('crypto_ws.publisher.serialize', side_effect=[TypeError('not serializable'), '2', '3']):
+        publisher._flush(batch)
+
+    assert [call.args[1] for call in pipe.publish.call_args_list] == ['2', '3']
+    assert not publisher._latest
+    assert publisher.publish('chan', {'price': 2.}, ('ticker', 'BTC/USD')) is False
+    core_ws.close()
+
+
+def test_conflate_requires_a_publish_window():
+    with pytest.raises(ValueError):
+        CoreWS('wss://example.com', channels=['ticker'], do_publish=True, conflate=['ticker'])
@@ -0,0 +1,29 @@
+import pytest
+
+from crypto_ws.decoders import get_decoder, json_decode, orjson
+from crypto_ws.huobi_ws import HuobiWS
+
+
+@pytest.mark.parametrize('decoder', ['json', 'orjson'])
+def test_decoders_read_bytes(decoder):
+    if decoder == 'orjson' and orjson is None:
+        pytest.skip('orjson is not installed')
+
+    decode = get_decoder(decoder)
+
+    assert decode(b'{"e":"trade","p":"0.001"}') == {'e': 'trade', 'p': '0.001'}
+    assert decode(b'') == {}
+
+
+def test_get_decoder():
+    assert get_decoder('json') is json_decode
+    assert get_decoder(len) is len
+
+
+def test_huobi_decodes_the_empty_close_frame():
+    client = HuobiWS(markets=['btcusdt'], channels=['ticker'])
+
+    assert client._decode(b'') == {}
+
+    client._process(b'')
+    assert (client.n_failures, client.n_skipped) == (0, 1)
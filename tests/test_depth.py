@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+
+from crypto_ws import huobi_ws
+from crypto_ws.depth import Depth
+from crypto_ws.utils import serialize
+
+
+DEPTH = Depth.from_levels([['99', '1'], ['98', '2'], ['97', '3']], [['101', '1'], ['102', '1'], ['104', '2']])
+
+
+def test_depth_analytics():
+    assert DEPTH.mid == 100.
+    assert DEPTH.spread == 2.
+    assert DEPTH.cumulative('asks').tolist() == [1., 2., 4.]
+    assert DEPTH.vwap(3, 'buy') == (101 + 102 + 104) / 3
+    assert DEPTH.vwap(2, 'sell') == 98.5
+    assert np.isnan(DEPTH.vwap(10, 'buy'))
+    assert DEPTH.imbalance() == (6 - 4) / 10
+    assert DEPTH.imbalance(1) == 0.
+    assert DEPTH.slippage(101, 'buy') == 0.
+    assert np.isclose(DEPTH.slippage(99 + 98, 'sell'), 1 - (99 + 98) / 2 / 99)
+
+
+def test_depth_serialization():
+    msg = huobi_ws.DepthParser.parse({'ch': 'market.btcusdt.depth.step0', 'ts': 1672515782136,
+                                      'tick': {'bids': [[99., 1.], [98., 2.]], 'asks': [[101., 1.]],
+                                               'version': 1, 'ts': 1672515782135}})
+
+    cached = json.loads(serialize(msg))
+
+    assert cached['depth'] == {'bids': [[99., 98.], [1., 2.]], 'asks': [[101.], [1.]]}
+    assert Depth.from_dict(cached['depth']).bids.tolist() == [[99., 1.], [98., 2.]]
@@ -0,0 +1,67 @@
+import json
+import os
+import signal
+
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import MESSAGES
+from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.latency import Histogram, LatencyTracker, dump_on_signal
+from crypto_ws.recorder import Recorder
+from crypto_ws.replay import replay
+
+
+def test_histogram_percentiles_within_precision():
+    values = np.random.default_rng(0).lognormal(11, 1.5, 100000).astype(int)
+
+    histogram = Histogram()
+    for value in values.tolist():
+        histogram.record(value)
+
+    for q, value in zip((50, 90, 99, 99.9), histogram.percentiles([50, 90, 99, 99.9])):
+        assert value == pytest.approx(np.percentile(values, q), rel=0.01)
+
+    assert histogram.count == len(values) and histogram.max == values.max()
+    assert histogram.percentile(100) == values.max()
+
+
+def test_histogram_clamps_and_merges():
+    histogram, other = Histogram(max_value=1000), Histogram(max_value=1000)
+    histogram.record(-5)
+    other.record(10**6)
+    histogram.merge(other)
+
+    assert histogram.count == 2
+    assert histogram.percentile(0) == 0
+    assert histogram.percentile(100) == 10**6
+
+
+def test_client_records_the_stage_latencies(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    for name in ('trade', 'ticker'):
+        for _ in range(20):
+            recorder.record(1, json.dumps(MESSAGES['binance'][name]).encode())
+    recorder.close()
+
+    client = BinanceWS(markets=['btcusdt'], channels=['trade', 'ticker'], latency=True)
+    replay(client, str(tmp_path))
+
+    assert set(client.latency.histograms) == {'trade', 'ticker'}
+    for stage, histogram in client.latency.histograms['trade'].items():
+        assert histogram.count == 20, stage
+
+    percentiles = client.latency.percentiles()
+    assert 0 < percentiles['decode'][50] <= percentiles['decode'][99.9]
+    assert 'trade' in client.latency.report()
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason='no SIGUSR1')
+def test_dump_on_signal(capsys):
+    tracker = LatencyTracker('dumped')
+    tracker.record('trade', 0, 10, 20, 30, 40)
+
+    assert dump_on_signal(signal.SIGUSR1)
+    os.kill(os.getpid(), signal.SIGUSR1)
+
+    assert 'dumped' in capsys.readouterr().out
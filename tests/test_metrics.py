@@ -0,0 +1,52 @@
+import json
+import urllib.request
+
+import pytest
+
+from benchmarks.fixtures import MESSAGES
+from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.metrics import registry
+from crypto_ws.recorder import Recorder
+from crypto_ws.replay import replay
+
+
+def replayed_client(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    recorder.record(1, b'{"result": null, "id": 0}')
+    for _ in range(10):
+        recorder.record(1, json.dumps(MESSAGES['binance']['trade']).encode())
+    recorder.close()
+
+    client = BinanceWS(markets=['btcusdt'], channels=['trade'])
+    replay(client, str(tmp_path))
+    return client
+
+
+def test_client_counts_frames_messages_and_bytes(tmp_path):
+    client = replayed_client(tmp_path)
+    size = len(json.dumps(MESSAGES['binance']['trade']))
+
+    assert (client.n_frames, client.n_skipped, client.n_failures) == (11, 1, 0)
+    assert client.n_bytes == 10 * size + len('{"result": null, "id": 0}')
+    assert client.counts == {('trade', 'btcusdt'): [10, 10 * size]}
+
+
+def test_parse_failures_are_counted_and_raised():
+    client = BinanceWS(markets=['btcusdt'], channels=['trade'])
+
+    with pytest.raises(Exception):
+        client._process(b'{"e": "trade", "s": "BTCUSDT"')
+
+    assert client.n_failures == 1
+
+
+def test_registry_serves_the_prometheus_text(tmp_path):
+    client = replayed_client(tmp_path)
+
+    server = registry.serve(port=0)
+    with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as response:
+        text = response.read().decode()
+
+    assert '# TYPE crypto_ws_messages_total counter' in text
+    assert 'crypto_ws_messages_total{exchange="binance",channel="trade",market="btcusdt"}' in text
+    assert client.n_frames > 0
@@ -0,0 +1,95 @@
+import zlib
+from unittest.mock import MagicMock
+
+from crypto_ws.bybit_ws import BybitWS
+from crypto_ws.kraken_ws import KrakenWS
+from crypto_ws.orderbook import OrderBook
+
+
+def book_msg(kind, u, bids, asks):
+    return {'topic': 'orderbook.50.BTCUSDT', 'ts': 1672515782136, 'type': kind,
+            'data': {'s': 'BTCUSDT', 'b': bids, 'a': asks, 'u': u, 'seq': 1}}
+
+
+def test_order_book_levels():
+    book = OrderBook(depth=2)
+    book.snapshot([['10', '1'], ['9', '2'], ['8', '1']], [['11', '1'], ['12', '3']], 5)
+
+    assert book.top() == ([[10., 1.], [9., 2.]], [[11., 1.], [12., 3.]])
+    assert book.mid == 10.5
+    assert book.spread == 1.
+
+    book.apply([['10', '0'], ['9.5', '4']], [['11', '0']], 6)
+
+    assert book.top(1) == ([[9.5, 4.]], [[12., 3.]])
+    assert book.update_id == 6
+
+
+def test_bybit_snapshot_and_deltas():
+    client = BybitWS(markets=['BTCUSDT'], channels=['orderbook.50'], book_depth=2)
+    client._send = MagicMock()
+
+    client._on_message(book_msg('delta', 9, [['10', '1']], []))
+    assert 'BTCUSDT' not in client.results['orderbook.50']
+
+    client._on_message(book_msg('snapshot', 10, [['10', '1'], ['9', '2']], [['11', '1']]))
+    client._on_message(book_msg('delta', 11, [['10', '0']], [['10.5', '2']]))
+
+    msg = client.results['orderbook.50']['BTCUSDT']
+    assert msg['depth'].to_dict() == {'bids': [[9.], [2.]], 'asks': [[10.5, 11.], [2., 1.]]}
+    assert msg['update_id'] == 11
+    assert client.book('BTCUSDT').spread == 1.5
+
+    client._on_message(book_msg('delta', 13, [['9', '0']], []))
+
+    assert not client.book('BTCUSDT').synced
+    client._send.assert_called_with({'op': 'subscribe', 'args': ['orderbook.50.BTCUSDT']})
+
+    client._on_message(book_msg('delta', 1, [['20', '1']], [['21', '1']]))
+    assert client.book('BTCUSDT').mid == 20.5
+
+
+def kraken_checksum(asks, bids):
+    s = ''.join(x.replace('.', '').lstrip('0') for level in asks[:10] + bids[:10] for x in level[:2])
+    return str(zlib.crc32(s.encode()))
+
+
+def test_kraken_updates_and_checksum():
+    client = KrakenWS(markets=['XBT/USD'], channels=['book-10'])
+    client._send = MagicMock()
+
+    asks = [[f'{0.5 + i / 10:.5f}', f'{1 + i:.8f}', '1672515782.136000'] for i in range(10)]
+    bids = [[f'{0.4 - i / 100:.5f}', f'{2 + i:.8f}', '1672515782.136000'] for i in range(10)]
+    client._on_message([336, {'as': asks, 'bs': bids}, 'book-10', 'XBT/USD'])
+
+    new_ask, new_bid = ['0.45000', '3.00000000', '1672515783.000000'], ['0.40000', '0.00000000', '1672515783.000000']
+    asks, bids = [new_ask] + asks[:9], bids[1:]
+    client._on_message([336, {'a': [new_ask]}, {'b': [new_bid], 'c': kraken_checksum(asks, bids)}, 'book-10', 'XBT/USD'])
+
+    assert client.book('XBT/USD').synced
+    depth = client.results['book-10']['XBT/USD']['depth']
+    assert depth.asks[0].tolist() == [0.45, 3.]
+    assert len(depth.asks) == 10
+    client._send.assert_not_called()
+
+    client._on_message([336, {'a': [['0.44000', '1.00000000', '1672515784.000000']], 'c': '123'}, 'book-10', 'XBT/USD'])
+
+    assert not client.book('XBT/USD').synced
+    client._send.assert_called_with({'event': 'subscribe', 'pair': ['XBT/USD'],
+                                     'subscription': {'name': 'book', 'depth': 10}})
+
+
+def test_kraken_checksum_of_large_volumes():
+    client = KrakenWS(markets=['SHIB/USD'], channels=['book-10'])
+    client._send = MagicMock()
+
+    asks = [[f'0.0000{1200 + i}', f'{98765432.1 + i:.8f}', '1672515782.136000'] for i in range(10)]
+    bids = [[f'0.0000{1199 - i}', f'{123456789.12345678 + i:.8f}', '1672515782.136000'] for i in range(10)]
+    client._on_message([336, {'as': asks, 'bs': bids}, 'book-10', 'SHIB/USD'])
+
+    new_ask = ['0.00001200', '198765432.10000000', '1672515783.000000']
+    asks = [new_ask] + asks[1:]
+    client._on_message([336, {'a': [new_ask], 'c': kraken_checksum(asks, bids)}, 'book-10', 'SHIB/USD'])
+
+    assert client.book('SHIB/USD', 'book-10').synced
+    client._send.assert_not_called()
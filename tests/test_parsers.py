@@ -0,0 +1,125 @@
+import json
+
+from benchmarks.fixtures import MESSAGES
+from crypto_ws import binance_ws, huobi_ws, kraken_ws
+from crypto_ws.parsing import LazyMessage, Record
+from crypto_ws.utils import serialize
+
+
+KLINE = {'e': 'kline', 'E': 1672515782136, 's': 'BTCUSDT',
+         'k': {'t': 1672515780000, 'T': 1672515839999, 's': 'BTCUSDT', 'i': '1m', 'o': '16540.0', 'c': '16547.31',
+               'h': '16550.0', 'l': '16539.0', 'v': '12.312', 'n': 102, 'x': True, 'q': '203712.123'}}
+
+
+def test_parse_subset():
+    msg = {'e': 'trade', 'E': 1672515782136, 's': 'BTCUSDT', 't': 12345, 'p': '0.001', 'q': '100'}
+
+    assert binance_ws.TradeParser.parse(msg, subset=['price', 'quantity', 'side']) == {'price': 0.001, 'quantity': 100.}
+
+
+def test_bar_parser_leaves_message_untouched():
+    msg = dict(KLINE)
+
+    dct = binance_ws.BarParser.parse(msg)
+
+    assert dct['period'] == '1m'
+    assert dct['close'] == 16547.31
+    assert dct['number_trades'] == 102
+    assert 'k' in msg
+
+
+def test_kraken_ticker_parser():
+    msg = [340, {'a': ['16547.31', 0, '0.5'], 'b': ['16547.30', 1, '1.2'], 'c': ['16547.31', '0.0031']},
+           'ticker', 'XBT/USD']
+
+    assert kraken_ws.TickerParser.parse(msg, subset=['ask_price', 'bid_whole_lot_volume', 'close_lot_volume']) == {
+        'ask_price': 16547.31, 'bid_whole_lot_volume': 1, 'close_lot_volume': 0.0031}
+
+
+def test_parse_datetime_keeps_milliseconds():
+    assert binance_ws.Parser.parse_datetime(1672515782136) == '2022-12-31 19:43:02.136'
+    assert binance_ws.Parser.parse_datetime(1672515782006) == '2022-12-31 19:43:02.006'
+    assert kraken_ws.Parser.parse_datetime('1672515782.136000') == '2022-12-31 19:43:02.136'
+
+
+def test_integer_timestamps():
+    client = binance_ws.BinanceWS(markets=['btcusdt'], channels=['kline_1m'], timestamps='int')
+
+    client._on_message(dict(KLINE))
+
+    bar = client.results['kline_1m']['btcusdt']
+    assert bar['event_time_utc'] == 1672515782136
+    assert bar['start_time_utc'] == 1672515780000
+    assert kraken_ws.Parser.parse_epoch('1672515782.136000') == 1672515782136000000
+
+
+def test_lazy_messages_match_the_eager_ones():
+    for exchange, parser, name in [(binance_ws, binance_ws.TickerParser, 'ticker'),
+                                   (huobi_ws, huobi_ws.TickerParser, 'ticker'),
+                                   (huobi_ws, huobi_ws.TradeParser, 'trade.detail'),
+                                   (kraken_ws, kraken_ws.TickerParser, 'ticker'),
+                                   (kraken_ws, kraken_ws.SpreadParser, 'spread')]:
+        msg = MESSAGES[exchange.__name__.split('.')[-1][:-3]][name]
+        plan = exchange.Parser.compile(parser.map, getattr(parser, 'subset', None), lazy=True)
+
+        eager, lazy = parser.parse(msg), parser.parse(msg, plan=plan)
+
+        assert lazy == eager
+        assert json.loads(serialize(lazy)) == json.loads(serialize(eager))
+
+
+def test_lazy_message_converts_on_access():
+    msg = MESSAGES['binance']['ticker']
+    plan = binance_ws.Parser.compile(binance_ws.TickerParser.map, lazy=True)
+
+    lazy = binance_ws.TickerParser.parse(msg, plan=plan)
+
+    assert isinstance(lazy, LazyMessage)
+    assert lazy._values == {}
+    assert lazy['close'] == float(msg['c'])
+    assert lazy._values == {'close': float(msg['c'])}
+    assert lazy.get('missing') is None and 'missing' not in lazy
+    eager = binance_ws.TickerParser.parse(msg, plan=binance_ws.Parser.compile(binance_ws.TickerParser.map))
+    assert list(lazy) == list(eager)
+
+
+def test_lazy_client_caches_and_publishes_dicts():
+    client = huobi_ws.HuobiWS(markets=['btcusdt'], channels=['ticker'], lazy=True)
+    published = []
+    client._publish = lambda channel, msg, key=None: published.append(serialize(msg))
+
+    client._on_message(MESSAGES['huobi']['ticker'])
+
+    ticker = client.results['ticker']['btcusdt']
+    assert isinstance(ticker, LazyMessage)
+    assert ticker['close'] == MESSAGES['huobi']['ticker']['tick']['close']
+    assert json.loads(published[0]) == {'btcusdt': json.loads(serialize(ticker.to_dict()))}
+
+
+def test_records_match_the_dicts():
+    from benchmarks.suite import CLIENTS, loop_frames
+
+    for exchange, (cls, markets, channels) in CLIENTS.items():
+        eager = cls(markets=markets, channels=channels)
+        records = cls(markets=markets, channels=channels, records=True)
+
+        for frame in loop_frames(exchange):
+            eager._on_message(eager._decode(frame))
+            records._on_message(records._decode(frame))
+
+        for channel, results in eager.results.items():
+            for market, msg in results.items():
+                assert json.loads(serialize(records.results[channel][market])) == json.loads(serialize(msg))
+
+
+def test_record_fields():
+    client = binance_ws.BinanceWS(markets=['btcusdt'], channels=['ticker'], records=True)
+
+    client._on_message(MESSAGES['binance']['ticker'])
+
+    ticker = client.results['ticker']['btcusdt']
+    assert isinstance(ticker, Record) and type(ticker).__name__ == 'BinanceTicker'
+    assert ticker.close == ticker['close'] == float(MESSAGES['binance']['ticker']['c'])
+    assert not hasattr(ticker, '__dict__')
+    assert list(ticker) == list(ticker.to_dict()) == list(binance_ws.TickerParser.parse(MESSAGES['binance']['ticker']))
+    assert 'delta' not in ticker and ticker.get('delta') is None
@@ -0,0 +1,32 @@
+from unittest.mock import MagicMock
+
+from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.recorder import Recorder, read_frames
+
+
+def test_recorder_rotates_and_reads_back(tmp_path):
+    recorder = Recorder(str(tmp_path), max_bytes=1, block_size=64)
+
+    frames = [f'{{"n": {idx}}}'.encode() for idx in range(20)]
+    for idx, frame in enumerate(frames):
+        recorder.record(1 if idx % 2 else 2, frame)
+    recorder.close()
+
+    assert len(recorder.paths) > 1
+    read = [record for path in recorder.paths for record in read_frames(path)]
+    assert [frame for _, _, frame in read] == frames
+    assert [opcode for _, opcode, _ in read] == [1 if idx % 2 else 2 for idx in range(20)]
+    assert all(a[0] <= b[0] for a, b in zip(read, read[1:]))
+
+
+def test_client_records_raw_frames(tmp_path):
+    client = BinanceWS(markets=['btcusdt'], channels=['trade'], record=str(tmp_path))
+    client._socket = MagicMock()
+    client._socket.recv_data.return_value = (1, b'{"result": null, "id": 0}')
+
+    assert client._rcv() == {'result': None, 'id': 0}
+    client.close()
+
+    path, = client._recorder.paths
+    assert path.startswith(str(tmp_path / 'binancews-'))
+    assert [frame for _, _, frame in read_frames(path)] == [b'{"result": null, "id": 0}']
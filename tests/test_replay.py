@@ -0,0 +1,111 @@
+import gzip
+import json
+import time
+
+from benchmarks.fixtures import MESSAGES
+from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.bybit_ws import BybitWS
+from crypto_ws.huobi_ws import HuobiWS
+from crypto_ws.recorder import Recorder
+from crypto_ws.replay import replay
+
+
+def record(tmp_path, frames, opcode=1, step=0):
+    recorder = Recorder(str(tmp_path))
+    for frame in frames:
+        recorder.record(opcode, frame)
+        time.sleep(step)
+    recorder.close()
+    return recorder.paths
+
+
+def test_replay_drives_the_client_loop(tmp_path):
+    trade = json.dumps(MESSAGES['binance']['trade']).encode()
+    paths = record(tmp_path, [b'{"result": null, "id": 0}'] + [trade] * 50)
+
+    client = BinanceWS(markets=['btcusdt'], channels=['trade'], trade_buffer=100)
+    socket = replay(client, str(tmp_path))
+
+    assert socket.n_frames == 51
+    assert client.n_messages == 50
+    assert len(client.trades['btcusdt']) == 50
+    assert client.results['trade']['btcusdt']['price'] == 16547.31
+    assert paths == socket.paths
+
+
+def test_paced_replay(tmp_path):
+    ticker = gzip.compress(json.dumps(MESSAGES['huobi']['ticker']).encode())
+    record(tmp_path, [ticker] * 3, opcode=2, step=0.05)
+
+    client = HuobiWS(markets=['btcusdt'], channels=['ticker'])
+    start = time.monotonic()
+    replay(client, str(tmp_path), speed=2)
+
+    assert client.n_messages == 3
+    assert time.monotonic() - start >= 0.04
+
+
+def test_decode_workers_keep_the_frames_in_order(tmp_path):
+    frames = []
+    for i in range(200):
+        msg = MESSAGES['huobi']['trade.detail']
+        data = [dict(msg['tick']['data'][0], tradeId=i)]
+        frames.append(gzip.compress(json.dumps(dict(msg, tick=dict(msg['tick'], data=data))).encode()))
+    record(tmp_path, frames, opcode=2)
+
+    client = HuobiWS(markets=['btcusdt'], channels=['trade.detail'], trade_buffer=1000, decode_workers=2,
+                     read_queue=16)
+    socket = replay(client, str(tmp_path))
+
+    assert socket.n_frames == 200
+    assert client.n_messages == 200
+    assert list(client.trades['btcusdt'].last().trade_id) == list(range(200))
+
+
+def test_conflated_read_queue_keeps_the_latest_ticker(tmp_path):
+    frames = []
+    for i in range(100):
+        for symbol in ('BTCUSDT', 'ETHUSDT'):
+            frames.append(json.dumps(dict(MESSAGES['binance']['ticker'], s=symbol, c=str(i))).encode())
+    record(tmp_path, frames)
+
+    client = BinanceWS(markets=['btcusdt', 'ethusdt'], channels=['ticker'], read_queue=4, overflow='conflate')
+    on_message = client._on_message
+
+    def slow_on_message(data):
+        time.sleep(0.001)
+        on_message(data)
+
+    client._on_message = slow_on_message
+    socket = replay(client, str(tmp_path))
+
+    assert socket.n_frames == 200
+    assert client._frames.n_conflated > 0
+    assert client.n_messages + client._frames.n_conflated == 200
+    assert client.results['ticker']['btcusdt']['close'] == 99.
+    assert client.results['ticker']['ethusdt']['close'] == 99.
+
+
+def test_conflated_read_queue_keeps_the_book_deltas(tmp_path):
+    book, ticker = MESSAGES['bybit']['orderbook.50'], MESSAGES['bybit']['tickers']
+    frames = [json.dumps(dict(book, type='snapshot', data=dict(book['data'], u=100))).encode()]
+    for u in range(101, 201):
+        frames.append(json.dumps(dict(book, data=dict(book['data'], u=u))).encode())
+        frames.append(json.dumps(dict(ticker, data=dict(ticker['data'], lastPrice=str(u)))).encode())
+    record(tmp_path, frames)
+
+    client = BybitWS(markets=['BTCUSDT'], channels=['orderbook.50', 'tickers'], read_queue=4, overflow='conflate')
+    on_message, resubscribed = client._on_message, []
+
+    def slow_on_message(data):
+        time.sleep(0.001)
+        on_message(data)
+
+    client._on_message = slow_on_message
+    client._resubscribe = resubscribed.append
+    replay(client, str(tmp_path))
+
+    assert client._frames.n_conflated > 0
+    assert not resubscribed
+    assert client.books['orderbook.50.BTCUSDT'].update_id == 200
+    assert client.results['tickers']['BTCUSDT']['last_price'] == 200.
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from crypto_ws.ring import RingQueue
+
+
+def test_entries_keep_their_order_across_the_ring():
+    ring = RingQueue(4)
+    taken = []
+
+    for idx in range(10):
+        ring.put(idx)
+        if idx % 3 == 2:
+            taken += ring.get()
+    taken += ring.get()
+
+    assert taken == list(range(10))
+    assert len(ring) == 0
+
+
+def test_block_waits_for_room():
+    ring = RingQueue(2)
+    ring.put(0)
+    ring.put(1)
+
+    writer = threading.Thread(target=ring.put, args=(2,))
+    writer.start()
+    time.sleep(0.05)
+    assert writer.is_alive()
+
+    assert ring.get() == [0, 1]
+    writer.join(1)
+    assert ring.get() == [2]
+    assert ring.n_blocked == 1
+
+
+def test_drop_oldest_never_waits():
+    ring = RingQueue(3, overflow='drop_oldest')
+
+    for idx in range(5):
+        ring.put(idx)
+
+    assert ring.get() == [2, 3, 4]
+    assert ring.n_dropped == 2
+
+
+def test_conflate_replaces_the_pending_entry_of_a_key():
+    ring = RingQueue(3, overflow='conflate')
+
+    ring.put('a1', ('ticker', 'a'))
+    ring.put('trade', None)
+    ring.put('b1', ('ticker', 'b'))
+    ring.put('a2', ('ticker', 'a'))
+    ring.put('a3', ('ticker', 'a'))
+
+    assert ring.get() == ['a3', 'trade', 'b1']
+    assert ring.n_conflated == 2
+
+
+def test_close_releases_a_blocked_reader():
+    ring = RingQueue(1)
+    ring.put(0)
+
+    writer = threading.Thread(target=ring.put, args=(1,))
+    writer.start()
+    ring.close()
+    writer.join(1)
+
+    assert not writer.is_alive()
+    assert ring.get() == [0]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        RingQueue(overflow='spill')
@@ -0,0 +1,38 @@
+import threading
+
+from crypto_ws.scheduler import Scheduler
+
+
+def test_every_runs_until_cancelled():
+    scheduler = Scheduler()
+    ran = threading.Event()
+    calls = []
+
+    def job_fn():
+        calls.append(1)
+        if len(calls) == 3:
+            ran.set()
+
+    job = scheduler.every(0.01, job_fn)
+    assert ran.wait(2)
+    job.cancel()
+
+    n_calls = len(calls)
+    threading.Event().wait(0.05)
+    assert len(calls) <= n_calls + 1
+
+
+def test_failing_job_keeps_running():
+    scheduler = Scheduler()
+    ran = threading.Event()
+    calls = []
+
+    def job_fn():
+        calls.append(1)
+        if len(calls) == 2:
+            ran.set()
+        raise ValueError('boom')
+
+    job = scheduler.every(0.01, job_fn)
+    assert ran.wait(2)
+    job.cancel()
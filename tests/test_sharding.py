@@ -0,0 +1,34 @@
+from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.sharding import plan_shards
+
+
+def test_plan_shards_balances_rates():
+    subscriptions = [('btcusdt', 'trade'), ('ethusdt', 'trade'), ('solusdt', 'trade'), ('xrpusdt', 'trade')]
+    weights = {('btcusdt', 'trade'): 10, ('ethusdt', 'trade'): 5}
+
+    plan = plan_shards(subscriptions, shards=2, weights=weights)
+
+    assert len(plan) == 2
+    assert ('btcusdt', 'trade') in plan[0]
+    assert plan[1][0] == ('ethusdt', 'trade')
+    assert sorted(sum(plan, [])) == sorted(subscriptions)
+
+
+def test_plan_shards_respects_cap():
+    subscriptions = [(f'm{i}', 'trade') for i in range(10)]
+
+    plan = plan_shards(subscriptions, shards=1, cap=4)
+
+    assert [len(subs) for subs in plan] == [4, 3, 3]
+
+
+def test_shards_share_results():
+    client = BinanceWS(markets=['btcusdt', 'ethusdt', 'solusdt'], channels=['trade', 'ticker'], shards=2,
+                       market_rates={'btcusdt': 10})
+
+    shards = client.shard()
+
+    assert len(shards) == 2
+    assert all(shard.results is client.results for shard in shards)
+    assert [m for m, _ in shards[0].subscriptions] == ['btcusdt']
+    assert sorted(sum((shard.subscriptions for shard in shards), [])) == sorted(client.subscriptions)
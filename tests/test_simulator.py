@@ -0,0 +1,61 @@
+import pytest
+import websocket
+
+from crypto_ws.binance_ws import BinanceWS
+from crypto_ws.bybit_ws import BybitWS
+from crypto_ws.huobi_ws import HuobiWS
+from crypto_ws.kraken_ws import KrakenWS
+from crypto_ws.simulator import ExchangeSimulator
+
+
+def drive(client, n):
+    client._connect()
+    client._subscribe()
+    while client.n_messages < n:
+        client._on_message(client._rcv())
+    client._socket.close()
+
+
+@pytest.mark.parametrize('exchange, cls, markets, channels', [
+    ('binance', BinanceWS, ['btcusdt'], ['trade', 'ticker', 'kline_1m']),
+    ('huobi', HuobiWS, ['btcusdt'], ['ticker', 'trade.detail', 'depth.step0', 'mbp.refresh.20']),
+    ('kraken', KrakenWS, ['XBT/USD'], ['ticker', 'trade', 'spread', 'book-10']),
+    ('bybit', BybitWS, ['BTCUSDT'], ['tickers', 'publicTrade', 'orderbook.50', 'kline.1']),
+])
+def test_clients_receive_every_channel(exchange, cls, markets, channels):
+    with ExchangeSimulator(exchange, rate=None, burst=10, seed=0) as simulator:
+        client = cls(url=simulator.url, markets=markets, channels=channels)
+        drive(client, 200)
+
+    assert all(client.results[c] for c in channels)
+
+
+def test_book_updates_keep_the_local_books_in_sync(capsys):
+    with ExchangeSimulator('kraken', rate=None, seed=0) as simulator:
+        kraken = KrakenWS(url=simulator.url, markets=['XBT/USD'], channels=['book-10'])
+        drive(kraken, 200)
+
+    with ExchangeSimulator('bybit', rate=None, seed=0) as simulator:
+        bybit = BybitWS(url=simulator.url, markets=['BTCUSDT'], channels=['orderbook.50'])
+        drive(bybit, 200)
+
+    # a checksum mismatch or a gap would have reset the book and resubscribed to it
+    assert 'resubscribing' not in capsys.readouterr().out
+    assert kraken.book('XBT/USD').synced
+    assert bybit.book('BTCUSDT').update_id == 200
+
+
+def test_rate_and_disconnects():
+    with ExchangeSimulator('binance', rate=2000, burst=20, disconnect_every=100) as simulator:
+        client = BinanceWS(url=simulator.url, markets=['btcusdt'], channels=['trade'])
+        client._connect()
+        client._subscribe()
+
+        with pytest.raises(websocket.WebSocketConnectionClosedException):
+            for _ in range(200):
+                client._on_message(client._rcv())
+
+        drive(client, 101)
+
+    assert client.n_messages == 101
+    assert simulator.n_connections == 2
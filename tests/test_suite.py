@@ -0,0 +1,33 @@
+from benchmarks import suite
+
+
+def test_cases_cover_every_parser_and_the_loop():
+    names = [name for name, _, _ in suite.cases(['binance'])]
+
+    assert len(names) == 2 * (len(suite.PARSERS['binance']) + 1)
+    assert 'binance._loop' in names and 'binance._loop/records' in names
+
+
+def test_loop_case_runs_the_client_loop():
+    run = suite.loop_case('bybit')
+    run(10)
+
+    msgs_per_sec, relative = suite.rate(run, 0.01, repeats=3)
+    assert msgs_per_sec > 0 and relative > 0
+
+
+def test_check_flags_regressions():
+    base = {'msgs_per_sec': 1000, 'relative': 1., 'bytes_per_msg': 1000}
+
+    assert suite.check({'msgs_per_sec': 500, 'relative': 0.9, 'bytes_per_msg': 1100}, base, 0.25) == []
+    assert suite.check(base, None, 0.25) == ['no baseline']
+    assert len(suite.check({'msgs_per_sec': 1000, 'relative': 0.5, 'bytes_per_msg': 2000}, base, 0.25)) == 2
+
+
+def test_records_retain_less_than_dicts():
+    parsers = {name: parse for name, _, parse in suite.cases(['binance']) if parse is not None}
+
+    plain = suite.retained(parsers['binance.TickerParser[ticker]'], 200)
+    records = suite.retained(parsers['binance.TickerParser[ticker]/records'], 200)
+    assert records < plain
+    assert 'huobi.DepthParser[depth.step0]/records' not in [name for name, _, _ in suite.cases(['huobi'])]
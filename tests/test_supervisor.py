@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+import pytest
+
+from crypto_ws import supervisor
+from crypto_ws.metrics import registry
+from crypto_ws.supervisor import Supervisor, Worker
+
+
+def test_from_config():
+    config = {
+        'sinks': {'redis': {'host': 'localhost'}, 'do_cache': True, 'caching_key': 'crypto'},
+        'clients': [
+            {'exchange': 'binance', 'markets': ['btcusdt', 'ethusdt'], 'channels': ['trade'], 'shards': 2},
+            {'exchange': 'kraken', 'markets': ['BTC/USD'], 'channels': ['spread'], 'sinks': {'do_cache': False}},
+        ],
+        'pin': False,
+    }
+
+    supervisor = Supervisor.from_config(config)
+
+    assert [w.exchange for w in supervisor.workers] == ['binance', 'binance', 'kraken']
+    assert [w.kwargs['markets'] for w in supervisor.workers] == [['btcusdt'], ['ethusdt'], ['BTC/USD']]
+    assert all(w.kwargs['redis_kwargs'] == {'host': 'localhost'} for w in supervisor.workers)
+    assert [w.kwargs['do_cache'] for w in supervisor.workers] == [True, True, False]
+    assert all(w.cpu is None for w in supervisor.workers)
+
+
+def test_from_config_serves_metrics_per_worker():
+    config = {
+        'sinks': {'metrics_port': 9200},
+        'clients': [
+            {'exchange': 'binance', 'markets': ['btcusdt', 'ethusdt'], 'channels': ['trade'], 'shards': 2},
+            {'exchange': 'kraken', 'markets': ['BTC/USD'], 'channels': ['spread']},
+        ],
+        'pin': False,
+    }
+
+    supervisor = Supervisor.from_config(config)
+
+    assert [w.kwargs['metrics_port'] for w in supervisor.workers] == [9200, 9201, 9202]
+    assert not any(port >= 9200 for _, port in registry._servers)
+
+
+class CrashingClient:
+    """
+    Stands in for an exchange client, recording the CPUs its process is pinned on, then crashing.
+    """
+
+    def __init__(self, path):
+        with open(path, 'a') as f:
+            f.write(f'{sorted(os.sched_getaffinity(0))}\n')
+        raise SystemExit(3)
+
+
+@pytest.mark.skipif(not hasattr(os, 'sched_getaffinity'), reason='CPU pinning is not available')
+def test_crashed_worker_is_restarted_on_its_cpu(tmp_path, monkeypatch):
+    monkeypatch.setitem(supervisor.EXCHANGES, 'crashing', CrashingClient)
+    path = tmp_path / 'starts'
+
+    worker = Worker('crashing-0', 'crashing', {'path': str(path)}, cpu=0)
+    sup = Supervisor([worker], restart_delay=0)
+
+    thread = threading.Thread(target=sup.run, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while worker.restarts < 2 and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    sup.stop()
+    thread.join(5)
+
+    assert worker.restarts >= 2
+    assert worker.process.exitcode is not None
+    assert not thread.is_alive()
+    assert path.read_text().splitlines()[:3] == ['[0]'] * 3
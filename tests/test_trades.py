@@ -0,0 +1,30 @@
+from crypto_ws import bybit_ws
+from crypto_ws.trades import TradeBuffer
+
+
+def test_trade_buffer_wraps_around():
+    buffer = TradeBuffer(capacity=4)
+
+    for idx in range(6):
+        buffer.append(idx * 10, 100. + idx, 1., 1 if idx % 2 else -1, idx)
+
+    assert len(buffer) == 4
+    assert buffer.last().trade_id.tolist() == [2, 3, 4, 5]
+    assert buffer.last(2).price.tolist() == [104., 105.]
+    assert buffer.since(35).ts.tolist() == [40, 50]
+    assert buffer.last().price.base is not None
+
+
+def test_bybit_trades_are_buffered():
+    client = bybit_ws.BybitWS(markets=['BTCUSDT'], channels=['publicTrade'], trade_buffer=100)
+    msg = {'topic': 'publicTrade.BTCUSDT', 'ts': 1672515782136, 'type': 'snapshot',
+           'data': [{'i': str(i), 'T': 1672515782135, 'p': '16547.31', 'v': '0.1', 'S': 'Buy' if i % 2 else 'Sell',
+                     's': 'BTCUSDT', 'BT': False} for i in range(3)]}
+
+    client._on_message(msg)
+    client._on_message(msg)
+
+    trades = client.trades['BTCUSDT'].last()
+    assert trades.trade_id.tolist() == [0, 1, 2, 0, 1, 2]
+    assert trades.side.tolist() == [-1, 1, -1, -1, 1, -1]
+    assert trades.ts[0] == 1672515782135000000